@@ -0,0 +1,121 @@
+"""
+Backfill several years of transactions from the stub server and report the throughput of the client.
+
+Reports records per second, p50/p99 latency of the date windows, peak RSS and the requests issued,
+so that a performance regression of ``_request`` and the date range pagination shows up before a release.
+
+Run from the repository root with the package installed (``pip install -e .``):
+
+    python benchmarks/bench_backfill.py --years 3 --records-per-day 500 --latency 0.02 --rate-429 0.02 --rate-5xx 0.01
+"""
+import argparse
+import json
+import resource
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+import requests
+
+from awin_py import Awin
+from awin_py.advertiser_api import RetryPolicy, TokenBucketRateLimiter
+from stub_server import start_stub_process
+
+
+class TimedAwin(Awin):
+    """Records the latency of every window request, including its retries."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.window_latencies: List[float] = []
+
+    def _request(self, *args, **kwargs) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._request(*args, **kwargs)
+        finally:
+            self.window_latencies.append(time.perf_counter() - started)
+
+
+def percentile(values:List[float], q:float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 ** 2 if sys.platform == 'darwin' else rss / 1024
+
+
+def run(args:argparse.Namespace) -> Dict[str, Any]:
+    # the server runs in its own process, so that the peak RSS is the one of the client
+    process, url = start_stub_process(records_per_day=args.records_per_day, latency=args.latency,
+                                      rate_429=args.rate_429, rate_5xx=args.rate_5xx, seed=args.seed)
+    try:
+        # the stub server has no request budget, so the rate limiter must not skew the timings
+        rate_limiter = TokenBucketRateLimiter(requests_per_minute=10**6)
+        retry_policy = RetryPolicy(max_retries=10, backoff_factor=0.01, max_backoff=0.1, throttle_wait=0.1)
+        end_date = datetime(2024, 1, 1)
+        start_date = end_date - timedelta(days=365 * args.years)
+        with TimedAwin(base_url=url, client_id='11111', client_secret='secret', rate_limiter=rate_limiter,
+                       retry_policy=retry_policy, max_workers=args.max_workers) as client:
+            started = time.perf_counter()
+            if args.mode == 'iter':
+                records = sum(len(window) for window in client.iter_transactions(start_date=start_date, end_date=end_date,
+                                                                                 batches=True))
+            else:
+                records = len(client.get_transactions(start_date=start_date, end_date=end_date,
+                                                      columnar=args.mode == 'columnar'))
+            elapsed = time.perf_counter() - started
+            retries = client.retry_metrics.retries
+        stats = requests.get(url + '__stats').json()
+        return {
+            'mode': args.mode,
+            'records': records,
+            # both dates of the range are included, so a transaction on the end date is part of it
+            'expected_records': round((end_date - start_date).total_seconds() / (86400 / args.records_per_day)) + 1,
+            'seconds': round(elapsed, 3),
+            'records_per_second': round(records / elapsed),
+            'windows': len(client.window_latencies),
+            'window_p50_ms': round(percentile(client.window_latencies, 50) * 1000, 1),
+            'window_p99_ms': round(percentile(client.window_latencies, 99) * 1000, 1),
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'requests': stats['requests'],
+            'retries': retries,
+            'throttled': stats['throttled'],
+            'server_errors': stats['failed'],
+            'connections': stats['connections'],
+            'bytes_received': stats['bytes_sent'],
+        }
+    finally:
+        process.terminate()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=3, help='years of transactions to backfill')
+    parser.add_argument('--records-per-day', type=int, default=500, help='transactions per day served by the stub')
+    parser.add_argument('--latency', type=float, default=0.02, help='simulated seconds per request')
+    parser.add_argument('--rate-429', type=float, default=0.02, help='share of requests answered with 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.01, help='share of requests answered with 503')
+    parser.add_argument('--max-workers', type=int, default=4, help='windows fetched in parallel')
+    parser.add_argument('--mode', choices=('list', 'iter', 'columnar'), default='list',
+                        help='get_transactions, iter_transactions(batches=True) or get_transactions(columnar=True)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the simulated errors')
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    args = parser.parse_args()
+
+    result = run(args)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f'{key:>20}: {value}')
+
+
+if __name__ == '__main__':
+    main()
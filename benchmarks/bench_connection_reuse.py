@@ -0,0 +1,56 @@
+"""
+Compare a pooled keep-alive session against one connection per request.
+
+Run from the repository root with the package installed (``pip install -e .``):
+
+    python benchmarks/bench_connection_reuse.py --windows 24 --handshake-delay 0.05
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+from awin_py import Awin
+from awin_py.advertiser_api import TokenBucketRateLimiter
+from stub_server import start_stub_server
+
+
+class UnpooledAwin(Awin):
+    """The previous behaviour: every request goes through ``requests.request``."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.session = requests
+        self._owns_session = False
+
+
+def run(client:Awin, windows:int) -> float:
+    end_date = datetime(2024, 1, 1)
+    start_date = end_date - timedelta(days=31 * windows)
+    started = time.perf_counter()
+    client.get_transactions(start_date=start_date, end_date=end_date)
+    return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--windows', type=int, default=24, help='number of 31 day windows to fetch')
+    parser.add_argument('--handshake-delay', type=float, default=0.05, help='simulated seconds per new connection')
+    parser.add_argument('--records', type=int, default=10, help='records returned per window')
+    args = parser.parse_args()
+
+    for name, client_class in (('per-request connection', UnpooledAwin), ('pooled session', Awin)):
+        server = start_stub_server(handshake_delay=args.handshake_delay, records_per_window=args.records)
+        try:
+            # the stub server has no request budget, so the rate limiter must not skew the timings
+            rate_limiter = TokenBucketRateLimiter(requests_per_minute=10**6)
+            with client_class(base_url=server.url, client_id='11111', client_secret='secret', rate_limiter=rate_limiter) as client:
+                elapsed = run(client, args.windows)
+            print(f'{name:>24}: {elapsed:7.3f}s  requests={server.requests}  connections={server.connections}')
+        finally:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
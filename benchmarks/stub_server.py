@@ -0,0 +1,289 @@
+"""
+A local stand-in for the Awin advertiser API, used by the benchmarks.
+
+The server speaks HTTP/1.1 with keep-alive, so clients that reuse connections
+only pay the connection setup once. ``handshake_delay`` simulates the cost of
+the TCP+TLS handshake of the real API on every new connection.
+
+It serves ``accounts``, ``advertisers/{id}/publishers``, ``advertisers/{id}/transactions/``
+and ``advertisers/{id}/reports/{publisher,creative,campaign}`` with synthetic data.
+Reports requested with ``interval=day`` repeat their rows for every day, with the day in a ``date`` field.
+With ``records_per_day`` the transactions are spread evenly over time, so a window returns
+the transactions of its date range and the same transaction always has the same id.
+``latency``, ``rate_429`` and ``rate_5xx`` simulate a slow and unreliable API.
+"""
+import gzip
+import json
+import math
+import multiprocessing
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+EPOCH = datetime(2000, 1, 1)
+
+
+def make_transaction(transaction_id:int, transaction_date:str = "2024-05-14T20:59:00") -> Dict[str, Any]:
+    """
+    Build a synthetic transaction that looks like an Awin API transaction.
+    """
+    return {
+        "id": transaction_id,
+        "advertiserId": 11111,
+        "publisherId": 426667 + transaction_id % 50,
+        "commissionStatus": ("pending", "approved", "declined")[transaction_id % 3],
+        "saleAmount": {"amount": 42.56, "currency": "EUR"},
+        "commissionAmount": {"amount": 4.26, "currency": "EUR"},
+        "clickRefs": {"clickRef": "9184c7g4-9gbb-48g7-9e43-44717t5bed70"},
+        "transactionDate": transaction_date,
+        "validationDate": None,
+        "orderRef": str(99439999999 + transaction_id),
+        "transactionParts": [{"amount": 42.56, "commissionAmount": 4.26, "commissionGroupCode": "DEFAULT",
+                              "commissionGroupId": 167797, "commissionGroupName": "Default"}],
+    }
+
+
+def make_report_row(kind:str, key:int) -> Dict[str, Any]:
+    """
+    Build a synthetic row of an aggregated report.
+
+    :param kind: 'publisher', 'creative' or 'campaign'
+    :param key: number of the row
+    """
+    row = {
+        "advertiserId": 11111,
+        "advertiserName": "Stub Shop",
+        "publisherId": 426667 + key,
+        "publisherName": f"Publisher {key}",
+        "region": "DE",
+        "currency": "EUR",
+        "impressions": 1000 + key,
+        "clicks": 100 + key,
+        "pendingNo": key % 7,
+        "pendingValue": 12.5 * (key % 7),
+        "pendingComm": 1.25 * (key % 7),
+        "confirmedNo": key % 5,
+        "confirmedValue": 20.0 * (key % 5),
+        "confirmedComm": 2.0 * (key % 5),
+        "declinedNo": key % 3,
+        "declinedValue": 8.0 * (key % 3),
+        "declinedComm": 0.8 * (key % 3),
+        "totalNo": key % 7 + key % 5 + key % 3,
+        "totalValue": 12.5 * (key % 7) + 20.0 * (key % 5) + 8.0 * (key % 3),
+        "totalComm": 1.25 * (key % 7) + 2.0 * (key % 5) + 0.8 * (key % 3),
+        "tags": [],
+    }
+    if kind == 'creative':
+        row.update(creativeId=900000 + key, creativeName=f"Banner {key}", tagName=None)
+    elif kind == 'campaign':
+        row.update(campaign=f"campaign-{key % 10}")
+    return row
+
+
+def _parse_date(value:Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.rstrip('Z'))
+    except ValueError:
+        return None
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+        time.sleep(self.server.handshake_delay)
+
+    def do_GET(self) -> None:
+        server = self.server
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        path = url.path.rstrip('/')
+        if path == '/__stats':
+            return self._send(200, server.stats())
+        with server.lock:
+            server.requests += 1
+            roll = server.random.random()
+        if server.latency:
+            time.sleep(server.latency)
+
+        if roll < server.rate_429:
+            with server.lock:
+                server.throttled += 1
+            return self._send(429, {"error": "Too Many Requests", "description": "rate limit exceeded"},
+                              {"Retry-After": str(server.retry_after)})
+        if roll < server.rate_429 + server.rate_5xx:
+            with server.lock:
+                server.failed += 1
+            return self._send(503, {"error": "Service Unavailable", "description": "try again later"})
+
+        if path.endswith('/accounts'):
+            payload: Any = {"userId": 1, "accounts": [
+                {"accountId": 11111 + i, "accountName": f"Stub Shop {i}", "accountType": "advertiser", "userRole": "admin"}
+                for i in range(server.advertisers)]}
+        elif path.endswith('/publishers'):
+            payload = [{"id": 426667 + i, "name": f"Publisher {i}"} for i in range(server.publishers)]
+        elif '/reports/' in path:
+            payload = self._report(path.rsplit('/', 1)[-1], params)
+        elif path.endswith('/transactions'):
+            payload = self._transactions(params)
+        else:
+            return self._send(404, {"error": "Not Found", "description": url.path})
+        with server.lock:
+            server.records += len(payload) if isinstance(payload, list) else 1
+        self._send(200, payload)
+
+    def _report(self, kind:str, params:Dict[str, str]) -> List[Dict[str, Any]]:
+        rows = [make_report_row(kind, i) for i in range(self.server.report_rows)]
+        start = _parse_date(params.get('startDate'))
+        end = _parse_date(params.get('endDate'))
+        if params.get('interval') != 'day' or start is None or end is None:
+            return rows
+        # one set of rows per day, both dates included
+        return [dict(row, date=(start + timedelta(days=i)).date().isoformat())
+                for i in range((end - start).days + 1) for row in rows]
+
+    def _transactions(self, params:Dict[str, str]) -> List[Dict[str, Any]]:
+        server = self.server
+        if 'ids' in params:
+            ids = [int(i) for i in params['ids'].split(',') if i.strip()]
+            return [make_transaction(i) for i in ids]
+        start = _parse_date(params.get('startDate'))
+        end = _parse_date(params.get('endDate'))
+        if server.records_per_day is None or start is None or end is None:
+            return [make_transaction(i) for i in range(server.records_per_window)]
+        # the transactions are spaced evenly, transaction k happens at EPOCH + k * spacing.
+        # Both dates are included, like in the real API
+        spacing = 86400 / server.records_per_day
+        first = math.ceil((start - EPOCH).total_seconds() / spacing)
+        last = math.floor((end - EPOCH).total_seconds() / spacing)
+        return [make_transaction(k, (EPOCH + timedelta(seconds=k * spacing)).isoformat(timespec='seconds'))
+                for k in range(first, last + 1)]
+
+    def _send(self, status:int, payload:Any, headers:Dict[str, str] = None) -> None:
+        body = json.dumps(payload).encode()
+        gzipped = self.server.gzip and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body, compresslevel=1)
+        with self.server.lock:
+            self.server.bytes_sent += len(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format:str, *args) -> None:
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    :param address: (host, port) to listen on
+    :param handshake_delay: seconds of delay on every new connection
+    :param records_per_window: transactions per response if ``records_per_day`` is not set
+    :param records_per_day: transactions per day. Responses contain the transactions of the requested range (optional)
+    :param latency: seconds of delay on every request
+    :param rate_429: share of requests answered with 429 Too Many Requests
+    :param rate_5xx: share of requests answered with 503 Service Unavailable
+    :param retry_after: value of the ``Retry-After`` header of 429 responses
+    :param publishers: number of publishers
+    :param report_rows: rows of every report
+    :param advertisers: number of advertiser accounts
+    :param gzip: compress responses for clients that accept gzip
+    :param seed: seed of the random errors
+    """
+    daemon_threads = True
+
+    def __init__(self,
+                 address:Tuple[str, int],
+                 handshake_delay:float = 0.0,
+                 records_per_window:int = 10,
+                 records_per_day:int = None,
+                 latency:float = 0.0,
+                 rate_429:float = 0.0,
+                 rate_5xx:float = 0.0,
+                 retry_after:float = 0,
+                 publishers:int = 50,
+                 report_rows:int = 50,
+                 advertisers:int = 1,
+                 gzip:bool = True,
+                 seed:int = 0) -> None:
+        super().__init__(address, StubHandler)
+        self.handshake_delay = handshake_delay
+        self.records_per_window = records_per_window
+        self.records_per_day = records_per_day
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after = retry_after
+        self.publishers = publishers
+        self.report_rows = report_rows
+        self.advertisers = advertisers
+        self.gzip = gzip
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+        self.records = 0
+        self.bytes_sent = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        :return: the counters of the server, also served at ``/__stats``
+        """
+        with self.lock:
+            return {'connections': self.connections, 'requests': self.requests, 'throttled': self.throttled,
+                    'failed': self.failed, 'records': self.records, 'bytes_sent': self.bytes_sent}
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+def start_stub_server(**kwargs) -> StubServer:
+    """
+    Start a ``StubServer`` on a free local port in a background thread.
+
+    :param kwargs: passed on to ``StubServer``
+    :return: the running server. Call ``shutdown()`` to stop it
+    """
+    server = StubServer(("127.0.0.1", 0), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _serve(connection:Any, kwargs:Dict[str, Any]) -> None:
+    server = StubServer(("127.0.0.1", 0), **kwargs)
+    connection.send(server.url)
+    server.serve_forever()
+
+
+def start_stub_process(**kwargs) -> Tuple[multiprocessing.Process, str]:
+    """
+    Start a ``StubServer`` in a child process, so that its memory and CPU do not count towards the client
+    that is measured. The counters of the server are served at ``/__stats``.
+
+    :param kwargs: passed on to ``StubServer``
+    :return: the process and the URL of the server. Call ``terminate()`` on the process to stop it
+    """
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(target=_serve, args=(child, kwargs), daemon=True)
+    process.start()
+    return process, parent.recv()
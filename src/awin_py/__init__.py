@@ -1 +1 @@
-from .advertiser_api import Awin
+from .advertiser_api import Awin, AsyncAwin
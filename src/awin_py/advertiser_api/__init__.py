@@ -1,2 +1,18 @@
 from .client import Awin
+from .async_client import AsyncAwin
+from .ratelimit import (RateLimiter, SlidingWindowRateLimiter, SQLiteSlidingWindowRateLimiter, TokenBucketRateLimiter,
+                        SQLiteTokenBucketRateLimiter)
+from .scheduler import PriorityScheduler
+from .retry import RetryMetrics, RetryPolicy
+from .cache import ResponseCache, SQLiteResponseCache
+from .sync import SyncStateStore
+from .store import TransactionStore
+from .diff import FingerprintStore, TransactionDiff
+from .checkpoint import Checkpoint, open_checkpoint
+from .memo import RequestMemo
+from .instrumentation import ClientStats, Histogram, RequestEvent
+from .export import PartitionedWriter, export_reports, export_transactions
+from .rollup import ReportRollup
+from .workqueue import WorkQueue, WorkUnit, run_worker
+from .multi import AdvertiserResult, MultiAdvertiserRunner
 from .errors import *
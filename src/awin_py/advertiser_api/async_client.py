@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from urllib.parse import urljoin
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+from .client import Awin
+from .errors import AwinError, AwinApiError, MissingTransactionsError
+from .ratelimit import RateLimiter, SlidingWindowRateLimiter
+from .retry import RetryMetrics, RetryPolicy
+from .literals import DateType, Interval, Region, Timezone, TransactionStatus
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover
+    aiohttp = None
+"""
+asyncio implementation of the Awin API functions.
+Requires the optional ``aiohttp`` dependency: pip install awin-py[async]
+
+Docs: https://wiki.awin.com/index.php/Advertiser_API
+"""
+
+class AsyncAwin:
+    """
+    Asynchronous counterpart of ``Awin``. Every ``get_*`` method of ``Awin`` is
+    available as a coroutine with the same parameters and results.
+
+    Many clients (e.g. one per advertiser) can share one ``aiohttp.ClientSession``
+    and one ``asyncio.Semaphore``, which bounds the number of requests in flight
+    across all of them.
+    """
+    BASE_URL = Awin.BASE_URL
+    """base URL of the Awin HTTP API"""
+
+    def __init__(self, 
+                 base_url:str = None, 
+                 client_id:str = None, 
+                 client_secret:str = None,
+                 max_retries:int = 3,
+                 default_retry_wait = 60,
+                 max_concurrency:int = 10,
+                 semaphore:asyncio.Semaphore = None,
+                 pool_maxsize:int = 100,
+                 connect_timeout:float = 10,
+                 read_timeout:float = 300,
+                 session:'aiohttp.ClientSession' = None,
+                 rate_limiter:RateLimiter = None,
+                 retry_policy:RetryPolicy = None) -> None:
+        """
+        :param base_url: base URL of the Awin API (optional)
+        :param client_id: the advertiser id. Defaults to the CLIENT_ID environment variable
+        :param client_secret: the API token. Defaults to the CLIENT_SECRET environment variable
+        :param max_retries: how often a failed request is retried. Ignored if ``retry_policy`` is passed
+        :param default_retry_wait: seconds to wait after a 429 response without ``Retry-After``, and the maximum backoff
+            between other attempts. Ignored if ``retry_policy`` is passed
+        :param max_concurrency: maximum number of requests in flight. Ignored if ``semaphore`` is passed
+        :param semaphore: a semaphore shared with other clients to limit the requests in flight across all of them (optional)
+        :param pool_maxsize: maximum number of connections kept open by the session
+        :param connect_timeout: seconds to wait for a connection to the API
+        :param read_timeout: seconds to wait for the API to send a response
+        :param session: a ``aiohttp.ClientSession`` to use instead of creating one (optional).
+            A session passed in is not closed by ``close()``
+        :param rate_limiter: the rate limiter every request waits for. Pass the same instance to several clients
+            to share one budget between them. Defaults to a ``SlidingWindowRateLimiter`` with 20 requests per minute
+        :param retry_policy: decides which failed requests are retried and how long to wait.
+            Defaults to a ``RetryPolicy`` built from ``max_retries`` and ``default_retry_wait``
+            that also retries aiohttp connection errors and timeouts
+        """
+        if aiohttp is None:
+            raise AwinError("AsyncAwin requires aiohttp. Install it with: pip install awin-py[async]")
+        self.base_url = base_url or self.BASE_URL
+
+        self.client_id = client_id or os.getenv('CLIENT_ID')
+        self.client_secret = client_secret or os.getenv('CLIENT_SECRET')
+
+        self.headers = {
+            "Authorization": f"Bearer {self.client_secret}"
+        }
+        self.max_retries = max_retries
+        self.default_retry_wait = default_retry_wait
+        self.max_concurrency = max_concurrency
+        self._semaphore = semaphore
+        self.pool_maxsize = pool_maxsize
+        self.rate_limiter = rate_limiter or SlidingWindowRateLimiter(requests_per_minute=20)
+        self.retry_policy = retry_policy or RetryPolicy(
+            max_retries=max_retries,
+            max_backoff=default_retry_wait,
+            throttle_wait=default_retry_wait,
+            retry_exceptions=(aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError, asyncio.TimeoutError))
+        self.retry_metrics = RetryMetrics()
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+
+        self._owns_session = session is None
+        self.session = session
+
+    def _get_session(self) -> 'aiohttp.ClientSession':
+        # the session has to be created inside the running event loop
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # created inside the running event loop like the session, on Python < 3.10 a semaphore
+        # created outside of it is bound to another loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @staticmethod
+    async def _gather(coroutines:List[Any]) -> List[Any]:
+        """
+        Run coroutines concurrently like ``asyncio.gather``, but cancel all of them once one fails,
+        so that the others don't keep retrying and spending the rate budget after the error was raised.
+
+        :return: the results in the order of the coroutines
+        """
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def close(self) -> None:
+        """
+        Close all pooled connections of this client.
+        """
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def __aenter__(self) -> 'AsyncAwin':
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    @staticmethod
+    def _encode_params(params:Optional[Dict[str, Any]]) -> List[Tuple[str, str]]:
+        """
+        Encode URL parameters the same way ``requests`` does: ``None`` values are dropped,
+        lists are repeated keys and all other values are converted to strings.
+        """
+        encoded = []
+        for key, value in (params or {}).items():
+            if value is None:
+                continue
+            values = value if isinstance(value, (list, tuple)) else [value]
+            encoded.extend((key, str(v)) for v in values)
+        return encoded
+
+    async def _request(self, 
+                       path:str, 
+                       params:Dict[str, Any] = None, 
+                       method='GET',
+                       priority:str = None) -> List[Dict[str, Any]]:
+        """
+        Make a request against the AWIN API.
+
+        :param path: the URL path for this request (relative to the Awin API base URL)
+        :param params: dictionary of URL parameters (optional)
+        :param method: the HTTP request method (default: GET)
+        :param priority: priority class of the request, see ``Awin._send``
+        :return: the parsed json response, when the request was successful, or a AwinApiError
+            once the request failed and can not be retried
+        """
+        url = urljoin(self.base_url, path)
+        encoded_params = self._encode_params(params)
+        session = self._get_session()
+        policy = self.retry_policy
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            try:
+                async with self.semaphore:
+                    # the token is taken once a slot is free, so that at most ``max_concurrency`` requests
+                    # hold a token while they wait, and cancelled requests give theirs back
+                    await self.rate_limiter.acquire_async(priority=priority)
+                    async with session.request(method, url, headers=self.headers, params=encoded_params) as response:
+                        text = await response.text()
+                        status = response.status
+                        retry_after_header = response.headers.get('Retry-After')
+            except policy.retry_exceptions as e:
+                error, reason, retry_after, status_code = e, type(e).__name__, None, None
+            else:
+                if 200 <= status < 400:
+                    try:
+                        return json.loads(text)
+                    except ValueError:
+                        raise AwinError(f"Failed to parse response as json: {text}")
+                error = AwinApiError.from_text(status, text, response)
+                if not policy.is_retryable_status(status):
+                    raise error
+                reason = str(status)
+                status_code = status
+                retry_after = policy.parse_retry_after(retry_after_header)
+
+            wait = policy.next_wait(attempt, started, retry_after, status_code)
+            if wait is None:
+                self.retry_metrics.record_give_up()
+                raise error
+            logging.warning(f"Request failed ({reason}). Retrying in {wait:.1f} seconds...")
+            self.retry_metrics.record_retry(reason, wait)
+            await asyncio.sleep(wait)
+            attempt += 1
+
+    async def _paginate_date_range(self, 
+                                   path:str, 
+                                   start_date:date, 
+                                   end_date:date, 
+                                   is_report:bool, 
+                                   params=None) -> List[Dict[str, Any]]:
+        """
+        Paginate over a provided date range. All windows are requested concurrently,
+        bounded by the semaphore and the rate limiter of the client.
+        Returns a list of results in date order
+
+        :param path: the URL path (relative to the Awin API base URL)
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param is_report: boolean to indicate if report endpoint or other. Necessary for date formats
+        :param params: dictionary of URL parameters
+        :return: list of transactions
+        """
+        windows = Awin._date_windows(start_date, end_date, is_report)
+
+        async def fetch_window(i:int, dt_start_str:str, dt_end_str:str) -> List[Dict[str, Any]]:
+            logging.info(f'current request is number {i}')
+            logging.info(f'Start date: {dt_start_str}. End date: {dt_end_str}')
+            window_params = dict(params or {}, startDate=dt_start_str, endDate=dt_end_str)
+            return await self._request(f'advertisers/{self.client_id}/{path}', window_params, priority='bulk')
+
+        # gather returns the results in the order of the windows
+        results = await self._gather([fetch_window(i, *window) for i, window in enumerate(windows)])
+        total_transaction_list = []
+        for pag_transaction_list in results:
+            total_transaction_list.extend(pag_transaction_list)
+        return total_transaction_list
+
+    async def get_accounts(self) -> List[Dict[str, Any]]:
+        """
+        GET accounts
+        provides a list of accounts you have access to
+
+        :return: list of ``account`` instances
+
+        https://wiki.awin.com/index.php/API_get_accounts
+        """
+        return await self._request('accounts', priority='interactive')
+
+    async def get_publishers(self) -> List[Dict[str, Any]]:
+        """
+        GET publishers
+        provides a list of publishers you have an active relationship with
+
+        :return: list of ``publisher`` instances
+
+        https://wiki.awin.com/index.php/API_get_publishers
+        """
+        return await self._request(f'advertisers/{self.client_id}/publishers', priority='interactive')
+
+    async def get_transactions(self, 
+                               start_date:date, 
+                               end_date:date, 
+                               date_type:Optional[DateType] = 'transaction', 
+                               timezone:Optional[Timezone] = 'UTC', 
+                               status:Optional[TransactionStatus] = None, 
+                               publisher_id:str = None, 
+                               show_basket_products:bool = None) -> List[Dict[str, Any]]:
+        """
+        GET transactions (list)
+        provides a list of your individual transactions. See ``Awin.get_transactions``
+
+        https://wiki.awin.com/index.php/API_get_transactions_list
+        """
+        params = {
+            'timezone': timezone,
+            'dateType': date_type,
+            'status': status,
+            'publisherId': publisher_id,
+            'showBasketProducts': show_basket_products
+        }
+        return await self._paginate_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False, params=params)
+
+    async def get_transactions_by_id(self, 
+                                     ids:List[str], 
+                                     timezone:Optional[Timezone] = 'UTC', 
+                                     show_basket_products:bool = None,
+                                     batch_size:int = None,
+                                     raise_on_missing:bool = False) -> List[Dict[str, Any]]:
+        """
+        GET transactions (list)
+        provides a list of transactions by id. See ``Awin.get_transactions_by_id``.
+        The chunks of ids are requested concurrently, bounded by the concurrency limit of the client
+
+        https://wiki.awin.com/index.php/API_get_transactions_ids
+        """
+        unique_ids = list(dict.fromkeys(str(id).strip() for id in ids))
+        chunks = Awin._chunk_ids(unique_ids, batch_size or Awin.ID_BATCH_SIZE, Awin.MAX_IDS_LENGTH)
+        path = f'advertisers/{self.client_id}/transactions/'
+        results = await self._gather([self._request(path, {
+            'ids': ','.join(chunk),
+            'timezone': timezone,
+            'showBasketProducts': show_basket_products
+        }, priority='interactive') for chunk in chunks])
+
+        position = {id: i for i, id in enumerate(unique_ids)}
+        transactions = [transaction for result in results for transaction in result or []]
+        transactions.sort(key=lambda transaction: position.get(str(transaction.get('id')), len(position)))
+
+        found = {str(transaction.get('id')) for transaction in transactions}
+        missing_ids = [id for id in unique_ids if id not in found]
+        if missing_ids:
+            logging.warning(f'{len(missing_ids)} of {len(unique_ids)} transaction ids were not found: {missing_ids}')
+            if raise_on_missing:
+                raise MissingTransactionsError(missing_ids, transactions)
+        return transactions
+
+    async def get_reports_agg_by_publisher(self, 
+                                           start_date:date, 
+                                           end_date:date, 
+                                           date_type:Optional[DateType] = 'transaction', 
+                                           timezone:Optional[Timezone] = 'UTC') -> List[Dict[str, Any]]:
+        """
+        GET reports aggregated by publisher
+        provides aggregated reports for the publishers you work with. See ``Awin.get_reports_agg_by_publisher``
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrcampaign_adv
+        """
+        params = {
+            'date_type': date_type,
+            'timezone': timezone,
+        }
+        return await self._paginate_date_range(path='reports/publisher', start_date=start_date, end_date=end_date, is_report=True, params=params)
+
+    async def get_reports_agg_by_creative(self, 
+                                          start_date:date, 
+                                          end_date:date, 
+                                          date_type:Optional[DateType] = 'transaction', 
+                                          region:Optional[Region] = 'DE',
+                                          timezone:Optional[Timezone] = 'UTC') -> List[Dict[str, Any]]:
+        """
+        GET reports aggregated by creative
+        provides aggregated reports for the creatives you used. See ``Awin.get_reports_agg_by_creative``
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrbycreative_adv
+        """
+        params = {
+            'date_type': date_type,
+            'region': region,
+            'timezone': timezone,
+        }
+        return await self._paginate_date_range(path='reports/creative', start_date=start_date, end_date=end_date, is_report=True, params=params)
+
+    async def get_reports_agg_by_campaign(self, 
+                                          start_date:date, 
+                                          end_date:date, 
+                                          campaign:str = None,
+                                          timezone:Optional[Timezone] = 'UTC',
+                                          publisher_ids:List[int] = None,
+                                          include_numbers_without_campaign:bool = False,
+                                          interval:Optional[Interval] = None) -> List[Dict[str, Any]]:
+        """
+        GET reports aggregated by campaign
+        provides aggregated reports for the campaigns that the publisher promotes. See ``Awin.get_reports_agg_by_campaign``
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrbycampaign_adv
+        """
+        params = {
+            'campaign': campaign,
+            'timezone': timezone,
+            'publisher_ids': publisher_ids,
+            'include_numbers_without_campaign': include_numbers_without_campaign,
+            'interval': interval
+        }
+        return await self._paginate_date_range(path='reports/campaign', start_date=start_date, end_date=end_date, is_report=True, params=params)
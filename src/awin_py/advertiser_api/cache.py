@@ -0,0 +1,168 @@
+"""
+persistent cache for responses of the Awin API
+
+Responses for date windows that lie far enough in the past never change, so the
+cache can keep them forever ("frozen"), while everything else expires after a TTL.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """
+    Base class of response caches. ``Awin`` looks up every GET request in its cache
+    before sending it, and stores every successful response.
+
+    Responses depend on the API and the token they were requested with (e.g. ``accounts``),
+    so clients pass a ``namespace`` from ``namespace(base_url, client_secret)`` and a cache
+    shared by several clients never answers one with the responses of another.
+    """
+
+    def get(self, method:str, path:str, params:Optional[Dict[str, Any]], namespace:str = None) -> Optional[Any]:
+        """
+        :return: the cached parsed json response, or None if there is no valid entry
+        """
+        raise NotImplementedError
+
+    def set(self, method:str, path:str, params:Optional[Dict[str, Any]], value:Any, namespace:str = None) -> None:
+        """
+        Store a parsed json response.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def namespace(base_url:str, client_secret:Optional[str]) -> str:
+        """
+        :return: a key of the API and the token, which does not reveal the token
+        """
+        return hashlib.sha256(f"{base_url}\n{client_secret or ''}".encode()).hexdigest()
+
+    @staticmethod
+    def key(method:str, path:str, params:Optional[Dict[str, Any]], namespace:str = None) -> str:
+        """
+        A stable key of a request. Parameters that are ``None`` are not sent, so they are ignored.
+        """
+        relevant_params = {k: v for k, v in (params or {}).items() if v is not None}
+        raw = json.dumps([namespace, method, path, relevant_params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """
+    A response cache stored in a SQLite database, with TTLs, frozen windows and LRU eviction.
+    Responses are keyed by their exact request parameters, so date ranges should start at
+    fixed times (e.g. midnight) for the windows of different runs to match.
+
+    :param path: path of the SQLite database file. Created if it does not exist
+    :param ttl: seconds a response stays valid. None keeps responses until they are evicted
+    :param ttl_by_path: TTLs for requests whose path contains the given string, e.g. ``{'publishers': 86400}``.
+        Take precedence over ``ttl``
+    :param freeze_after: responses of date windows that ended longer ago than this never expire,
+        e.g. ``timedelta(days=90)`` for transactions that can not change any more (optional)
+    :param max_size: maximum size of all cached responses in bytes. The least recently used
+        responses are evicted first (optional)
+    :ivar hits: number of requests answered from the cache
+    :ivar misses: number of requests that were not in the cache
+    """
+
+    def __init__(self,
+                 path:str,
+                 ttl:Optional[float] = 86400,
+                 ttl_by_path:Dict[str, float] = None,
+                 freeze_after:timedelta = None,
+                 max_size:int = None) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.ttl_by_path = ttl_by_path or {}
+        self.freeze_after = freeze_after
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                path TEXT,
+                body BLOB,
+                size INTEGER,
+                created REAL,
+                accessed REAL,
+                frozen INTEGER
+            )""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    def _ttl(self, path:str) -> Optional[float]:
+        for fragment, ttl in self.ttl_by_path.items():
+            if fragment in path:
+                return ttl
+        return self.ttl
+
+    def _is_frozen(self, params:Optional[Dict[str, Any]]) -> bool:
+        if self.freeze_after is None or not params or not params.get('endDate'):
+            return False
+        try:
+            window_end = datetime.fromisoformat(params['endDate'])
+        except ValueError:
+            return False
+        return window_end < datetime.now() - self.freeze_after
+
+    def get(self, method:str, path:str, params:Optional[Dict[str, Any]], namespace:str = None) -> Optional[Any]:
+        key = self.key(method, path, params, namespace)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, created, frozen FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                body, created, frozen = row
+                ttl = self._ttl(path)
+                if frozen or ttl is None or now - created <= ttl:
+                    self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    self.hits += 1
+                    return json.loads(zlib.decompress(body))
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def set(self, method:str, path:str, params:Optional[Dict[str, Any]], value:Any, namespace:str = None) -> None:
+        body = zlib.compress(json.dumps(value).encode())
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, path, body, size, created, accessed, frozen) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.key(method, path, params, namespace), path, body, len(body), now, now, int(self._is_frozen(params))))
+            if self.max_size is not None:
+                self._evict()
+
+    def _evict(self) -> None:
+        total_size = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total_size <= self.max_size:
+            return
+        rows = self._connection.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total_size <= self.max_size:
+                break
+            evicted.append((key,))
+            total_size -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """
+        Remove all cached responses.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __repr__(self) -> str:
+        return f"SQLiteResponseCache(path={self.path!r}, hits={self.hits}, misses={self.misses})"
@@ -0,0 +1,99 @@
+"""
+checkpoints for long multi-window backfills
+
+Every completed date window is written to a local directory together with a manifest,
+so a backfill that failed halfway can be rerun with the same arguments and only
+fetches the windows that are still missing.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Checkpoint:
+    """
+    The completed windows of one paginated request.
+    Each window is stored as ``window-<n>.json.gz``, ``manifest.json`` maps the window dates to the files.
+    All files are replaced atomically, so an interrupted run never leaves a corrupt checkpoint behind.
+
+    :param directory: the directory of this checkpoint. Created if it does not exist
+    :param description: the arguments of the request, stored in the manifest for reference
+    """
+
+    def __init__(self, directory:str, description:Dict[str, Any]) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self._manifest = json.load(f)
+        else:
+            self._manifest = dict(description, windows={})
+
+    @staticmethod
+    def _window_key(start_date:str, end_date:str) -> str:
+        return f"{start_date}/{end_date}"
+
+    def _write_atomic(self, path:str, data:bytes) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _read_window(self, filename:str) -> List[Dict[str, Any]]:
+        with gzip.open(os.path.join(self.directory, filename), 'rt') as f:
+            return json.load(f)
+
+    def get(self, start_date:str, end_date:str) -> Optional[List[Dict[str, Any]]]:
+        """
+        :return: the results of a completed window, or None if the window is missing
+        """
+        filename = self._manifest['windows'].get(self._window_key(start_date, end_date))
+        return self._read_window(filename) if filename else None
+
+    def get_starting_at(self, start_date:str) -> Optional[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Look up a completed window by its start date only, for windows whose size was not known in advance.
+
+        :return: the end date and results of the completed window, or None if there is none
+        """
+        for key, filename in self._manifest['windows'].items():
+            window_start, window_end = key.split('/')
+            if window_start == start_date:
+                return window_end, self._read_window(filename)
+        return None
+
+    def put(self, start_date:str, end_date:str, results:List[Dict[str, Any]]) -> None:
+        """
+        Store the results of a completed window.
+        """
+        with self._lock:
+            windows = self._manifest['windows']
+            filename = f"window-{len(windows):05d}.json.gz"
+            self._write_atomic(os.path.join(self.directory, filename), gzip.compress(json.dumps(results).encode()))
+            windows[self._window_key(start_date, end_date)] = filename
+            self._write_atomic(self._manifest_path, json.dumps(self._manifest, indent=2).encode())
+
+    def clear(self) -> None:
+        """
+        Delete this checkpoint, e.g. after its results were processed.
+        """
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def open_checkpoint(checkpoint_dir:str, **request:Any) -> Checkpoint:
+    """
+    Open the checkpoint of a paginated request. Requests with the same arguments share a checkpoint.
+
+    :param checkpoint_dir: the directory that holds all checkpoints
+    :param request: the arguments that identify the request, e.g. path, params and date range
+    :return: the checkpoint of this request
+    """
+    description = json.loads(json.dumps(request, sort_keys=True, default=str))
+    key = hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()[:16]
+    return Checkpoint(os.path.join(checkpoint_dir, key), description)
@@ -0,0 +1,128 @@
+"""
+command line interface of awin-py
+
+The credentials are read from the CLIENT_ID and CLIENT_SECRET environment variables, like in ``Awin``.
+
+    awin-py export transactions --start 2020-01-01 --end 2025-01-01 --out ./export --format parquet
+    awin-py export reports --report publisher --start 2024-01-01 --end 2024-12-31 --out ./reports
+
+A backfill can be spread over several workers through a shared work queue:
+
+    awin-py queue plan --db queue.db --endpoint transactions --advertiser 11111 --start 2020-01-01 --end 2025-01-01
+    awin-py --rate-db rate.db worker --db queue.db --out ./results
+    awin-py queue status --db queue.db
+"""
+import argparse
+import json
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from .client import Awin
+from .export import FORMATS, export_reports, export_transactions
+from .ratelimit import SQLiteSlidingWindowRateLimiter
+from .workqueue import ENDPOINTS, WorkQueue, run_worker
+
+
+def _date(value:str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def _client(args:argparse.Namespace) -> Awin:
+    rate_limiter = None
+    if args.rate_db:
+        # all processes that use the same file share one request budget
+        rate_limiter = SQLiteSlidingWindowRateLimiter(args.rate_db, requests_per_minute=args.requests_per_minute)
+    return Awin(client_id=args.client_id, max_workers=args.max_workers, rate_limiter=rate_limiter)
+
+
+def _export(args:argparse.Namespace) -> None:
+    with _client(args) as client:
+        if args.what == 'transactions':
+            manifest = export_transactions(client, args.out, args.start, args.end, format=args.format,
+                                           date_type=args.date_type, granularity=args.granularity or 'day',
+                                           advertiser_ids=args.advertiser, timezone=args.timezone)
+        else:
+            manifest = export_reports(client, args.report, args.out, args.start, args.end, format=args.format,
+                                      granularity=args.granularity or 'month', advertiser_ids=args.advertiser,
+                                      timezone=args.timezone)
+    print(json.dumps({'files': len(manifest['files']), 'records': manifest.get('records', 0)}))
+
+
+def _queue(args:argparse.Namespace) -> None:
+    with WorkQueue(args.db) as queue:
+        if args.action == 'plan':
+            if not args.advertiser or not args.start or not args.end:
+                raise SystemExit('queue plan needs --advertiser, --start and --end')
+            queue.plan(args.advertiser, args.endpoint, args.start, args.end)
+        elif args.action == 'retry-failed':
+            queue.retry_failed()
+        print(json.dumps(queue.counts()))
+        if args.action == 'status':
+            for failure in queue.failures():
+                print(json.dumps(failure))
+
+
+def _worker(args:argparse.Namespace) -> None:
+    with _client(args) as client, WorkQueue(args.db, lease_seconds=args.lease_seconds) as queue:
+        completed = run_worker(client, queue, args.out, worker_id=args.worker_id, idle_timeout=args.idle_timeout)
+        print(json.dumps({'completed': completed, **queue.counts()}))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    :return: the argument parser of the ``awin-py`` command
+    """
+    parser = argparse.ArgumentParser(prog='awin-py', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--client-id', help='advertiser id of the client. Defaults to the CLIENT_ID environment variable')
+    parser.add_argument('--max-workers', type=int, default=1, help='date windows fetched in parallel')
+    parser.add_argument('--log-level', default='INFO', help='logging level, e.g. WARNING')
+    parser.add_argument('--rate-db', help='SQLite file of a rate limiter shared by all processes that use it (optional)')
+    parser.add_argument('--requests-per-minute', type=float, default=20, help='request budget of the shared rate limiter')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    export = commands.add_parser('export', help='export a date range to partitioned JSONL.gz or Parquet files')
+    export.add_argument('what', choices=('transactions', 'reports'))
+    export.add_argument('--start', type=_date, required=True, help='start of the date range, e.g. 2024-01-01')
+    export.add_argument('--end', type=_date, required=True, help='end of the date range, e.g. 2024-12-31')
+    export.add_argument('--out', required=True, help='directory of the export')
+    export.add_argument('--format', choices=FORMATS, default='jsonl')
+    export.add_argument('--granularity', choices=('day', 'month'),
+                        help='partition size. Defaults to day for transactions and month for reports')
+    export.add_argument('--advertiser', action='append',
+                        help='advertiser id to export, can be repeated. Defaults to the advertiser of the client')
+    export.add_argument('--report', choices=('publisher', 'creative', 'campaign'), default='publisher',
+                        help='the report to export')
+    export.add_argument('--date-type', choices=('transaction', 'validation'), default='transaction',
+                        help='the date transactions are selected and partitioned by')
+    export.add_argument('--timezone', default='UTC')
+    export.set_defaults(handler=_export)
+
+    queue = commands.add_parser('queue', help='plan a backfill as work units, or show the state of the work queue')
+    queue.add_argument('action', choices=('plan', 'status', 'retry-failed'))
+    queue.add_argument('--db', required=True, help='SQLite file of the work queue')
+    queue.add_argument('--endpoint', choices=tuple(ENDPOINTS), default='transactions')
+    queue.add_argument('--advertiser', action='append', help='advertiser id to plan, can be repeated')
+    queue.add_argument('--start', type=_date, help='start of the date range, e.g. 2024-01-01')
+    queue.add_argument('--end', type=_date, help='end of the date range, e.g. 2024-12-31')
+    queue.set_defaults(handler=_queue)
+
+    worker = commands.add_parser('worker', help='work on the units of a work queue until it is empty')
+    worker.add_argument('--db', required=True, help='SQLite file of the work queue')
+    worker.add_argument('--out', required=True, help='directory of the results')
+    worker.add_argument('--worker-id', help='identifies the worker. Defaults to hostname:pid')
+    worker.add_argument('--lease-seconds', type=float, default=600, help='seconds a worker owns a unit')
+    worker.add_argument('--idle-timeout', type=float, default=0,
+                        help='seconds to wait for units that are retried later once nothing is left to lease')
+    worker.set_defaults(handler=_worker)
+    return parser
+
+
+def main(argv:Optional[List[str]] = None) -> None:
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    args.handler(args)
+
+
+if __name__ == '__main__':
+    main()
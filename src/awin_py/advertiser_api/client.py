@@ -1,13 +1,32 @@
 import os
+import copy
 from urllib.parse import urljoin
 import requests
+from requests.adapters import HTTPAdapter
 from datetime import datetime, timedelta, date
+from datetime import timezone as dt_timezone
 import time
-from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union, Literal
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type, TypeVar, Union, Literal
 import logging 
 
 
-from .errors import AwinError, AwinApiError
+from .errors import AwinError, AwinApiError, MissingTransactionsError
+from .ratelimit import RateLimiter, SlidingWindowRateLimiter
+from .retry import RetryMetrics, RetryPolicy
+from .cache import ResponseCache
+from .sync import SyncStateStore
+from .store import TransactionStore
+from .diff import FingerprintStore, TransactionDiff
+from .checkpoint import Checkpoint, open_checkpoint
+from .models import Transaction
+from .columnar import ColumnBatch, report_batch, transaction_batch
+from .memo import RequestMemo
+from .instrumentation import ClientStats, RequestEvent, call_hooks, set_span_attributes, span
+from . import jsonstream
+from .literals import DateType, Interval, Region, Timezone, TransactionStatus
 """
 Implementation of the Awin API functions
 
@@ -17,72 +36,340 @@ Docs: https://wiki.awin.com/index.php/Advertiser_API
 class Awin:
     BASE_URL = "https://api.awin.com/"
     """base URL of the Awin HTTP API"""
+    SYNC_OVERLAP = timedelta(minutes=15)
+    """margin for clock differences, subtracted from the validation watermark of ``sync_transactions``"""
+    ID_BATCH_SIZE = 100
+    """default number of ids per request of ``get_transactions_by_id``"""
+    MAX_IDS_LENGTH = 1500
+    """maximum length of the comma separated ``ids`` parameter, which keeps the request URL below common server limits"""
 
     def __init__(self, 
                  base_url:str = None, 
                  client_id:str = None, 
                  client_secret:str = None,
                  max_retries:int = 3,
-                 default_retry_wait = 60) -> None:
+                 default_retry_wait = 60,
+                 pool_connections:int = 10,
+                 pool_maxsize:int = 10,
+                 keep_alive:bool = True,
+                 gzip:bool = True,
+                 connect_timeout:float = 10,
+                 read_timeout:float = 300,
+                 session:requests.Session = None,
+                 max_workers:int = 1,
+                 rate_limiter:RateLimiter = None,
+                 retry_policy:RetryPolicy = None,
+                 cache:ResponseCache = None,
+                 adaptive_windows:bool = False,
+                 target_window_records:int = 5000,
+                 target_window_latency:float = 30,
+                 min_window:timedelta = timedelta(hours=1),
+                 stream_responses:bool = False,
+                 hooks:List[Callable[[RequestEvent], None]] = None,
+                 tracer:Any = None,
+                 memo:RequestMemo = None) -> None:
+        """
+        :param base_url: base URL of the Awin API (optional)
+        :param client_id: the advertiser id. Defaults to the CLIENT_ID environment variable
+        :param client_secret: the API token. Defaults to the CLIENT_SECRET environment variable
+        :param max_retries: how often a failed request is retried. Ignored if ``retry_policy`` is passed
+        :param default_retry_wait: seconds to wait after a 429 response without ``Retry-After``, and the maximum backoff
+            between other attempts. Ignored if ``retry_policy`` is passed
+        :param pool_connections: number of connection pools (one per host) kept by the session
+        :param pool_maxsize: maximum number of connections kept alive per host
+        :param keep_alive: reuse connections between requests. If False every request opens a new connection
+        :param gzip: ask the API for gzip compressed responses
+        :param connect_timeout: seconds to wait for a connection to the API
+        :param read_timeout: seconds to wait for the API to send a response
+        :param session: a preconfigured ``requests.Session`` to use instead of creating one (optional).
+            A session passed in is not closed by ``close()``
+        :param max_workers: number of date windows fetched in parallel by the paginated endpoints.
+            Defaults to 1 (sequential). Values above ``pool_maxsize`` do not open more connections
+        :param rate_limiter: the rate limiter every request waits for. Pass the same instance to several clients
+            to share one budget between them. Defaults to a ``SlidingWindowRateLimiter`` with 20 requests per minute.
+            A ``PriorityScheduler`` sends lookups by id, accounts and publishers ahead of the paginated windows
+        :param retry_policy: decides which failed requests are retried and how long to wait.
+            Defaults to a ``RetryPolicy`` built from ``max_retries`` and ``default_retry_wait``
+        :param cache: cache for the responses of GET requests, e.g. a ``SQLiteResponseCache`` (optional)
+        :param adaptive_windows: size the date windows of the paginated endpoints by the observed response sizes
+            and latencies instead of always requesting 31 days
+        :param target_window_records: with adaptive windows, the number of results per window above which windows shrink
+        :param target_window_latency: with adaptive windows, the seconds per request above which windows shrink
+        :param min_window: with adaptive windows, the smallest window of transactions. Report windows are at least one day
+        :param stream_responses: parse the responses of the paginated endpoints element by element while they download,
+            so that memory per window is bounded by one result instead of the whole response. Streamed windows are
+            fetched one after another. Not used with a cache, a checkpoint or adaptive windows
+        :param hooks: functions that are called with a ``RequestEvent`` after every attempt of a request (optional).
+            Hooks are called from the worker threads and should return quickly
+        :param tracer: an OpenTelemetry compatible tracer, e.g. ``opentelemetry.trace.get_tracer('awin_py')``.
+            Every request is recorded as an ``awin.request`` span (optional)
+        :param memo: keeps the results of ``get_accounts`` and ``get_publishers`` in memory and coalesces concurrent
+            calls into one request. Pass the same instance to several clients to share it.
+            Defaults to a ``RequestMemo`` that keeps results for 5 minutes
+        """
         self.base_url = base_url or self.BASE_URL
         
         self.client_id = client_id or os.getenv('CLIENT_ID')
         self.client_secret = client_secret or os.getenv('CLIENT_SECRET')
         
         self.headers = {
-            "Authorization": f"Bearer {self.client_secret}"
+            "Authorization": f"Bearer {self.client_secret}",
+            "Accept-Encoding": "gzip, deflate" if gzip else "identity",
+            "Connection": "keep-alive" if keep_alive else "close",
         }
         self.max_retries = max_retries
         self.default_retry_wait = default_retry_wait
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or SlidingWindowRateLimiter(requests_per_minute=20)
+        self.retry_policy = retry_policy or RetryPolicy(max_retries=max_retries, max_backoff=default_retry_wait,
+                                                        throttle_wait=default_retry_wait)
+        self.retry_metrics = RetryMetrics()
+        self.cache = cache
+        self.adaptive_windows = adaptive_windows
+        self.target_window_records = target_window_records
+        self.target_window_latency = target_window_latency
+        self.min_window = min_window
+        self.stream_responses = stream_responses
+        self.stats = ClientStats()
+        self.hooks = list(hooks or [])
+        self.tracer = tracer
+        self.memo = memo if memo is not None else RequestMemo(ttl=300)
+
+        self._owns_session = session is None
+        self.session = session or self._create_session(pool_connections, pool_maxsize)
+
+    @staticmethod
+    def _create_session(pool_connections:int, pool_maxsize:int) -> requests.Session:
+        """
+        Create a ``requests.Session`` with a connection pool, so that TCP and TLS
+        connections are reused across requests instead of being opened for every request.
+
+        :param pool_connections: number of connection pools (one per host)
+        :param pool_maxsize: maximum number of connections kept alive per host
+        :return: the configured session
+        """
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self) -> None:
+        """
+        Close all pooled connections of this client.
+        """
+        if self._owns_session:
+            self.session.close()
+
+    def for_advertiser(self, client_id:str) -> 'Awin':
+        """
+        Create a client for another advertiser that shares the session (and with it the connection pool),
+        the rate limiter, the retry policy and metrics and the cache of this client.
+        Closing the returned client does not close the shared session.
+
+        :param client_id: the advertiser id
+        :return: the client for the advertiser
+        """
+        client = copy.copy(self)
+        client.client_id = str(client_id)
+        client._owns_session = False
+        return client
+
+    def __enter__(self) -> 'Awin':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _send(self, 
+              path:str, 
+              params:Dict[str, Any] = None, 
+              method='GET',
+              retry_timeouts:bool = True,
+              stream:bool = False,
+              priority:str = None) -> requests.Response:
+            """
+            Send a request to the AWIN API until it succeeds or can not be retried
+            according to the retry policy of the client.
+
+            :param path: the URL path for this request (relative to the Awin API base URL)
+            :param params: dictionary of URL parameters (optional)
+            :param method: the HTTP request method (default: GET)
+            :param retry_timeouts: retry requests that time out. If False a ``requests.Timeout`` is raised right away
+            :param stream: don't download the body before returning the response
+            :param priority: priority class of the request, for rate limiters that schedule by priority
+                like ``PriorityScheduler``. Interactive lookups use 'interactive', paginated windows 'bulk'
+            :return: the successful HTTP response, or a AwinApiError once the request failed and can not be retried
+            """
+            url = urljoin(self.base_url, path)
+            policy = self.retry_policy
+            started = time.monotonic()
+            attempt = 0
+
+            with span(self.tracer, 'awin.request', {'http.request.method': method, 'url.path': path}) as current:
+                while True:
+                    # make sure rate limit is not reached
+                    throttle_started = time.monotonic()
+                    self.rate_limiter.acquire(priority=priority)
+                    self.stats.record_throttle(time.monotonic() - throttle_started)
+                    request_started = time.monotonic()
+                    try:
+                        response = self.session.request(method, url, headers=self.headers, params=params, timeout=self.timeout, stream=stream)
+                    except policy.retry_exceptions as e:
+                        self._record_attempt(method, path, params, attempt, request_started, error=e)
+                        if not retry_timeouts and isinstance(e, requests.Timeout):
+                            raise
+                        error, reason, retry_after, status_code = e, type(e).__name__, None, None
+                    else:
+                        self._record_attempt(method, path, params, attempt, request_started, response=response, stream=stream)
+                        if response.ok:
+                            set_span_attributes(current, {'http.response.status_code': response.status_code, 'awin.attempts': attempt + 1})
+                            return response
+                        error = AwinApiError.from_response(response)
+                        if not policy.is_retryable_status(response.status_code):
+                            set_span_attributes(current, {'http.response.status_code': response.status_code, 'awin.attempts': attempt + 1})
+                            raise error
+                        reason = str(response.status_code)
+                        status_code = response.status_code
+                        retry_after = policy.parse_retry_after(response.headers.get('Retry-After'))
+
+                    wait = policy.next_wait(attempt, started, retry_after, status_code)
+                    if wait is None:
+                        self.retry_metrics.record_give_up()
+                        set_span_attributes(current, {'error.type': reason, 'awin.attempts': attempt + 1})
+                        raise error
+                    logging.warning(f"Request failed ({reason}). Retrying in {wait:.1f} seconds...")
+                    self.retry_metrics.record_retry(reason, wait)
+                    self.stats.record_retry(wait)
+                    time.sleep(wait)
+                    attempt += 1
+
+    def _record_attempt(self, 
+                        method:str, 
+                        path:str, 
+                        params:Optional[Dict[str, Any]], 
+                        attempt:int, 
+                        started:float,
+                        response:requests.Response = None,
+                        error:BaseException = None,
+                        stream:bool = False) -> None:
+            """
+            Add an attempt of a request to the statistics of the client and pass it to the hooks.
+
+            :param started: ``time.monotonic()`` when the attempt was sent
+            :param response: the HTTP response, if there was one
+            :param error: the exception raised by the HTTP library, if there was one
+            :param stream: the body of the response was not downloaded yet
+            """
+            size = None
+            if response is not None:
+                content_length = response.headers.get('Content-Length')
+                if content_length and content_length.isdigit():
+                    size = int(content_length)
+                elif not stream:
+                    size = len(response.content)
+            event = RequestEvent(method, path, params, attempt, response.status_code if response is not None else None,
+                                 time.monotonic() - started, size, error)
+            self.stats.record_request(event)
+            if self.hooks:
+                call_hooks(self.hooks, event)
 
     def _request(self, 
                  path:str, 
                  params:str = None, 
-                 method='GET') -> List[Dict[str, Any]]:
+                 method='GET',
+                 retry_timeouts:bool = True,
+                 priority:str = None) -> List[Dict[str, Any]]:
             """
             Make a request against the AWIN API.
-            Returns the HTTP response, which might be successful or not.
+            Failed requests are retried according to the retry policy of the client.
+            GET requests are answered from the cache of the client, if there is one.
 
             :param path: the URL path for this request (relative to the Awin API base URL)
             :param params: dictionary of URL parameters (optional)
             :param method: the HTTP request method (default: GET)
+            :param retry_timeouts: retry requests that time out. If False a ``requests.Timeout`` is raised right away
+            :param priority: priority class of the request, see ``_send``
             :return: the parsed json response, when the request was successful, or a AwinApiError
+                once the request failed and can not be retried
             """
+            use_cache = self.cache is not None and method == 'GET'
+            if use_cache:
+                namespace = self.cache.namespace(self.base_url, self.client_secret)
+                cached = self.cache.get(method, path, params, namespace)
+                if cached is not None:
+                    self.stats.record_cache_hit()
+                    return cached
+
             # make the request
-            url = urljoin(self.base_url, path)
-            retries = 0
-            
-            while retries <= self.max_retries:
-                response = requests.request(method, url, headers=self.headers, params=params)
-                if response.ok:
-                    try:
-                        return response.json()
-                    except ValueError:
-                        raise AwinError(f"Failed to parse response as json: {response.text}")
-                elif response.status_code == 429:
-                    retries += 1
-                    logging.warning(f"Rate limit exceeded. Retrying in {self.default_retry_wait} seconds...")
-                    time.sleep(self.default_retry_wait)            
-                else:
-                    raise AwinApiError.from_response(response)
-    
-    def _paginate_date_range(self, 
-                             path:str, 
-                             start_date:date, 
-                             end_date:date, 
-                             is_report:bool, 
-                             params=None) -> List[Dict[str, Any]]:
+            response = self._send(path, params, method, retry_timeouts, priority=priority)
+            parse_started = time.monotonic()
+            try:
+                result = jsonstream.loads(response.content)
+            except ValueError:
+                raise AwinError(f"Failed to parse response as json: {response.text}")
+            self.stats.record_parse(time.monotonic() - parse_started)
+            if use_cache:
+                self.cache.set(method, path, params, result, namespace)
+            return result
+
+    def _request_memoized(self, 
+                          path:str, 
+                          params:Dict[str, Any] = None) -> Any:
+            """
+            Make a GET request through the memo of the client, for endpoints whose results rarely change.
+            Concurrent calls with the same path and params share one request.
+
+            :param path: the URL path for this request (relative to the Awin API base URL)
+            :param params: dictionary of URL parameters (optional)
+            :return: a copy of the parsed json response, so that callers can not change the memoized result
+            """
+            key = (self.base_url, self.client_secret, path, tuple(sorted((params or {}).items())))
+            result = self.memo.get(key, lambda: self._request(path, params, priority='interactive'))
+            return copy.deepcopy(result)
+
+    def _request_stream(self, 
+                        path:str, 
+                        params:Dict[str, Any] = None,
+                        priority:str = None) -> Iterator[Dict[str, Any]]:
+            """
+            Make a GET request against the AWIN API and parse the JSON array of the response
+            element by element while it is downloaded. Only one element is held in memory at a time.
+            Failures before the first element are retried like in ``_request``.
+
+            :param path: the URL path for this request (relative to the Awin API base URL)
+            :param params: dictionary of URL parameters (optional)
+            :param priority: priority class of the request, see ``_send``
+            :return: iterator over the elements of the response
+            """
+            response = self._send(path, params, stream=True, priority=priority)
+            parse_started = time.monotonic()
+            try:
+                # let urllib3 decompress gzip responses
+                response.raw.decode_content = True
+                yield from jsonstream.iter_json_array_from_file(response.raw)
+            except ValueError as e:
+                raise AwinError(f"Failed to parse response as json: {e}")
+            finally:
+                self.stats.record_parse(time.monotonic() - parse_started)
+                if not response.headers.get('Content-Length'):
+                    # the size of a chunked response is only known once it was read
+                    self.stats.record_bytes(path, response.raw.tell())
+                response.close()
+
+    @staticmethod
+    def _date_windows(start_date:date, 
+                      end_date:date, 
+                      is_report:bool) -> List[Tuple[str, str]]:
         """
-        Paginate over a provided date range.
-        Returns a list of results
+        Split a date range into windows the Awin API accepts.
+        Returns a list of (startDate, endDate) strings in the format the endpoint expects
 
-        :param path: the URL path (relative to the Awin API base URL)
         :param start_date: date object that specifies the beginning of the selected date range
         :param end_date: date object that specifies the end of the selected date range
         :param is_report: boolean to indicate if report endpoint or other. Necessary for date formats
-        :param params: dictionary of URL parameters
-        :return: list of transactions
-
+        :return: list of (startDate, endDate) tuples in chronological order
         """
         # the maximum date range between startDate and endDate currently supported is 31 days
         # calculate number of requests:
@@ -92,9 +379,8 @@ class Awin:
             number_of_requests += 1
         logging.info(f'number of requests: {number_of_requests}')
         # paginate in steps of 31 days
-        total_transaction_list = []
+        windows = []
         for i in range(number_of_requests):
-            logging.info(f'current request is number {i}')
             if number_of_requests == 1:
                 # only one request
                 pag_start_date = start_date
@@ -120,20 +406,285 @@ class Awin:
                 # Convert datetime to awin date string format
                 dt_start_str = pag_start_date.strftime("%Y-%m-%dT%H:%M:%S")
                 dt_end_str = pag_end_date.strftime("%Y-%m-%dT%H:%M:%S")
+            windows.append((dt_start_str, dt_end_str))
+        return windows
+
+    def _iter_date_range(self, 
+                         path:str, 
+                         start_date:date, 
+                         end_date:date, 
+                         is_report:bool, 
+                         params=None,
+                         max_workers:int = None,
+                         adaptive:bool = None,
+                         checkpoint_dir:str = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Paginate over a provided date range.
+        Yields the results of each window as soon as they arrive, in date order.
+        With several workers at most ``max_workers`` windows are fetched ahead of the consumer,
+        so memory stays bounded by a few windows.
 
+        :param path: the URL path (relative to the Awin API base URL)
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param is_report: boolean to indicate if report endpoint or other. Necessary for date formats
+        :param params: dictionary of URL parameters
+        :param max_workers: number of windows fetched in parallel. Defaults to the ``max_workers`` of the client.
+            All workers draw from the rate limiter of the client
+        :param adaptive: size the windows by the observed response sizes and latencies, see ``_iter_adaptive_date_range``.
+            Defaults to the ``adaptive_windows`` setting of the client
+        :param checkpoint_dir: directory in which completed windows are saved. A rerun with the same arguments
+            reads the completed windows from there and only fetches the missing ones (optional)
+        :return: iterator over the list of results of each window. If the client streams responses
+            (and has no cache and no checkpoint) each window is an iterator that parses the results while they download
+        """
+        adaptive = self.adaptive_windows if adaptive is None else adaptive
+        checkpoint = None
+        if checkpoint_dir:
+            checkpoint = open_checkpoint(checkpoint_dir, client_id=self.client_id, path=path, params=params,
+                                         start_date=start_date, end_date=end_date, is_report=is_report, adaptive=adaptive)
+        if adaptive:
+            yield from self._iter_adaptive_date_range(path, start_date, end_date, is_report, params, checkpoint)
+            return
+        windows = self._date_windows(start_date, end_date, is_report)
+        max_workers = max_workers or self.max_workers
+
+        if self.stream_responses and self.cache is None and checkpoint is None:
+            # windows are streamed one after another, each one is closed before the next one is requested
+            for i, (dt_start_str, dt_end_str) in enumerate(windows):
+                logging.info(f'current request is number {i}')
+                logging.info(f'Start date: {dt_start_str}. End date: {dt_end_str}')
+                window_params = dict(params or {}, startDate=dt_start_str, endDate=dt_end_str)
+                window = self._record_streamed_window(self._request_stream(f'advertisers/{self.client_id}/{path}', window_params, priority='bulk'),
+                                                      self._window_span(dt_start_str, dt_end_str, is_report))
+                try:
+                    yield window
+                finally:
+                    window.close()
+            return
+
+        def fetch_window(window:Tuple[int, Tuple[str, str]]) -> List[Dict[str, Any]]:
+            i, (dt_start_str, dt_end_str) = window
+            if checkpoint is not None:
+                pag_transaction_list = checkpoint.get(dt_start_str, dt_end_str)
+                if pag_transaction_list is not None:
+                    logging.info(f'request number {i} restored from checkpoint')
+                    return pag_transaction_list
+            logging.info(f'current request is number {i}')
             logging.info(f'Start date: {dt_start_str}. End date: {dt_end_str}')
-            # add start and end date to params
-            params['startDate'] = dt_start_str
-            params['endDate'] = dt_end_str
+            # add start and end date to a copy of the params, workers must not share them
+            window_params = dict(params or {}, startDate=dt_start_str, endDate=dt_end_str)
+            started = time.monotonic()
+            pag_transaction_list = self._request(f'advertisers/{self.client_id}/{path}', window_params, priority='bulk')
+            self.stats.record_window(self._window_span(dt_start_str, dt_end_str, is_report), len(pag_transaction_list),
+                                     time.monotonic() - started)
+            if checkpoint is not None:
+                checkpoint.put(dt_start_str, dt_end_str, pag_transaction_list)
+            return pag_transaction_list
+
+        if max_workers > 1 and len(windows) > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                pending = deque()
+                try:
+                    for window in enumerate(windows):
+                        pending.append(executor.submit(fetch_window, window))
+                        if len(pending) >= max_workers:
+                            yield pending.popleft().result()
+                    while pending:
+                        yield pending.popleft().result()
+                finally:
+                    # the consumer stopped early or a window failed, don't fetch the remaining windows
+                    for future in pending:
+                        future.cancel()
+        else:
+            for window in enumerate(windows):
+                yield fetch_window(window)
+
+    @staticmethod
+    def _window_span(dt_start_str:str, dt_end_str:str, is_report:bool) -> timedelta:
+        """
+        :param dt_start_str: startDate of a window
+        :param dt_end_str: endDate of a window
+        :param is_report: boolean to indicate if report endpoint or other. Report windows include their end date
+        :return: the date range covered by the window
+        """
+        span = datetime.fromisoformat(dt_end_str) - datetime.fromisoformat(dt_start_str)
+        return span + timedelta(days=1) if is_report else span
+
+    def _record_streamed_window(self, 
+                                window:Iterator[Dict[str, Any]], 
+                                span:timedelta) -> Iterator[Dict[str, Any]]:
+        """
+        Pass the results of a streamed window through and add the window to the statistics once it was read.
+        """
+        started = time.monotonic()
+        records = 0
+        try:
+            for records, result in enumerate(window, 1):
+                yield result
+        finally:
+            window.close()
+        self.stats.record_window(span, records, time.monotonic() - started)
+
+    def _iter_adaptive_date_range(self, 
+                                  path:str, 
+                                  start_date:date, 
+                                  end_date:date, 
+                                  is_report:bool, 
+                                  params=None,
+                                  checkpoint:Checkpoint = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Paginate over a provided date range with windows that adapt to the data.
+        A window that times out is split in half and fetched again. After a window with more than
+        ``target_window_records`` results or a latency above ``target_window_latency`` the next window is halved,
+        after a window far below both targets the next window is doubled, up to the 31 days the API allows.
+        Windows never grow back to the size of a window that timed out, so a slow date range is not
+        requested again and again with the size that failed.
+        Windows are fetched one after another, because each window size depends on the previous response.
+
+        Report windows are whole days that do not overlap: each window ends the day before the next one starts.
+
+        :param path: the URL path (relative to the Awin API base URL)
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param is_report: boolean to indicate if report endpoint or other. Necessary for date formats
+        :param params: dictionary of URL parameters
+        :param checkpoint: completed windows are read from and saved to this checkpoint (optional).
+            Completed windows are replayed in order, because their sizes were chosen at runtime
+        :return: iterator over the list of results of each window
+        """
+        max_window = timedelta(days=31)
+        # reports have a resolution of days, transactions of seconds
+        min_window = timedelta(days=1) if is_report else self.min_window
+        window = max_window
+        # the smallest window that timed out. Windows stay below it
+        timed_out = None
+        pag_start_date = start_date
+        while True:
+            if checkpoint is not None:
+                dt_start_str = pag_start_date.date().isoformat() if is_report else pag_start_date.strftime("%Y-%m-%dT%H:%M:%S")
+                completed = checkpoint.get_starting_at(dt_start_str)
+                if completed is not None:
+                    dt_end_str, pag_transaction_list = completed
+                    logging.info(f'Start date: {dt_start_str}. End date: {dt_end_str}. Restored from checkpoint')
+                    yield pag_transaction_list
+                    if is_report:
+                        if dt_end_str >= end_date.date().isoformat():
+                            return
+                        # report windows include their end date
+                        pag_end_date = datetime.combine(date.fromisoformat(dt_end_str) + timedelta(days=1), datetime.min.time())
+                    else:
+                        pag_end_date = datetime.strptime(dt_end_str, "%Y-%m-%dT%H:%M:%S")
+                        if pag_end_date >= end_date:
+                            return
+                        pag_end_date += timedelta(seconds=1)
+                    window = max(min_window, min(max_window, pag_end_date - pag_start_date))
+                    pag_start_date = pag_end_date
+                    continue
+
+            pag_end_date = min(pag_start_date + window, end_date)
+            if is_report:
+                # both dates are included in the report
+                dt_start_str = pag_start_date.date().isoformat()
+                dt_end_str = max(pag_start_date, pag_end_date - timedelta(days=1)).date().isoformat() \
+                    if pag_end_date < end_date else pag_end_date.date().isoformat()
+            else:
+                dt_start_str = pag_start_date.strftime("%Y-%m-%dT%H:%M:%S")
+                dt_end_str = pag_end_date.strftime("%Y-%m-%dT%H:%M:%S")
+
+            logging.info(f'Start date: {dt_start_str}. End date: {dt_end_str}. Window: {window}')
+            window_params = dict(params or {}, startDate=dt_start_str, endDate=dt_end_str)
+            started = time.monotonic()
+            try:
+                pag_transaction_list = self._request(f'advertisers/{self.client_id}/{path}', window_params, retry_timeouts=False, priority='bulk')
+            except requests.Timeout:
+                if pag_end_date - pag_start_date <= min_window:
+                    raise
+                timed_out = min(timed_out or max_window, pag_end_date - pag_start_date)
+                window = max(min_window, (pag_end_date - pag_start_date) / 2)
+                logging.warning(f'Window timed out. Retrying with a window of {window}')
+                continue
+            latency = time.monotonic() - started
+            self.stats.record_window(self._window_span(dt_start_str, dt_end_str, is_report), len(pag_transaction_list), latency)
+            if checkpoint is not None:
+                checkpoint.put(dt_start_str, dt_end_str, pag_transaction_list)
+            yield pag_transaction_list
 
-            # make sure rate limit is not reached
-            if i % 20 == 0 and i > 0:
-                time.sleep(60)
+            if pag_end_date >= end_date:
+                return
+            # transaction windows start 1s after the previous one ended, so that they don't overlap
+            pag_start_date = pag_end_date if is_report else pag_end_date + timedelta(seconds=1)
+            if len(pag_transaction_list) > self.target_window_records or latency > self.target_window_latency:
+                window = max(min_window, window / 2)
+            elif len(pag_transaction_list) < self.target_window_records / 4 and latency < self.target_window_latency / 4 \
+                    and (timed_out is None or window * 2 < timed_out):
+                window = min(max_window, window * 2)
+            if is_report:
+                # report windows are whole days
+                window = timedelta(days=max(1, round(window / timedelta(days=1))))
+
+    def _paginate_date_range(self, 
+                             path:str, 
+                             start_date:date, 
+                             end_date:date, 
+                             is_report:bool, 
+                             params=None,
+                             max_workers:int = None,
+                             checkpoint_dir:str = None) -> List[Dict[str, Any]]:
+        """
+        Paginate over a provided date range.
+        Returns a list of results
+
+        :param path: the URL path (relative to the Awin API base URL)
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param is_report: boolean to indicate if report endpoint or other. Necessary for date formats
+        :param params: dictionary of URL parameters
+        :param max_workers: number of windows fetched in parallel. Defaults to the ``max_workers`` of the client.
+            All workers draw from the rate limiter of the client
+        :param checkpoint_dir: directory in which completed windows are saved. A rerun with the same arguments
+            only fetches the windows that are still missing (optional)
+        :return: list of transactions
 
-            pag_transaction_list = self._request(f'advertisers/{self.client_id}/{path}', params)
+        """
+        total_transaction_list = []
+        for pag_transaction_list in self._iter_date_range(path, start_date, end_date, is_report, params, max_workers,
+                                                            checkpoint_dir=checkpoint_dir):
             total_transaction_list.extend(pag_transaction_list)
         return total_transaction_list
+
+    @staticmethod
+    def _iter_results(windows:Iterator[List[Dict[str, Any]]], batches:bool) -> Iterator[Any]:
+        """
+        :param windows: iterator over the list of results of each window
+        :param batches: yield the list of each window instead of single results
+        :return: iterator over single results or lists of results
+        """
+        if batches:
+            for window in windows:
+                yield window if isinstance(window, list) else list(window)
+        else:
+            for window in windows:
+                yield from window
     
+    @staticmethod
+    def _to_columns(windows:Iterator[List[Dict[str, Any]]], batch:ColumnBatch) -> ColumnBatch:
+        """
+        Flatten the results of each window into a column batch as soon as the window arrives.
+
+        :param windows: iterator over the list of results of each window
+        :param batch: the (empty) batch to fill
+        :return: the filled batch
+        """
+        for window in windows:
+            # streamed windows are flattened in chunks, so that only one chunk of dictionaries is held at a time
+            window = iter(window)
+            chunk = list(islice(window, 10000))
+            while chunk:
+                batch.extend(chunk)
+                chunk = list(islice(window, 10000))
+        return batch
+
     def get_accounts(self) -> List[Dict[str, Any]]:
         """
         GET accounts
@@ -143,7 +694,7 @@ class Awin:
 
         https://wiki.awin.com/index.php/API_get_accounts
         """
-        accounts = self._request('accounts')
+        accounts = self._request_memoized('accounts')
         return accounts
         
     def get_publishers(self) -> List[Dict[str, Any]]:
@@ -155,7 +706,7 @@ class Awin:
 
         https://wiki.awin.com/index.php/API_get_publishers
         """
-        publishers = self._request(f'advertisers/{self.client_id}/publishers')
+        publishers = self._request_memoized(f'advertisers/{self.client_id}/publishers')
         return publishers
 
     def get_transactions(self, 
@@ -179,7 +730,10 @@ class Awin:
                          ]] = 'UTC', 
                          status:Optional[Literal['pending', 'approved', 'declined', 'deleted']] = None, 
                          publisher_id:str = None, 
-                         show_basket_products:bool = None)  -> List[Dict[str, Any]]:
+                         show_basket_products:bool = None,
+                         checkpoint_dir:str = None,
+                         as_models:bool = False,
+                         columnar:bool = False)  -> List[Dict[str, Any]]:
         """
         GET transactions (list)
         provides a list of your individual transactions
@@ -191,6 +745,11 @@ class Awin:
         :param status: Filter by transaction status. Can be one of the following: pending, approved, declined, deleted
         :param publisherId: Allows filtering by publisher id. Example: 12345 or 12345,67890 for multiple ones
         :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param checkpoint_dir: directory in which completed date windows are saved. A rerun with the same arguments
+            only fetches the windows that are still missing (optional)
+        :param as_models: return ``models.Transaction`` objects instead of dictionaries
+        :param columnar: return a ``columnar.ColumnBatch`` with one typed column per (nested) field instead of a list.
+            The transaction parts are in its ``transactionParts`` child batch
         :return: list of ``transaction`` instances
 
         https://wiki.awin.com/index.php/API_get_transactions_list
@@ -202,13 +761,190 @@ class Awin:
             'publisherId': publisher_id,
             'showBasketProducts': show_basket_products	
         }
-        pag_transaction_list = self._paginate_date_range(path='transactions/', start_date= start_date, end_date= end_date, is_report= False, params= params)
+        if as_models and columnar:
+            raise AwinError("as_models and columnar can not be combined")
+        if as_models:
+            # convert window by window, so that the dictionaries of only one window are held at a time
+            windows = self._iter_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False, params=params, checkpoint_dir=checkpoint_dir)
+            return [Transaction.from_dict(transaction) for window in windows for transaction in window]
+        if columnar:
+            windows = self._iter_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False, params=params, checkpoint_dir=checkpoint_dir)
+            return self._to_columns(windows, transaction_batch())
+        pag_transaction_list = self._paginate_date_range(path='transactions/', start_date= start_date, end_date= end_date, is_report= False, params= params, checkpoint_dir= checkpoint_dir)
+        return pag_transaction_list
 
-        # model_testing_list = []
-        # for transaction in total_transaction_list:
-        #     model_testing_list.append(Transaction(**transaction))
+    def iter_transactions(self, 
+                          start_date:date, 
+                          end_date:date, 
+                          date_type:Optional[DateType] = 'transaction', 
+                          timezone:Optional[Timezone] = 'UTC', 
+                          status:Optional[TransactionStatus] = None, 
+                          publisher_id:str = None, 
+                          show_basket_products:bool = None,
+                          batches:bool = False,
+                          as_models:bool = False) -> Iterator[Any]:
+        """
+        GET transactions (list)
+        like ``get_transactions``, but yields the transactions of each date window as soon as it arrives
+        instead of collecting all of them into one list
 
-        return pag_transaction_list
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param status: Filter by transaction status. Can be one of the following: pending, approved, declined, deleted
+        :param publisher_id: Allows filtering by publisher id. Example: 12345 or 12345,67890 for multiple ones
+        :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param batches: yield one list of ``transaction`` instances per date window instead of single transactions
+        :param as_models: yield ``models.Transaction`` objects instead of dictionaries
+        :return: iterator over ``transaction`` instances, or lists of them
+
+        https://wiki.awin.com/index.php/API_get_transactions_list
+        """
+        params = {
+            'timezone': timezone,
+            'dateType': date_type,
+            'status': status,
+            'publisherId': publisher_id,
+            'showBasketProducts': show_basket_products
+        }
+        windows = self._iter_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False, params=params)
+        if as_models:
+            windows = ([Transaction.from_dict(transaction) for transaction in window] for window in windows)
+        return self._iter_results(windows, batches)
+
+    def sync_transactions(self, 
+                          state:SyncStateStore, 
+                          lookback:timedelta = timedelta(days=7), 
+                          initial_lookback:timedelta = timedelta(days=90), 
+                          show_basket_products:bool = None,
+                          store:TransactionStore = None) -> List[Dict[str, Any]]:
+        """
+        GET transactions (list)
+        fetches only the transactions that changed since the last sync of this advertiser
+
+        Two date types are fetched from their watermark up to now:
+        'validation' returns the transactions that were approved or declined since the last sync, and
+        'transaction' (starting ``lookback`` before its watermark) returns new transactions and recent amendments.
+        The watermarks are only moved forward once all windows have been fetched, so a failed sync is simply repeated.
+        All dates are in UTC.
+
+        :param state: the store that keeps the watermarks between runs
+        :param lookback: how far before the transaction watermark transactions are fetched again, to catch amendments
+        :param initial_lookback: how far back the first sync of an advertiser reaches
+        :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param store: upsert the changed transactions into this ``TransactionStore`` before the watermarks are moved (optional)
+        :return: list of ``transaction`` instances to upsert, unique by ``id``
+
+        https://wiki.awin.com/index.php/API_get_transactions_list
+        """
+        now = datetime.now(dt_timezone.utc).replace(tzinfo=None, microsecond=0)
+        upserts = {}
+        for date_type, overlap in (('validation', self.SYNC_OVERLAP), ('transaction', lookback)):
+            watermark = state.get_watermark(self.client_id, date_type)
+            start_date = watermark - overlap if watermark else now - initial_lookback
+            logging.info(f'syncing {date_type} dates from {start_date}')
+            for transaction in self.iter_transactions(start_date=start_date, end_date=now, date_type=date_type,
+                                                      timezone='UTC', show_basket_products=show_basket_products):
+                upserts[transaction['id']] = transaction
+        if store is not None:
+            store.upsert(upserts.values())
+        state.set_watermarks(self.client_id, {'validation': now, 'transaction': now})
+        return list(upserts.values())
+
+    def store_transactions(self, 
+                           store:TransactionStore, 
+                           start_date:date, 
+                           end_date:date, 
+                           date_type:Optional[DateType] = 'transaction', 
+                           timezone:Optional[Timezone] = 'UTC', 
+                           status:Optional[TransactionStatus] = None, 
+                           publisher_id:str = None, 
+                           show_basket_products:bool = None,
+                           checkpoint_dir:str = None) -> int:
+        """
+        GET transactions (list)
+        like ``get_transactions``, but upserts the transactions of each date window into a store as soon as it arrives,
+        instead of returning them. Transactions that are already stored are replaced unless the stored version
+        is newer, see ``TransactionStore.upsert``
+
+        :param store: the ``TransactionStore`` to write to
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param status: Filter by transaction status. Can be 'pending', 'approved', 'declined' or 'deleted'. (optional)
+        :param publisher_id: Filter by publisher id. (optional)
+        :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param checkpoint_dir: directory in which completed date windows are saved (optional)
+        :return: number of transactions written to the store
+
+        https://wiki.awin.com/index.php/API_get_transactions_list
+        """
+        params = {
+            'timezone': timezone,
+            'dateType': date_type,
+            'status': status,
+            'publisherId': publisher_id,
+            'showBasketProducts': show_basket_products
+        }
+        written = 0
+        for window in self._iter_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False,
+                                            params=params, checkpoint_dir=checkpoint_dir):
+            written += store.upsert(window)
+        return written
+
+    def diff_transactions(self, 
+                          fingerprints:FingerprintStore, 
+                          start_date:date, 
+                          end_date:date, 
+                          date_type:Optional[DateType] = 'transaction', 
+                          timezone:Optional[Timezone] = 'UTC', 
+                          status:Optional[TransactionStatus] = None, 
+                          publisher_id:str = None, 
+                          show_basket_products:bool = None,
+                          checkpoint_dir:str = None) -> Iterator[TransactionDiff]:
+        """
+        GET transactions (list)
+        like ``iter_transactions``, but yields only the changes of each date window since the previous run:
+        the transactions that were inserted, whose status, amendment, amounts or validation date changed,
+        and the ids of those that disappeared from the window
+
+        The fingerprints of a window are stored once the consumer asks for the next window, so a window whose changes
+        were not processed (e.g. because writing them failed) is reported again by the next run.
+        The first run reports every transaction as inserted.
+
+        :param fingerprints: the ``FingerprintStore`` that keeps the fingerprints between runs
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param status: Filter by transaction status. Can be 'pending', 'approved', 'declined' or 'deleted'. (optional)
+        :param publisher_id: Filter by publisher id. (optional)
+        :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param checkpoint_dir: directory in which completed date windows are saved (optional)
+        :return: iterator over one ``TransactionDiff`` per date window
+
+        https://wiki.awin.com/index.php/API_get_transactions_list
+        """
+        params = {
+            'timezone': timezone,
+            'dateType': date_type,
+            'status': status,
+            'publisherId': publisher_id,
+            'showBasketProducts': show_basket_products
+        }
+        scope = fingerprints.scope(self.client_id, params)
+        date_field = 'validationDate' if date_type == 'validation' else 'transactionDate'
+        # disappeared transactions are found by the bounds of each window, so the windows must not adapt
+        windows = self._iter_date_range(path='transactions/', start_date=start_date, end_date=end_date, is_report=False,
+                                        params=params, adaptive=False, checkpoint_dir=checkpoint_dir)
+        for (window_start, window_end), window in zip(self._date_windows(start_date, end_date, False), windows):
+            diff = fingerprints.diff(scope, window_start, window_end, list(window), date_field)
+            logging.info(f'window {window_start} - {window_end}: {len(diff.inserted)} inserted, '
+                         f'{len(diff.changed)} changed, {len(diff.disappeared)} disappeared, {diff.unchanged} unchanged')
+            yield diff
+            fingerprints.apply(diff)
 
     def get_transactions_by_id(self, 
                                ids: List[str], 
@@ -227,36 +963,89 @@ class Awin:
                                         'US/Pacific',
                                         'UTC'
                                      ]] = 'UTC', 
-                               show_basket_products: bool = None) -> List[Dict[str, Any]]:
+                               show_basket_products: bool = None,
+                               as_models: bool = False,
+                               batch_size: int = None,
+                               max_workers: int = None,
+                               raise_on_missing: bool = False) -> List[Dict[str, Any]]:
         """
         GET transactions (list)
         provides a list of transactions by id
 
+        Duplicate ids are requested once. The ids are split into chunks that are requested in parallel
+        under the rate limit of the client, and the results are merged in the order of ``ids``.
+
         :param ids:	List of ids.
         :param timezone: chosen timezone. Defaults to 'UTC'
         :param show_basket_products: If &showBasketProducts=true then products sent via Product Level Tracking matched to the transaction can be viewed
+        :param as_models: return ``models.Transaction`` objects instead of dictionaries
+        :param batch_size: maximum number of ids per request. Defaults to ``ID_BATCH_SIZE``
+        :param max_workers: number of chunks requested in parallel. Defaults to the ``max_workers`` of the client
+        :param raise_on_missing: raise a ``MissingTransactionsError`` if ids were not found.
+            Otherwise missing ids are logged as a warning
         :return: list of ``transaction`` instances
 
         https://wiki.awin.com/index.php/API_get_transactions_ids
         """
 
-        # extract ids from comma separated string
-        comma_separated_ids = ", ".join(ids)
-        logging.info(f'comma separated ids: {comma_separated_ids}')
+        unique_ids = list(dict.fromkeys(str(id).strip() for id in ids))
+        chunks = self._chunk_ids(unique_ids, batch_size or self.ID_BATCH_SIZE, self.MAX_IDS_LENGTH)
+        logging.info(f'requesting {len(unique_ids)} transaction ids in {len(chunks)} chunks')
 
-        params = {
-            'ids': comma_separated_ids,
-            'timezone': timezone,
-            'showBasketProducts': show_basket_products	
-        }
+        path = f'advertisers/{self.client_id}/transactions/'
+        def fetch_chunk(chunk:List[str]) -> List[Dict[str, Any]]:
+            params = {
+                'ids': ','.join(chunk),
+                'timezone': timezone,
+                'showBasketProducts': show_basket_products
+            }
+            return self._request(path, params, priority='interactive')
+
+        max_workers = min(max_workers or self.max_workers, len(chunks))
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(fetch_chunk, chunks))
+        else:
+            results = [fetch_chunk(chunk) for chunk in chunks]
 
-        transactions = self._request(f'advertisers/{self.client_id}/transactions/', params)
+        # merge the chunks in the order of the ids that were asked for
+        position = {id: i for i, id in enumerate(unique_ids)}
+        transactions = [transaction for result in results for transaction in result or []]
+        transactions.sort(key=lambda transaction: position.get(str(transaction.get('id')), len(position)))
 
-        # model_testing_list = []
-        # for transaction in transactions:
-        #     model_testing_list.append(Transaction(**transaction))
+        found = {str(transaction.get('id')) for transaction in transactions}
+        missing_ids = [id for id in unique_ids if id not in found]
+        if missing_ids:
+            logging.warning(f'{len(missing_ids)} of {len(unique_ids)} transaction ids were not found: {missing_ids}')
+
+        if as_models:
+            transactions = [Transaction.from_dict(transaction) for transaction in transactions]
+        if missing_ids and raise_on_missing:
+            raise MissingTransactionsError(missing_ids, transactions)
         return transactions
 
+    @staticmethod
+    def _chunk_ids(ids:List[str], batch_size:int, max_length:int) -> List[List[str]]:
+        """
+        Split ids into chunks of at most ``batch_size`` ids whose comma separated length stays below ``max_length``.
+
+        :param ids: the ids
+        :param batch_size: maximum number of ids per chunk
+        :param max_length: maximum length of the ``ids`` parameter of one request
+        :return: list of chunks
+        """
+        chunks = []
+        chunk, length = [], 0
+        for id in ids:
+            if chunk and (len(chunk) >= batch_size or length + 1 + len(id) > max_length):
+                chunks.append(chunk)
+                chunk, length = [], 0
+            length += len(id) + (1 if chunk else 0)
+            chunk.append(id)
+        if chunk:
+            chunks.append(chunk)
+        return chunks
+
     def get_reports_agg_by_publisher(self, 
                                      start_date:date, 
                                      end_date:date, 
@@ -275,7 +1064,9 @@ class Awin:
                                         'US/Mountain',
                                         'US/Pacific',
                                         'UTC'
-                                     ]] = 'UTC',) -> List[Dict[str, Any]]:
+                                     ]] = 'UTC',
+                                     checkpoint_dir:str = None,
+                                     columnar:bool = False) -> List[Dict[str, Any]]:
         """
         GET reports aggregated by publisher
         provides aggregated reports for the publishers you work with
@@ -284,6 +1075,9 @@ class Awin:
         :param end_date: date object that specifies the end of the selected date range
         :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
         :param timezone: chosen timezone. Defaults to 'UTC'
+        :param checkpoint_dir: directory in which completed date windows are saved. A rerun with the same arguments
+            only fetches the windows that are still missing (optional)
+        :param columnar: return a ``columnar.ColumnBatch`` with one typed column per (nested) field instead of a list
         :return: list of ``report`` instances
 
         https://wiki.awin.com/index.php/API_get_reports_aggrcampaign_adv
@@ -292,7 +1086,10 @@ class Awin:
             'date_type': date_type,
             'timezone': timezone,
         }
-        pag_transaction_list = self._paginate_date_range(path='reports/publisher', start_date= start_date, end_date= end_date, is_report= True, params= params)
+        if columnar:
+            windows = self._iter_date_range(path='reports/publisher', start_date=start_date, end_date=end_date, is_report=True, params=params, checkpoint_dir=checkpoint_dir)
+            return self._to_columns(windows, report_batch())
+        pag_transaction_list = self._paginate_date_range(path='reports/publisher', start_date= start_date, end_date= end_date, is_report= True, params= params, checkpoint_dir= checkpoint_dir)
         return pag_transaction_list
     
     def get_reports_agg_by_creative(self, 
@@ -316,7 +1113,9 @@ class Awin:
                                         'US/Mountain',
                                         'US/Pacific',
                                         'UTC'
-                                     ]] = 'UTC',) -> List[Dict[str, Any]]:
+                                     ]] = 'UTC',
+                                     checkpoint_dir:str = None,
+                                     columnar:bool = False) -> List[Dict[str, Any]]:
         """
         GET reports aggregated by creative
         provides aggregated reports for the creatives you used
@@ -326,6 +1125,9 @@ class Awin:
         :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
         :param region: AT, AU, BE, BR (Brazil programs in BRL), BU (Brazil programs in USD), CA, CH, DE, DK, ES, FI, FR, GB, IE, IT, NL, NO, PL, SE, US,
         :param timezone: chosen timezone. Defaults to 'UTC'
+        :param checkpoint_dir: directory in which completed date windows are saved. A rerun with the same arguments
+            only fetches the windows that are still missing (optional)
+        :param columnar: return a ``columnar.ColumnBatch`` with one typed column per (nested) field instead of a list
         :return: list of ``report`` instances
 
         https://wiki.awin.com/index.php/API_get_reports_aggrbycreative_adv
@@ -335,7 +1137,10 @@ class Awin:
             'region': region,
             'timezone': timezone,
         }
-        pag_transaction_list = self._paginate_date_range(path='reports/creative', start_date= start_date, end_date= end_date, is_report= True, params= params)
+        if columnar:
+            windows = self._iter_date_range(path='reports/creative', start_date=start_date, end_date=end_date, is_report=True, params=params, checkpoint_dir=checkpoint_dir)
+            return self._to_columns(windows, report_batch())
+        pag_transaction_list = self._paginate_date_range(path='reports/creative', start_date= start_date, end_date= end_date, is_report= True, params= params, checkpoint_dir= checkpoint_dir)
         return pag_transaction_list
     
     def get_reports_agg_by_campaign(self, 
@@ -359,7 +1164,9 @@ class Awin:
                                      ]] = 'UTC',
                                      publisher_ids:List[int] = None,
                                      include_numbers_without_campaign:bool = False,
-                                     interval:Optional[Literal['day', 'month', 'year']] = None) -> List[Dict[str, Any]]:
+                                     interval:Optional[Literal['day', 'month', 'year']] = None,
+                                     checkpoint_dir:str = None,
+                                     columnar:bool = False) -> List[Dict[str, Any]]:
         """
         GET reports aggregated by campaign
         provides aggregated reports for the campaigns that the publisher promotes
@@ -373,6 +1180,9 @@ class Awin:
             If set to "true" the result will also incl. numbers from clicks and transaction without campaign parameter.
             The parameter will BE ignored (default "false") once the parameter "campaign=" contains a valid value.
         :param interval: If set, numbers will be reported in sums per interval (day, month, year).
+        :param checkpoint_dir: directory in which completed date windows are saved. A rerun with the same arguments
+            only fetches the windows that are still missing (optional)
+        :param columnar: return a ``columnar.ColumnBatch`` with one typed column per (nested) field instead of a list
         :return: list of ``report`` instances
 
         https://wiki.awin.com/index.php/API_get_reports_aggrbycampaign_adv
@@ -384,5 +1194,98 @@ class Awin:
             'include_numbers_without_campaign': include_numbers_without_campaign,
             'interval': interval
         }
-        pag_transaction_list = self._paginate_date_range(path='reports/campaign', start_date= start_date, end_date= end_date, is_report= True, params= params)
-        return pag_transaction_list
\ No newline at end of file
+        if columnar:
+            windows = self._iter_date_range(path='reports/campaign', start_date=start_date, end_date=end_date, is_report=True, params=params, checkpoint_dir=checkpoint_dir)
+            return self._to_columns(windows, report_batch())
+        pag_transaction_list = self._paginate_date_range(path='reports/campaign', start_date= start_date, end_date= end_date, is_report= True, params= params, checkpoint_dir= checkpoint_dir)
+        return pag_transaction_list
+
+    def iter_reports_agg_by_publisher(self, 
+                                      start_date:date, 
+                                      end_date:date, 
+                                      date_type:Optional[DateType] = 'transaction', 
+                                      timezone:Optional[Timezone] = 'UTC',
+                                      batches:bool = False) -> Iterator[Any]:
+        """
+        GET reports aggregated by publisher
+        like ``get_reports_agg_by_publisher``, but yields the reports of each date window as soon as it arrives
+
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param batches: yield one list of ``report`` instances per date window instead of single reports
+        :return: iterator over ``report`` instances, or lists of them
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrcampaign_adv
+        """
+        params = {
+            'date_type': date_type,
+            'timezone': timezone,
+        }
+        windows = self._iter_date_range(path='reports/publisher', start_date=start_date, end_date=end_date, is_report=True, params=params)
+        return self._iter_results(windows, batches)
+
+    def iter_reports_agg_by_creative(self, 
+                                     start_date:date, 
+                                     end_date:date, 
+                                     date_type:Optional[DateType] = 'transaction', 
+                                     region:Optional[Region] = 'DE',
+                                     timezone:Optional[Timezone] = 'UTC',
+                                     batches:bool = False) -> Iterator[Any]:
+        """
+        GET reports aggregated by creative
+        like ``get_reports_agg_by_creative``, but yields the reports of each date window as soon as it arrives
+
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param date_type: The type of date by which the transactions are selected. Can be 'transaction' or 'validation'. (optional)
+        :param region: AT, AU, BE, BR (Brazil programs in BRL), BU (Brazil programs in USD), CA, CH, DE, DK, ES, FI, FR, GB, IE, IT, NL, NO, PL, SE, US,
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param batches: yield one list of ``report`` instances per date window instead of single reports
+        :return: iterator over ``report`` instances, or lists of them
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrbycreative_adv
+        """
+        params = {
+            'date_type': date_type,
+            'region': region,
+            'timezone': timezone,
+        }
+        windows = self._iter_date_range(path='reports/creative', start_date=start_date, end_date=end_date, is_report=True, params=params)
+        return self._iter_results(windows, batches)
+
+    def iter_reports_agg_by_campaign(self, 
+                                     start_date:date, 
+                                     end_date:date, 
+                                     campaign:str = None,
+                                     timezone:Optional[Timezone] = 'UTC',
+                                     publisher_ids:List[int] = None,
+                                     include_numbers_without_campaign:bool = False,
+                                     interval:Optional[Interval] = None,
+                                     batches:bool = False) -> Iterator[Any]:
+        """
+        GET reports aggregated by campaign
+        like ``get_reports_agg_by_campaign``, but yields the reports of each date window as soon as it arrives
+
+        :param start_date: date object that specifies the beginning of the selected date range
+        :param end_date: date object that specifies the end of the selected date range
+        :param campaign: The value which was used in &campaign=.
+        :param timezone: chosen timezone. Defaults to 'UTC'
+        :param publisher_ids: One or more publisher ID.
+        :param include_numbers_without_campaign: also include numbers from clicks and transactions without campaign parameter
+        :param interval: If set, numbers will be reported in sums per interval (day, month, year).
+        :param batches: yield one list of ``report`` instances per date window instead of single reports
+        :return: iterator over ``report`` instances, or lists of them
+
+        https://wiki.awin.com/index.php/API_get_reports_aggrbycampaign_adv
+        """
+        params = {
+            'campaign': campaign,
+            'timezone': timezone,
+            'publisher_ids': publisher_ids,
+            'include_numbers_without_campaign': include_numbers_without_campaign,
+            'interval': interval
+        }
+        windows = self._iter_date_range(path='reports/campaign', start_date=start_date, end_date=end_date, is_report=True, params=params)
+        return self._iter_results(windows, batches)
@@ -0,0 +1,320 @@
+"""
+columnar results of the Awin API
+
+Records are flattened window by window into typed column buffers (``array.array`` for numbers
+and booleans, lists for strings), so a long date range never exists as a list of nested dictionaries.
+The buffers support the buffer protocol, which makes the hand-off to numpy, pyarrow and pandas nearly zero-copy.
+numpy and pyarrow are optional: pip install awin-py[columnar]
+"""
+import importlib
+import json
+from array import array
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .errors import AwinError
+
+# typecodes of the numeric column kinds
+_TYPECODES = {'int': 'q', 'float': 'd', 'bool': 'b'}
+_NULLS = {'int': 0, 'float': float('nan'), 'bool': 0}
+
+TRANSACTION_SCHEMA: List[Tuple[str, str]] = [
+    ('id', 'int'),
+    ('advertiserId', 'int'),
+    ('publisherId', 'int'),
+    ('commissionStatus', 'str'),
+    ('type', 'str'),
+    ('transactionDate', 'str'),
+    ('validationDate', 'str'),
+    ('clickDate', 'str'),
+    ('saleAmount.amount', 'float'),
+    ('saleAmount.currency', 'str'),
+    ('commissionAmount.amount', 'float'),
+    ('commissionAmount.currency', 'str'),
+    ('networkFee.amount', 'float'),
+    ('networkFee.currency', 'str'),
+    ('advertiserCost.amount', 'float'),
+    ('advertiserCost.currency', 'str'),
+    ('oldSaleAmount.amount', 'float'),
+    ('oldCommissionAmount.amount', 'float'),
+    ('clickRefs.clickRef', 'str'),
+    ('orderRef', 'str'),
+    ('voucherCode', 'str'),
+    ('voucherCodeUsed', 'bool'),
+    ('amended', 'bool'),
+    ('amendReason', 'str'),
+    ('declineReason', 'str'),
+    ('paidToPublisher', 'bool'),
+    ('paymentId', 'int'),
+    ('transactionQueryId', 'int'),
+    ('lapseTime', 'int'),
+    ('commissionSharingPublisherId', 'int'),
+    ('customerCountry', 'str'),
+    ('advertiserCountry', 'str'),
+    ('clickDevice', 'str'),
+    ('transactionDevice', 'str'),
+    ('siteName', 'str'),
+    ('url', 'str'),
+    ('publisherUrl', 'str'),
+    ('ipHash', 'str'),
+    ('customerAcquisition', 'str'),
+]
+"""columns of a transaction batch, as (dotted path, kind)"""
+
+TRANSACTION_PART_SCHEMA: List[Tuple[str, str]] = [
+    ('transactionId', 'int'),
+    ('commissionGroupId', 'int'),
+    ('commissionGroupCode', 'str'),
+    ('commissionGroupName', 'str'),
+    ('amount', 'float'),
+    ('commissionAmount', 'float'),
+]
+"""columns of the ``transactionParts`` child batch of a transaction batch"""
+
+
+def _getter(path:str) -> Callable[[Dict[str, Any]], Any]:
+    keys = path.split('.')
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda record: record.get(key)
+    if len(keys) == 2:
+        outer, inner = keys
+        def get_nested(record:Dict[str, Any]) -> Any:
+            value = record.get(outer)
+            return value.get(inner) if isinstance(value, dict) else None
+        return get_nested
+    def get_path(record:Dict[str, Any]) -> Any:
+        value = record
+        for key in keys:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    return get_path
+
+
+def _infer_kind(value:Any) -> str:
+    if isinstance(value, bool):
+        return 'bool'
+    if isinstance(value, int):
+        return 'int'
+    if isinstance(value, float):
+        return 'float'
+    if isinstance(value, str):
+        return 'str'
+    return 'object'
+
+
+def _flatten_paths(record:Dict[str, Any], prefix:str = '') -> Iterable[Tuple[str, Any]]:
+    for key, value in record.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict) and value:
+            yield from _flatten_paths(value, f'{path}.')
+        else:
+            yield path, value
+
+
+class Column:
+    """
+    One typed column.
+
+    :ivar name: the dotted path of the column, e.g. ``saleAmount.amount``
+    :ivar kind: 'int', 'float', 'bool', 'str' or 'object'
+    :ivar values: ``array.array`` for numeric and boolean columns, list otherwise.
+        Null entries of numeric columns hold 0 (NaN for floats)
+    :ivar valid: one byte per row, 1 if the value is not null
+    """
+    __slots__ = ('name', 'kind', 'values', 'valid', '_get')
+
+    def __init__(self, name:str, kind:str, rows:int = 0) -> None:
+        self.name = name
+        self.kind = kind
+        self._get = _getter(name)
+        if kind in _TYPECODES:
+            self.values = array(_TYPECODES[kind], [_NULLS[kind]]) * rows
+        else:
+            self.values = [None] * rows
+        self.valid = bytearray(rows)
+
+    def __len__(self) -> int:
+        return len(self.valid)
+
+    def extend(self, records:Sequence[Dict[str, Any]]) -> None:
+        get = self._get
+        column = [get(record) for record in records]
+        if self.kind in _TYPECODES:
+            null = _NULLS[self.kind]
+            try:
+                self.values.extend([null if v is None else v for v in column])
+            except TypeError:
+                # a value does not fit the kind, e.g. a float in an int column
+                self._widen()
+                self.extend(records)
+                return
+        else:
+            if self.kind == 'str' and not all(v is None or isinstance(v, str) for v in column):
+                self._widen()
+            self.values.extend(column)
+        self.valid.extend(bytes([v is not None for v in column]))
+
+    def _widen(self) -> None:
+        if self.kind in ('int', 'bool'):
+            self.kind = 'float'
+            self.values = array('d', [v if ok else float('nan') for v, ok in zip(self.values, self.valid)])
+        else:
+            self.kind = 'object'
+            self.values = [v if ok else None for v, ok in zip(self.values, self.valid)]
+
+    def to_list(self) -> List[Any]:
+        """
+        :return: the values with ``None`` for nulls
+        """
+        if self.kind in _TYPECODES:
+            convert = bool if self.kind == 'bool' else (lambda v: v)
+            return [convert(v) if ok else None for v, ok in zip(self.values, self.valid)]
+        return list(self.values)
+
+
+class ColumnBatch:
+    """
+    Records flattened into typed columns. Windows are appended with ``extend``.
+
+    With a ``schema`` the columns are fixed. Without one, columns are inferred from the records:
+    nested dictionaries become dotted columns, and keys that appear in later windows add
+    columns that are null for the earlier rows.
+
+    :param schema: list of (dotted path, kind) (optional)
+    :param children: child batches for list fields, by field name. Each child gets its rows from
+        ``child_extractors`` (optional)
+    :ivar columns: the columns by name
+    :ivar num_rows: number of rows
+    """
+
+    def __init__(self,
+                 schema:Optional[List[Tuple[str, str]]] = None,
+                 children:Dict[str, 'ColumnBatch'] = None,
+                 child_extractors:Dict[str, Callable[[Sequence[Dict[str, Any]]], List[Dict[str, Any]]]] = None) -> None:
+        self.columns: Dict[str, Column] = {}
+        self.num_rows = 0
+        self._infer = schema is None
+        for name, kind in schema or []:
+            self.columns[name] = Column(name, kind)
+        self.children = children or {}
+        self._child_extractors = child_extractors or {}
+
+    def extend(self, records:Sequence[Dict[str, Any]]) -> None:
+        """
+        Append the records of one window.
+        """
+        if not records:
+            return
+        if self._infer:
+            # kind of the first non-null value of every path that has no column yet
+            kinds = {}
+            for record in records:
+                for path, value in _flatten_paths(record):
+                    if path not in self.columns and kinds.get(path) is None:
+                        kinds[path] = None if value is None else _infer_kind(value)
+            for path, kind in kinds.items():
+                self.columns[path] = Column(path, kind or 'object', self.num_rows)
+        for column in self.columns.values():
+            column.extend(records)
+        self.num_rows += len(records)
+        for name, child in self.children.items():
+            child.extend(self._child_extractors[name](records))
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        """
+        :return: the columns as lists with ``None`` for nulls
+        """
+        return {name: column.to_list() for name, column in self.columns.items()}
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """
+        Convert the columns to numpy arrays. Numeric columns without nulls share the memory of the buffers.
+        Numeric columns with nulls become masked arrays (floats use NaN instead).
+
+        :return: dictionary of numpy arrays
+        """
+        np = _import('numpy')
+        arrays = {}
+        for name, column in self.columns.items():
+            if column.kind in _TYPECODES:
+                values = np.frombuffer(column.values, dtype=column.values.typecode)
+                if column.kind == 'bool':
+                    values = values.view(np.bool_)
+                mask = np.frombuffer(column.valid, dtype=np.uint8) == 0
+                if column.kind != 'float' and mask.any():
+                    values = np.ma.MaskedArray(values, mask=mask)
+                arrays[name] = values
+            else:
+                arrays[name] = np.array(column.values, dtype=object)
+        return arrays
+
+    def to_arrow(self) -> Any:
+        """
+        :return: the columns as ``pyarrow.Table``. Numeric buffers are handed over without copying where possible
+        """
+        pa = _import('pyarrow')
+        np = _import('numpy')
+        names, arrays = [], []
+        for name, column in self.columns.items():
+            if column.kind in _TYPECODES:
+                values = np.frombuffer(column.values, dtype=column.values.typecode)
+                if column.kind == 'bool':
+                    values = values.view(np.bool_)
+                mask = np.frombuffer(column.valid, dtype=np.uint8) == 0
+                arrays.append(pa.array(values, mask=mask if mask.any() else None))
+            elif column.kind == 'str':
+                arrays.append(pa.array(column.values, type=pa.string()))
+            else:
+                try:
+                    arrays.append(pa.array(column.values))
+                except (pa.ArrowInvalid, pa.ArrowTypeError):
+                    # mixed types, store them as json strings
+                    arrays.append(pa.array([v if v is None or isinstance(v, str) else json.dumps(v) for v in column.values],
+                                           type=pa.string()))
+            names.append(name)
+        return pa.Table.from_arrays(arrays, names=names)
+
+    def to_pandas(self) -> Any:
+        """
+        :return: the columns as ``pandas.DataFrame``, converted through pyarrow
+        """
+        return self.to_arrow().to_pandas()
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __repr__(self) -> str:
+        return f"ColumnBatch(num_rows={self.num_rows}, columns={list(self.columns)}, children={list(self.children)})"
+
+
+def _import(module:str) -> Any:
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise AwinError(f"{module} is required for this conversion. Install it with: pip install awin-py[columnar]")
+
+
+def _transaction_parts(transactions:Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    parts = []
+    for transaction in transactions:
+        for part in transaction.get('transactionParts') or ():
+            parts.append(dict(part, transactionId=transaction.get('id')))
+    return parts
+
+
+def transaction_batch() -> ColumnBatch:
+    """
+    :return: an empty batch for transactions, with a ``transactionParts`` child batch keyed by ``transactionId``
+    """
+    return ColumnBatch(TRANSACTION_SCHEMA,
+                       children={'transactionParts': ColumnBatch(TRANSACTION_PART_SCHEMA)},
+                       child_extractors={'transactionParts': _transaction_parts})
+
+
+def report_batch() -> ColumnBatch:
+    """
+    :return: an empty batch for reports, with columns inferred from the records
+    """
+    return ColumnBatch()
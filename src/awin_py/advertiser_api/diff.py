@@ -0,0 +1,192 @@
+"""
+change detection for transaction windows that are fetched again
+
+Windows are fetched again to catch amendments, but most of their transactions did not change since the last run.
+``FingerprintStore`` keeps a 64 bit hash of the fields that matter per transaction id, so that a window can be reduced
+to the transactions that were inserted, changed or disappeared since the previous run, see ``Awin.diff_transactions``.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Tuple
+
+FINGERPRINT_FIELDS: Tuple[str, ...] = ('commissionStatus', 'amended', 'saleAmount', 'commissionAmount', 'validationDate')
+"""fields of a transaction whose changes are reported"""
+
+
+def fingerprint(transaction:Dict[str, Any], fields:Iterable[str] = FINGERPRINT_FIELDS) -> int:
+    """
+    :param transaction: a transaction as returned by the API
+    :param fields: the fields that are hashed
+    :return: a 64 bit hash of the fields, as a signed integer that fits a SQLite INTEGER
+    """
+    data = json.dumps([transaction.get(field) for field in fields], sort_keys=True, separators=(',', ':'), default=str)
+    return int.from_bytes(hashlib.blake2b(data.encode(), digest_size=8).digest(), 'big', signed=True)
+
+
+class TransactionDiff:
+    """
+    The changes of one date window since the previous run.
+
+    :ivar scope: the advertiser and filters the window was fetched with, see ``FingerprintStore.scope``
+    :ivar start: first timestamp of the window
+    :ivar end: last timestamp of the window
+    :ivar inserted: transactions that were not seen before
+    :ivar changed: transactions whose fingerprinted fields changed
+    :ivar disappeared: ids of transactions that were seen in the window before, but are not returned any more
+    :ivar unchanged: number of transactions that did not change
+    """
+    __slots__ = ('scope', 'start', 'end', 'inserted', 'changed', 'disappeared', 'unchanged', '_updates')
+
+    def __init__(self, scope:str, start:str, end:str) -> None:
+        self.scope = scope
+        self.start = start
+        self.end = end
+        self.inserted: List[Dict[str, Any]] = []
+        self.changed: List[Dict[str, Any]] = []
+        self.disappeared: List[int] = []
+        self.unchanged = 0
+        # (id, fingerprint, date) rows that ``FingerprintStore.apply`` writes
+        self._updates: List[Tuple[int, int, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self.inserted) + len(self.changed) + len(self.disappeared)
+
+    def __repr__(self) -> str:
+        return (f"TransactionDiff({self.start} - {self.end}, inserted={len(self.inserted)}, changed={len(self.changed)}, "
+                f"disappeared={len(self.disappeared)}, unchanged={self.unchanged})")
+
+
+class FingerprintStore:
+    """
+    Fingerprints of transactions in a SQLite database, one row per scope and transaction id.
+
+    :param path: path of the SQLite database file. Created if it does not exist. ':memory:' keeps the store in memory
+    :param fields: fields of a transaction whose changes are reported. Changing them reports every stored transaction
+        as changed once
+    """
+
+    def __init__(self, path:str, fields:Iterable[str] = FINGERPRINT_FIELDS) -> None:
+        self.path = path
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                scope TEXT,
+                id INTEGER,
+                fingerprint INTEGER,
+                date TEXT,
+                seen REAL,
+                PRIMARY KEY (scope, id)
+            )""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS fingerprints_date ON fingerprints (scope, date)")
+
+    @staticmethod
+    def scope(advertiser_id:str, params:Dict[str, Any]) -> str:
+        """
+        Windows fetched with different filters (date type, status, publisher, timezone) return different transactions,
+        so their fingerprints are kept apart.
+
+        :param advertiser_id: the advertiser id
+        :param params: the parameters of the request, without the dates of the window
+        :return: the key of the fingerprints
+        """
+        return json.dumps(dict({k: v for k, v in params.items() if v is not None}, advertiser=str(advertiser_id)),
+                          sort_keys=True, default=str)
+
+    def diff(self, scope:str, start:str, end:str, transactions:List[Dict[str, Any]], date_field:str) -> TransactionDiff:
+        """
+        Compare a window with the fingerprints of the previous runs. The store is not changed until ``apply``.
+
+        :param scope: the key of the fingerprints, see ``scope``
+        :param start: first timestamp of the window, as sent to the API
+        :param end: last timestamp of the window, as sent to the API
+        :param transactions: all transactions of the window
+        :param date_field: the field the window selects on, e.g. 'transactionDate'
+        :return: the changes of the window
+        """
+        diff = TransactionDiff(scope, start, end)
+        with self._lock:
+            stored = {row[0]: row[1:] for row in self._connection.execute(
+                "SELECT id, fingerprint, date FROM fingerprints WHERE scope = ? AND date BETWEEN ? AND ?",
+                (scope, start, end)).fetchall()}
+            # transactions whose date moved into this window are stored under their old date
+            outside = [int(transaction['id']) for transaction in transactions if int(transaction['id']) not in stored]
+            for i in range(0, len(outside), 500):
+                chunk = outside[i:i + 500]
+                stored.update((row[0], row[1:]) for row in self._connection.execute(
+                    f"SELECT id, fingerprint, date FROM fingerprints WHERE scope = ? AND id IN ({', '.join('?' * len(chunk))})",
+                    [scope] + chunk).fetchall())
+        returned = set()
+        for transaction in transactions:
+            transaction_id = int(transaction['id'])
+            returned.add(transaction_id)
+            value = fingerprint(transaction, self.fields)
+            date = transaction.get(date_field)
+            previous = stored.get(transaction_id)
+            if previous is None:
+                diff.inserted.append(transaction)
+            elif previous[0] != value:
+                diff.changed.append(transaction)
+            else:
+                diff.unchanged += 1
+                if previous[1] == date:
+                    continue
+            diff._updates.append((transaction_id, value, date))
+        diff.disappeared = [transaction_id for transaction_id, (_, date) in stored.items()
+                            if transaction_id not in returned and date is not None and start <= date <= end]
+        return diff
+
+    def apply(self, diff:TransactionDiff) -> None:
+        """
+        Store the fingerprints of a window, so that the next run compares with it.
+        Fingerprints of disappeared transactions are removed.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)",
+                                             [(diff.scope, transaction_id, value, date, now)
+                                              for transaction_id, value, date in diff._updates])
+                self._connection.executemany("DELETE FROM fingerprints WHERE scope = ? AND id = ?",
+                                             [(diff.scope, transaction_id) for transaction_id in diff.disappeared])
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def count(self, scope:str = None) -> int:
+        """
+        :return: number of stored fingerprints, of one scope or of all scopes
+        """
+        with self._lock:
+            if scope is None:
+                return self._connection.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+            return self._connection.execute("SELECT COUNT(*) FROM fingerprints WHERE scope = ?", (scope,)).fetchone()[0]
+
+    def clear(self, scope:str = None) -> None:
+        """
+        Forget the fingerprints of one scope or of all scopes. The next run reports every transaction as inserted.
+        """
+        with self._lock:
+            if scope is None:
+                self._connection.execute("DELETE FROM fingerprints")
+            else:
+                self._connection.execute("DELETE FROM fingerprints WHERE scope = ?", (scope,))
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'FingerprintStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
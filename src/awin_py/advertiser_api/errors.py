@@ -1,7 +1,8 @@
 """
 types of errors specified by awin-py
 """
-from typing import Any, Dict, Type
+import json
+from typing import Any, Dict, List, Type
 from requests import Response
 
 class AwinError(Exception):
@@ -54,12 +55,52 @@ class AwinApiError(AwinError):
                 message=response.text,
                 response=response)
 
+    @classmethod
+    def from_text(cls, status_code: int, text: str, response: Any = None):
+        """
+        Creates a ``AwinApiError`` from the status code and body of a HTTP response.
+        Used for responses that are not ``requests.Response`` objects, e.g. by the async client.
+
+        :param status_code: the HTTP status code of the API response
+        :param text: the body of the API response
+        :param response: the HTTP response (optional)
+        :return: a AwinApiError that matches the HTTP error
+        """
+        try:
+            data: Dict = json.loads(text)
+            return AwinApiError(
+                status_code=status_code,
+                error=data.get('error'),
+                message=data.get('description'),
+                response=response)
+        except (ValueError, AttributeError):
+            return AwinApiError(
+                status_code=status_code,
+                message=text,
+                response=response)
+
     def __str__(self):
         message = f"Request failed with HTTP status code {self.status_code}: {self.error}."
         if self.error:
             message += f" Details: {self.message}"
         return message
-    
+
+class MissingTransactionsError(AwinError):
+    """
+    Some of the requested transaction ids were not returned by the Awin API
+
+    :param missing_ids: the ids that were not found
+    :param transactions: the transactions that were found
+    """
+
+    def __init__(self, missing_ids: List[str], transactions: List[Any]):
+        super().__init__()
+        self.missing_ids = missing_ids
+        self.transactions = transactions
+
+    def __str__(self):
+        return f"{len(self.missing_ids)} transaction ids were not found: {', '.join(self.missing_ids)}"
+
 # class UnsupportedMethodError(AwinError):
 #     """this method is not supported by this class (but it might be by a similar one)"""
 
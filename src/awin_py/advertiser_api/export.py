@@ -0,0 +1,309 @@
+"""
+export of long date ranges to date partitioned files
+
+Each window is handed to a writer thread as soon as it arrives, so fetching the next windows and
+writing the previous ones overlap, and memory is bounded by the windows in flight instead of the whole range.
+Files are written as ``<directory>/advertiser=<id>/date=<day>/part-<n>-<run>.jsonl.gz`` (or ``.parquet``),
+each one atomically through a temporary file, and ``manifest.json`` lists the completed files.
+A partition holds the files of the last run that wrote to it, so running an export again replaces its partitions.
+Parquet needs pyarrow: pip install awin-py[columnar]
+"""
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .client import Awin
+from .columnar import TRANSACTION_SCHEMA, ColumnBatch, _import
+from .errors import AwinError
+from .literals import DateType
+
+FORMATS = ('jsonl', 'parquet')
+"""file formats of the export"""
+
+_DATE_FIELDS = {'transaction': 'transactionDate', 'validation': 'validationDate'}
+
+_DONE = object()
+
+
+def date_partition(field:str, granularity:str = 'day') -> Callable[[Dict[str, Any]], str]:
+    """
+    :param field: the field that holds the timestamp of a record, e.g. 'transactionDate'
+    :param granularity: 'day' or 'month'
+    :return: a function that returns the partition of a record, e.g. ``date=2024-05-14``
+    """
+    if granularity not in ('day', 'month'):
+        raise AwinError(f"unknown granularity '{granularity}', use 'day' or 'month'")
+    length = 10 if granularity == 'day' else 7
+    def partition(record:Dict[str, Any]) -> str:
+        value = record.get(field)
+        return f"date={value[:length]}" if isinstance(value, str) and len(value) >= length else 'date=unknown'
+    return partition
+
+
+class PartitionedWriter:
+    """
+    Writes lists of records to partitioned files from a background thread.
+
+    ``write`` only queues the records. At most ``queue_size`` lists wait for the writer, after that ``write`` blocks,
+    so a fast producer can not fill the memory. An error of the writer is raised by the next ``write`` or by ``close``.
+
+    The first write of a run to a partition replaces the files of earlier runs in that partition: they are removed
+    from the manifest together with adding the new file, and deleted once the manifest is written.
+    A run that covers only part of a partition (e.g. half a month of a monthly partition) therefore drops the rest.
+
+    :param directory: the root directory of the export. Created if it does not exist
+    :param format: 'jsonl' (gzip compressed JSON lines) or 'parquet'
+    :param partition_by: function that returns the partition directory of a record, e.g. ``date_partition('transactionDate')``
+    :param schema: columns of the parquet files as (dotted path, kind), see ``columnar.ColumnBatch``.
+        Without a schema the columns are inferred per file
+    :param queue_size: maximum number of lists waiting to be written
+    """
+
+    def __init__(self,
+                 directory:str,
+                 format:str = 'jsonl',
+                 partition_by:Callable[[Dict[str, Any]], str] = None,
+                 schema:Optional[List[Tuple[str, str]]] = None,
+                 queue_size:int = 4) -> None:
+        if format not in FORMATS:
+            raise AwinError(f"unknown export format '{format}', use one of {FORMATS}")
+        if format == 'parquet':
+            # fail before the first request, not in the writer thread
+            _import('pyarrow')
+        self.directory = directory
+        self.format = format
+        self.partition_by = partition_by
+        self.schema = schema
+        self.run_id = uuid.uuid4().hex[:8]
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, 'manifest.json')
+        if os.path.exists(self._manifest_path):
+            with open(self._manifest_path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {'format': format, 'files': {}}
+        if self.manifest.get('format') != format:
+            raise AwinError(f"{directory} already holds a {self.manifest.get('format')} export")
+        self._sequence = 0
+        # partitions written by this run
+        self._partitions = set()
+        self._error: Optional[BaseException] = None
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name='awin-export-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, records:List[Dict[str, Any]], prefix:str = '', partition:str = None) -> None:
+        """
+        Queue records to be written.
+
+        :param records: the records, e.g. the results of one window
+        :param prefix: directory below the export directory, e.g. ``advertiser=11111``
+        :param partition: partition directory of all records. Defaults to ``partition_by`` of each record
+        """
+        self._raise_error()
+        if records:
+            self._queue.put((records, prefix, partition))
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Wait until all queued records are written.
+
+        :return: the manifest
+        """
+        if self._thread.is_alive():
+            self._queue.put(_DONE)
+            self._thread.join()
+        self._raise_error()
+        return self.manifest
+
+    def __enter__(self) -> 'PartitionedWriter':
+        return self
+
+    def __exit__(self, exc_type, *exc_info) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # don't hide the original error behind one of the writer
+            self._queue.put(_DONE)
+            self._thread.join()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise AwinError(f"export to {self.directory} failed: {self._error!r}") from self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                # drain the queue so that the producer does not block
+                continue
+            try:
+                self._write_records(*item)
+            except Exception as e:
+                logging.error(f'writing export files failed: {e!r}')
+                self._error = e
+
+    def _write_records(self, records:List[Dict[str, Any]], prefix:str, partition:Optional[str]) -> None:
+        if partition is not None:
+            partitions = {partition: records}
+        else:
+            partitions = {}
+            for record in records:
+                partitions.setdefault(self.partition_by(record), []).append(record)
+        sequence = self._sequence
+        self._sequence += 1
+        files = {}
+        replaced = []
+        for name, partition_records in partitions.items():
+            relative_path = '/'.join(part for part in (prefix, name) if part)
+            partition_path = os.path.join(self.directory, relative_path)
+            os.makedirs(partition_path, exist_ok=True)
+            if relative_path not in self._partitions:
+                # files of earlier runs, including files of crashed runs that never made it into the manifest
+                self._partitions.add(relative_path)
+                replaced.extend(f"{relative_path}/{filename}" for filename in os.listdir(partition_path)
+                                if filename.startswith('part-'))
+            filename = f"{relative_path}/part-{sequence:05d}-{self.run_id}.{'jsonl.gz' if self.format == 'jsonl' else 'parquet'}"
+            self._write_file(os.path.join(self.directory, filename), partition_records)
+            files[filename] = {'records': len(partition_records)}
+        for filename in replaced:
+            self.manifest['files'].pop(filename, None)
+        self.manifest['files'].update(files)
+        self.manifest['records'] = sum(f['records'] for f in self.manifest['files'].values())
+        self._write_atomic(self._manifest_path, lambda path: _write_bytes(path, json.dumps(self.manifest, indent=2).encode()))
+        for filename in replaced:
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                pass
+
+    def _write_file(self, path:str, records:List[Dict[str, Any]]) -> None:
+        if self.format == 'jsonl':
+            self._write_atomic(path, lambda tmp_path: _write_jsonl(tmp_path, records))
+        else:
+            batch = ColumnBatch(self.schema)
+            batch.extend(records)
+            table = batch.to_arrow()
+            parquet = _import('pyarrow.parquet')
+            self._write_atomic(path, lambda tmp_path: parquet.write_table(table, tmp_path))
+
+    @staticmethod
+    def _write_atomic(path:str, write:Callable[[str], None]) -> None:
+        tmp_path = f"{path}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+
+
+def _write_bytes(path:str, data:bytes) -> None:
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def _write_jsonl(path:str, records:List[Dict[str, Any]]) -> None:
+    with gzip.open(path, 'wt', compresslevel=6) as f:
+        for record in records:
+            f.write(json.dumps(record))
+            f.write('\n')
+
+
+def _advertisers(client:Awin, advertiser_ids:Optional[Iterable[Any]]) -> List[Tuple[str, Awin]]:
+    if advertiser_ids is None:
+        return [(str(client.client_id), client)]
+    return [(str(advertiser_id), client.for_advertiser(advertiser_id)) for advertiser_id in advertiser_ids]
+
+
+def export_transactions(client:Awin,
+                        directory:str,
+                        start_date:datetime,
+                        end_date:datetime,
+                        format:str = 'jsonl',
+                        date_type:DateType = 'transaction',
+                        granularity:str = 'day',
+                        advertiser_ids:Iterable[Any] = None,
+                        queue_size:int = 4,
+                        **kwargs) -> Dict[str, Any]:
+    """
+    Export the transactions of a date range to files partitioned by advertiser and date.
+
+    :param client: the client. Other advertisers are fetched through ``Awin.for_advertiser``
+    :param directory: the root directory of the export
+    :param start_date: beginning of the date range
+    :param end_date: end of the date range
+    :param format: 'jsonl' or 'parquet'
+    :param date_type: the date the transactions are selected and partitioned by, 'transaction' or 'validation'
+    :param granularity: 'day' or 'month' partitions
+    :param advertiser_ids: the advertisers to export. Defaults to the advertiser of the client
+    :param queue_size: maximum number of windows waiting to be written
+    :param kwargs: passed on to ``Awin.iter_transactions``, e.g. ``status`` or ``timezone``
+    :return: the manifest of the export
+    """
+    partition_by = date_partition(_DATE_FIELDS.get(date_type, 'transactionDate'), granularity)
+    with PartitionedWriter(directory, format, partition_by, schema=TRANSACTION_SCHEMA, queue_size=queue_size) as writer:
+        for advertiser_id, advertiser_client in _advertisers(client, advertiser_ids):
+            logging.info(f'exporting transactions of advertiser {advertiser_id}')
+            for window in advertiser_client.iter_transactions(start_date=start_date, end_date=end_date, date_type=date_type,
+                                                              batches=True, **kwargs):
+                writer.write(window, prefix=f'advertiser={advertiser_id}')
+    return writer.manifest
+
+
+def _periods(start_date:datetime, end_date:datetime, granularity:str) -> Iterable[Tuple[datetime, datetime, str]]:
+    day = start_date.date() if isinstance(start_date, datetime) else start_date
+    last = end_date.date() if isinstance(end_date, datetime) else end_date
+    while day <= last:
+        if granularity == 'day':
+            period_end, name = day, day.isoformat()
+        else:
+            next_month = (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+            period_end, name = min(last, next_month - timedelta(days=1)), day.strftime('%Y-%m')
+        yield datetime.combine(day, datetime.min.time()), datetime.combine(period_end, datetime.min.time()), name
+        day = period_end + timedelta(days=1)
+
+
+def export_reports(client:Awin,
+                   report:str,
+                   directory:str,
+                   start_date:datetime,
+                   end_date:datetime,
+                   format:str = 'jsonl',
+                   granularity:str = 'month',
+                   advertiser_ids:Iterable[Any] = None,
+                   queue_size:int = 4,
+                   **kwargs) -> Dict[str, Any]:
+    """
+    Export an aggregated report period by period, to files partitioned by advertiser and period.
+    Reports are aggregated over the requested range, so every period is requested on its own.
+
+    :param client: the client. Other advertisers are fetched through ``Awin.for_advertiser``
+    :param report: 'publisher', 'creative' or 'campaign'
+    :param directory: the root directory of the export
+    :param start_date: first day of the date range
+    :param end_date: last day of the date range
+    :param format: 'jsonl' or 'parquet'
+    :param granularity: 'day' or 'month' periods
+    :param advertiser_ids: the advertisers to export. Defaults to the advertiser of the client
+    :param queue_size: maximum number of periods waiting to be written
+    :param kwargs: passed on to ``Awin.iter_reports_agg_by_<report>``, e.g. ``region`` or ``timezone``
+    :return: the manifest of the export
+    """
+    if report not in ('publisher', 'creative', 'campaign'):
+        raise AwinError(f"unknown report '{report}', use 'publisher', 'creative' or 'campaign'")
+    if granularity not in ('day', 'month'):
+        raise AwinError(f"unknown granularity '{granularity}', use 'day' or 'month'")
+    with PartitionedWriter(directory, format, queue_size=queue_size) as writer:
+        for advertiser_id, advertiser_client in _advertisers(client, advertiser_ids):
+            logging.info(f'exporting {report} reports of advertiser {advertiser_id}')
+            iter_report = getattr(advertiser_client, f'iter_reports_agg_by_{report}')
+            for period_start, period_end, name in _periods(start_date, end_date, granularity):
+                rows = [row for window in iter_report(start_date=period_start, end_date=period_end, batches=True, **kwargs)
+                        for row in window]
+                writer.write(rows, prefix=f'advertiser={advertiser_id}', partition=f'date={name}')
+    return writer.manifest
@@ -0,0 +1,304 @@
+"""
+instrumentation of the Awin clients: aggregated statistics, per-request hooks and tracing spans
+"""
+import bisect
+import contextlib
+import logging
+import re
+import threading
+from datetime import timedelta
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+LATENCY_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+"""upper bounds in seconds of the buckets of the latency histograms"""
+
+WINDOW_BUCKETS: Tuple[float, ...] = (1 / 24, 0.25, 1, 2, 4, 8, 16, 31)
+"""upper bounds in days of the buckets of the window size histogram"""
+
+RECORD_BUCKETS: Tuple[float, ...] = (0, 10, 100, 1000, 5000, 10000, 50000, 100000)
+"""upper bounds of the buckets of the histogram of results per window"""
+
+
+def endpoint_name(path:str) -> str:
+    """
+    Name of the endpoint of a request path, with the advertiser id replaced, e.g. ``advertisers/{id}/transactions``
+
+    :param path: the URL path (relative to the Awin API base URL)
+    """
+    return re.sub(r'/\d+(?=/|$)', '/{id}', '/' + path.strip('/'))[1:]
+
+
+class Histogram:
+    """
+    A histogram with fixed buckets. Not thread safe, ``ClientStats`` updates it under its lock.
+
+    :param buckets: the upper bounds of the buckets in ascending order. Larger values fall into an overflow bucket
+    :ivar counts: number of values per bucket, the last one counts the values above the largest bound
+    """
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, buckets:Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value:float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q:float) -> Optional[float]:
+        """
+        Estimate a percentile by interpolating inside the bucket it falls into.
+
+        :param q: the percentile, between 0 and 100
+        :return: the estimate, or None if the histogram is empty
+        """
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else self.min
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                lower, upper = max(lower, self.min), min(upper, self.max)
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'buckets': dict(zip([*map(str, self.buckets), 'inf'], self.counts)),
+        }
+
+
+class EndpointStats:
+    """
+    Statistics of the requests to one endpoint.
+
+    :ivar requests: number of HTTP requests, including retried attempts
+    :ivar errors: number of attempts that failed with an error status or exception
+    :ivar bytes: bytes received, as sent over the wire
+    :ivar latency: histogram of the seconds until the response headers arrived
+    """
+    __slots__ = ('requests', 'errors', 'bytes', 'latency')
+
+    def __init__(self) -> None:
+        self.requests = 0
+        self.errors = 0
+        self.bytes = 0
+        self.latency = Histogram()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'requests': self.requests, 'errors': self.errors, 'bytes': self.bytes, 'latency': self.latency.to_dict()}
+
+
+class RequestEvent:
+    """
+    Passed to the hooks of a client after every attempt of a request.
+
+    :ivar method: the HTTP method
+    :ivar path: the URL path (relative to the Awin API base URL)
+    :ivar endpoint: the path with the advertiser id replaced, see ``endpoint_name``
+    :ivar params: the URL parameters
+    :ivar attempt: number of the attempt, 0 for the first one
+    :ivar status_code: the HTTP status code, None if the request raised an exception
+    :ivar elapsed: seconds until the response headers arrived
+    :ivar bytes: bytes received, None if the body is streamed and not known yet
+    :ivar error: the exception of a failed request (optional)
+    """
+    __slots__ = ('method', 'path', 'endpoint', 'params', 'attempt', 'status_code', 'elapsed', 'bytes', 'error')
+
+    def __init__(self, method:str, path:str, params:Optional[Dict[str, Any]], attempt:int, status_code:Optional[int],
+                 elapsed:float, bytes:Optional[int] = None, error:BaseException = None) -> None:
+        self.method = method
+        self.path = path
+        self.endpoint = endpoint_name(path)
+        self.params = params
+        self.attempt = attempt
+        self.status_code = status_code
+        self.elapsed = elapsed
+        self.bytes = bytes
+        self.error = error
+
+    def __repr__(self) -> str:
+        return (f"RequestEvent(method={self.method!r}, endpoint={self.endpoint!r}, attempt={self.attempt}, "
+                f"status_code={self.status_code}, elapsed={self.elapsed:.3f}, bytes={self.bytes})")
+
+
+class ClientStats:
+    """
+    Aggregated statistics of a client. Safe to update from several threads.
+
+    :ivar requests: number of HTTP requests, including retried attempts
+    :ivar errors: number of attempts that failed with an error status or exception
+    :ivar bytes: bytes received, as sent over the wire
+    :ivar cache_hits: number of requests answered from the response cache
+    :ivar retries: number of retries
+    :ivar retry_wait: seconds spent waiting between attempts
+    :ivar throttle_wait: seconds spent waiting for the rate limiter
+    :ivar parse_time: seconds spent parsing JSON responses. For streamed responses this includes the download
+    :ivar endpoints: ``EndpointStats`` by endpoint name
+    :ivar window_days: histogram of the size in days of the fetched date windows
+    :ivar window_records: histogram of the number of results per date window
+    :ivar window_latency: histogram of the seconds per date window, including retries and parsing
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Set all statistics back to zero.
+        """
+        with self._lock:
+            self.requests = 0
+            self.errors = 0
+            self.bytes = 0
+            self.cache_hits = 0
+            self.retries = 0
+            self.retry_wait = 0.0
+            self.throttle_wait = 0.0
+            self.parse_time = 0.0
+            self.endpoints: Dict[str, EndpointStats] = {}
+            self.window_days = Histogram(WINDOW_BUCKETS)
+            self.window_records = Histogram(RECORD_BUCKETS)
+            self.window_latency = Histogram()
+
+    def record_request(self, event:RequestEvent) -> None:
+        with self._lock:
+            endpoint = self.endpoints.get(event.endpoint)
+            if endpoint is None:
+                endpoint = self.endpoints[event.endpoint] = EndpointStats()
+            failed = event.error is not None or event.status_code is None or event.status_code >= 400
+            self.requests += 1
+            endpoint.requests += 1
+            self.errors += failed
+            endpoint.errors += failed
+            endpoint.latency.observe(event.elapsed)
+            if event.bytes:
+                self.bytes += event.bytes
+                endpoint.bytes += event.bytes
+
+    def record_bytes(self, path:str, size:int) -> None:
+        """
+        Add the size of a streamed response, which is known after it was read.
+        """
+        with self._lock:
+            self.bytes += size
+            endpoint = self.endpoints.get(endpoint_name(path))
+            if endpoint is not None:
+                endpoint.bytes += size
+
+    def record_cache_hit(self) -> None:
+        with self._lock:
+            self.cache_hits += 1
+
+    def record_retry(self, wait:float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += wait
+
+    def record_throttle(self, wait:float) -> None:
+        with self._lock:
+            self.throttle_wait += wait
+
+    def record_parse(self, seconds:float) -> None:
+        with self._lock:
+            self.parse_time += seconds
+
+    def record_window(self, span:timedelta, records:int, seconds:float) -> None:
+        """
+        :param span: the date range of the window
+        :param records: number of results of the window
+        :param seconds: seconds it took to fetch the window
+        """
+        with self._lock:
+            self.window_days.observe(span / timedelta(days=1))
+            self.window_records.observe(records)
+            self.window_latency.observe(seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: a snapshot of all statistics as dictionary, e.g. to export them to a metrics system
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'errors': self.errors,
+                'bytes': self.bytes,
+                'cache_hits': self.cache_hits,
+                'retries': self.retries,
+                'retry_wait': self.retry_wait,
+                'throttle_wait': self.throttle_wait,
+                'parse_time': self.parse_time,
+                'endpoints': {name: endpoint.to_dict() for name, endpoint in self.endpoints.items()},
+                'window_days': self.window_days.to_dict(),
+                'window_records': self.window_records.to_dict(),
+                'window_latency': self.window_latency.to_dict(),
+            }
+
+    def __repr__(self) -> str:
+        return (f"ClientStats(requests={self.requests}, errors={self.errors}, bytes={self.bytes}, "
+                f"cache_hits={self.cache_hits}, retries={self.retries}, retry_wait={self.retry_wait:.1f}, "
+                f"throttle_wait={self.throttle_wait:.1f}, parse_time={self.parse_time:.2f}, "
+                f"windows={self.window_latency.count})")
+
+
+def call_hooks(hooks:List[Callable[[RequestEvent], None]], event:RequestEvent) -> None:
+    """
+    Call every hook with the event. A failing hook is logged and does not fail the request.
+    """
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as e:
+            logging.warning(f'request hook {hook!r} failed: {e!r}')
+
+
+@contextlib.contextmanager
+def span(tracer:Any, name:str, attributes:Dict[str, Any] = None) -> Iterator[Any]:
+    """
+    Open a span with an OpenTelemetry compatible tracer, i.e. any object with a
+    ``start_as_current_span(name, attributes=...)`` context manager. Without a tracer nothing is recorded.
+
+    :param tracer: the tracer, e.g. ``opentelemetry.trace.get_tracer('awin_py')`` (optional)
+    :param name: name of the span
+    :param attributes: attributes of the span, None values are left out
+    :return: the span, or None without a tracer
+    """
+    if tracer is None:
+        yield None
+        return
+    attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+def set_span_attributes(current:Any, attributes:Dict[str, Any]) -> None:
+    """
+    Set attributes on a span opened by ``span``, None values are left out. Does nothing without a span.
+    """
+    if current is None:
+        return
+    for key, value in attributes.items():
+        if value is not None:
+            current.set_attribute(key, value)
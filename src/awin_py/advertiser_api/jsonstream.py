@@ -0,0 +1,137 @@
+"""
+json decoding of Awin API responses
+
+``iter_json_array`` parses the top-level JSON array of a response element by element while it is
+downloaded, so only one element at a time has to be held in memory. The optional fast backends
+are used when they are installed (pip install awin-py[fast-json]): ijson for streaming and
+orjson for complete responses.
+"""
+import codecs
+import json
+from typing import Any, IO, Iterator
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+def loads(data:bytes) -> Any:
+    """
+    Parse a complete json document, with orjson if it is installed.
+
+    :raises ValueError: if the document is not valid json
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def iter_json_array(chunks:Iterator[bytes]) -> Iterator[Any]:
+    """
+    Parse a top-level JSON array incrementally with the standard library.
+
+    :param chunks: the UTF-8 encoded document in chunks of any size
+    :return: iterator over the elements of the array
+    :raises ValueError: if the document is not a valid JSON array
+    """
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    started = False
+    exhausted = False
+    # what may follow: 'first' after '[', 'element' after ',', 'separator' after an element and 'end' after ']'
+    expect = 'first'
+    chunks = iter(chunks)
+
+    def skip_whitespace(index:int) -> int:
+        while index < len(buffer) and buffer[index] in _WHITESPACE:
+            index += 1
+        return index
+
+    while True:
+        position = skip_whitespace(position)
+        # decode as much as possible from the buffer before reading the next chunk
+        if position < len(buffer):
+            if expect == 'end':
+                raise ValueError(f"Unexpected data after the JSON array: {buffer[position:position + 20]!r}")
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError(f"Expected a JSON array, got {buffer[position:position + 20]!r}")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                if expect == 'element':
+                    raise ValueError("Expected an array element after ',', got ']'")
+                # only whitespace may follow the array
+                expect = 'end'
+                position += 1
+                continue
+            if buffer[position] == ',':
+                if expect != 'separator':
+                    raise ValueError("Expected an array element, got ','")
+                expect = 'element'
+                position += 1
+                continue
+            try:
+                element, end = _decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                # an element is only complete once the next separator has arrived,
+                # otherwise a number like 12 could be the beginning of 123
+                following = skip_whitespace(end)
+                if following < len(buffer) and buffer[following] in ',]':
+                    yield element
+                    position = following
+                    expect = 'separator'
+                    continue
+                if exhausted:
+                    if following < len(buffer):
+                        raise ValueError(f"Expected ',' or ']' after an array element, got {buffer[following]!r}")
+                    raise ValueError("Unterminated JSON array")
+        elif exhausted:
+            if expect == 'end':
+                return
+            raise ValueError("Unterminated JSON array")
+
+        # drop the consumed part of the buffer and read the next chunk
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += utf8.decode(next(chunks))
+        except StopIteration:
+            buffer += utf8.decode(b'', final=True)
+            exhausted = True
+
+
+def iter_json_array_from_file(fp:IO[bytes], chunk_size:int = 65536) -> Iterator[Any]:
+    """
+    Parse a top-level JSON array incrementally from a file-like object, with ijson if it is installed.
+
+    :param fp: binary file-like object, e.g. the raw stream of a HTTP response
+    :param chunk_size: number of bytes read at once
+    :return: iterator over the elements of the array
+    :raises ValueError: if the document is not a valid JSON array
+    """
+    if ijson is not None:
+        return _iter_ijson(fp, chunk_size)
+    return iter_json_array(iter(lambda: fp.read(chunk_size), b''))
+
+
+def _iter_ijson(fp:IO[bytes], chunk_size:int) -> Iterator[Any]:
+    # the errors of ijson are no ValueErrors, raise them like the errors of the standard library parser
+    try:
+        yield from ijson.items(fp, 'item', use_float=True, buf_size=chunk_size)
+    except ijson.JSONError as e:
+        raise ValueError(f"Invalid JSON array: {e}") from e
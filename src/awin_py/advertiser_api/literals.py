@@ -0,0 +1,35 @@
+"""
+type aliases for the parameters of the Awin API endpoints
+"""
+from typing import Literal
+
+Timezone = Literal[
+    'Europe/Berlin',
+    'Europe/Paris',
+    'Europe/London',
+    'Europe/Dublin',
+    'Canada/Eastern',
+    'Canada/Central',
+    'Canada/Mountain',
+    'Canada/Pacific',
+    'US/Eastern',
+    'US/Central',
+    'US/Mountain',
+    'US/Pacific',
+    'UTC'
+]
+"""timezones supported by the Awin API"""
+
+DateType = Literal['transaction', 'validation']
+"""the type of date by which transactions are selected"""
+
+TransactionStatus = Literal['pending', 'approved', 'declined', 'deleted']
+"""the status of a transaction"""
+
+Region = Literal['AT', 'AU', 'BE', 'BR', 'BU', 'CA', 'CH', 'DE',
+                 'DK', 'ES', 'FI', 'FR', 'GB', 'IE', 'IT', 'NL', 'NO', 'PL', 'SE',
+                 'US']
+"""regions of the creative reports"""
+
+Interval = Literal['day', 'month', 'year']
+"""intervals of the campaign reports"""
@@ -0,0 +1,102 @@
+"""
+in-process memoization of slow changing endpoints, e.g. accounts and publishers
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    """A request in flight, shared by all callers that asked for the same key."""
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self) -> None:
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class RequestMemo:
+    """
+    Keeps results in memory for ``ttl`` seconds and coalesces concurrent calls: while a result is being fetched,
+    other threads asking for the same key wait for that fetch instead of sending their own request.
+    Least recently used entries are evicted above ``max_entries``. Safe to share between clients and threads.
+
+    :param ttl: seconds a result is kept. With 0 results are not kept, but concurrent calls are still coalesced
+    :param max_entries: maximum number of results kept
+    :ivar hits: calls answered from memory
+    :ivar misses: calls that fetched the result
+    :ivar coalesced: calls that waited for the fetch of another call
+    """
+
+    def __init__(self, ttl:float = 300, max_entries:int = 256) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[float, Any]]' = OrderedDict()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key:Hashable, fetch:Callable[[], Any]) -> Any:
+        """
+        :param key: identifies the request, e.g. (path, params)
+        :param fetch: function that fetches the result if it is neither in memory nor in flight
+        :return: the result. An error of ``fetch`` is raised in every caller that waited for it
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                if call.error is None and self.ttl > 0:
+                    self._entries[key] = (time.monotonic() + self.ttl, call.result)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            call.event.set()
+        return call.result
+
+    def invalidate(self, key:Hashable = None) -> None:
+        """
+        Forget a result, or all results without a key.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (f"RequestMemo(ttl={self.ttl}, entries={len(self._entries)}, hits={self.hits}, "
+                f"misses={self.misses}, coalesced={self.coalesced})")
@@ -1,34 +1,223 @@
-from typing import Optional, List
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
+from functools import lru_cache
+"""
+models of the Awin API responses
 
+The models use ``__slots__`` instead of a per-instance ``__dict__`` and convert the camelCase
+keys of the API through a memoized key map, so that millions of transactions can be held in memory.
+Keys that a model does not know are kept in ``extra``.
+"""
 
-class AdvertiserCost:
+
+@lru_cache(maxsize=None)
+def _to_snake_case(string:str) -> str:
+    return ''.join(['_' + c.lower() if c.isupper() else c for c in string]).lstrip('_')
+
+
+@lru_cache(maxsize=None)
+def _to_camel_case(string:str) -> str:
+    head, *tail = string.split('_')
+    return head + ''.join(part[:1].upper() + part[1:] for part in tail)
+
+
+def _parse_datetime(value:Any) -> Any:
+    """
+    Parse an ISO 8601 timestamp of the API, e.g. 2024-05-14T20:59:00.
+    Values that are not valid timestamps are returned unchanged.
+    """
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+    except ValueError:
+        return value
+
+
+@lru_cache(maxsize=None)
+def _model_fields(model:type) -> Tuple[str, ...]:
+    """
+    :return: the names of the public fields of a model class
+    """
+    fields = []
+    for klass in reversed(model.__mro__):
+        fields.extend(s for s in getattr(klass, '__slots__', ()) if not s.startswith('_') and s != 'extra')
+    return tuple(fields)
+
+
+@lru_cache(maxsize=None)
+def _key_map(model:type) -> Dict[str, Tuple[Callable[[Any, Any], None], str, Optional[Callable[[Any], Any]]]]:
+    """
+    Map the camelCase keys of the API to the slot setter, the field name and the parser
+    (nested model or timestamp) of a model class. Built once per class.
+    """
+    key_map = {}
+    for name in _model_fields(model):
+        setter = getattr(model, name).__set__
+        parse = model._nested.get(name) or (_parse_datetime if name in model._datetimes else None)
+        key_map[_to_camel_case(name)] = (setter, name, parse)
+        # the constructors of the models also accept snake case keys
+        key_map[name] = (setter, name, parse)
+    return key_map
+
+
+class Model:
+    """
+    Base class of all models.
+
+    :cvar _nested: parsers of the fields that hold nested objects, by snake_case field name
+    :cvar _datetimes: snake_case names of the fields that hold timestamps
+    """
+    __slots__ = ('extra', '_raw')
+    _nested: Dict[str, Callable[[Any], Any]] = {}
+    _datetimes: FrozenSet[str] = frozenset()
+
+    @classmethod
+    def from_dict(cls, data:Dict[str, Any], lazy:bool = False) -> 'Model':
+        """
+        Create a model from a dictionary of the API.
+
+        :param data: the dictionary with camelCase keys
+        :param lazy: keep nested objects as dictionaries until their field is first accessed
+        :return: the model
+        """
+        model = cls.__new__(cls)
+        model._load(data, lazy)
+        return model
+
+    def _load(self, data:Dict[str, Any], lazy:bool) -> None:
+        key_map = _key_map(type(self))
+        raw = None
+        extra = None
+        for key, value in data.items():
+            try:
+                setter, name, parse = key_map[key]
+            except KeyError:
+                if extra is None:
+                    extra = {}
+                extra[_to_snake_case(key)] = value
+                continue
+            if parse is not None and value is not None:
+                if lazy and parse is not _parse_datetime:
+                    if raw is None:
+                        raw = {}
+                    raw[name] = value
+                    continue
+                value = parse(value)
+            setter(self, value)
+        self._raw = raw
+        self.extra = extra
+
+    def __getattr__(self, name:str) -> Any:
+        # only called for slots that are not set: nested objects that were not parsed yet, or fields missing in the response
+        if name.startswith('_') or name == 'extra':
+            raise AttributeError(name)
+        raw = self._raw
+        if raw is not None and name in raw:
+            value = self._nested[name](raw.pop(name))
+            object.__setattr__(self, name, value)
+            return value
+        if name in _model_fields(type(self)):
+            return None
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    _to_snake_case = staticmethod(_to_snake_case)
+
+    def __getstate__(self) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        # pickle and copy only the fields that are set, going through __getattr__ would set all others to None
+        fields = {}
+        for name in _model_fields(type(self)) + ('_raw', 'extra'):
+            try:
+                fields[name] = getattr(type(self), name).__get__(self)
+            except AttributeError:
+                pass
+        raw = fields.pop('_raw', None)
+        extra = fields.pop('extra', None)
+        return fields, dict(raw) if raw is not None else None, extra
+
+    def __setstate__(self, state:Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Dict[str, Any]]]) -> None:
+        fields, raw, extra = state
+        for name, value in fields.items():
+            getattr(type(self), name).__set__(self, value)
+        self._raw = raw
+        self.extra = extra
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: the model as dictionary with the camelCase keys of the API
+        """
+        data = {}
+        raw = self._raw or {}
+        for name in _model_fields(type(self)):
+            try:
+                # read the slot directly, fields that were never set are left out
+                value = getattr(type(self), name).__get__(self)
+            except AttributeError:
+                if name not in raw:
+                    continue
+                value = getattr(self, name)
+            if isinstance(value, Model):
+                value = value.to_dict()
+            elif isinstance(value, list):
+                value = [v.to_dict() if isinstance(v, Model) else v for v in value]
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            data[_to_camel_case(name)] = value
+        for name, value in (self.extra or {}).items():
+            data[_to_camel_case(name)] = value
+        return data
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in _model_fields(type(self)))
+        return f'{type(self).__name__}({fields})'
+
+
+def _list_of(model:type) -> Callable[[List[Dict[str, Any]]], List[Any]]:
+    def parse(values:List[Dict[str, Any]]) -> List[Any]:
+        return [model.from_dict(v) if isinstance(v, dict) else v for v in values]
+    return parse
+
+
+def _one_of(model:type) -> Callable[[Dict[str, Any]], Any]:
+    def parse(value:Dict[str, Any]) -> Any:
+        return model.from_dict(value) if isinstance(value, dict) else value
+    return parse
+
+
+class AdvertiserCost(Model):
+    __slots__ = ('amount', 'currency')
     amount: Optional[float]
     currency: Optional[str]
 
     def __init__(self, amount: Optional[float], currency: Optional[str]) -> None:
         self.amount = amount
         self.currency = currency
+        self.extra = self._raw = None
 
 
-class ClickRefs:
+class ClickRefs(Model):
+    __slots__ = ('click_ref', 'click_ref2', 'click_ref3', 'click_ref4', 'click_ref5', 'click_ref6')
     click_ref: UUID
 
     def __init__(self, click_ref: UUID) -> None:
         self.click_ref = click_ref
+        self.extra = self._raw = None
 
 
-class CustomParameter:
+class CustomParameter(Model):
+    __slots__ = ('key', 'value')
     key: int
     value: str
 
     def __init__(self, key: int, value: str) -> None:
         self.key = key
         self.value = value
+        self.extra = self._raw = None
 
 
-class TrackedPart:
+class TrackedPart(Model):
+    __slots__ = ('amount', 'code', 'currency')
     amount: float
     code: str
     currency: str
@@ -37,10 +226,17 @@ class TrackedPart:
         self.amount = amount
         self.code = code
         self.currency = currency
+        self.extra = self._raw = None
 
 
-class TransactionPart:
-    advertiser_cost: None
+class TransactionPart(Model):
+    __slots__ = ('advertiser_cost', 'amount', 'commission_amount', 'commission_group_code',
+                 'commission_group_id', 'commission_group_name', 'tracked_parts')
+    _nested = {
+        'advertiser_cost': _one_of(AdvertiserCost),
+        'tracked_parts': _list_of(TrackedPart),
+    }
+    advertiser_cost: Optional[AdvertiserCost]
     amount: float
     commission_amount: float
     commission_group_code: str
@@ -48,7 +244,7 @@ class TransactionPart:
     commission_group_name: str
     tracked_parts: List[TrackedPart]
 
-    def __init__(self, advertiser_cost: None, amount: float, commission_amount: float, commission_group_code: str, commission_group_id: int, commission_group_name: str, tracked_parts: List[TrackedPart]) -> None:
+    def __init__(self, advertiser_cost: Optional[AdvertiserCost], amount: float, commission_amount: float, commission_group_code: str, commission_group_id: int, commission_group_name: str, tracked_parts: List[TrackedPart]) -> None:
         self.advertiser_cost = advertiser_cost
         self.amount = amount
         self.commission_amount = commission_amount
@@ -56,9 +252,33 @@ class TransactionPart:
         self.commission_group_id = commission_group_id
         self.commission_group_name = commission_group_name
         self.tracked_parts = tracked_parts
+        self.extra = self._raw = None
 
 
-class Transaction:
+class Transaction(Model):
+    __slots__ = ('advertiser_cost', 'advertiser_country', 'advertiser_id', 'amend_reason', 'amended',
+                 'basket_products', 'campaign', 'click_date', 'click_device', 'click_refs', 'commission_amount',
+                 'commission_sharing_publisher_id', 'commission_sharing_selected_rate_publisher_id',
+                 'commission_status', 'custom_parameters', 'customer_acquisition', 'customer_country',
+                 'decline_reason', 'id', 'ip_hash', 'lapse_time', 'network_fee', 'old_commission_amount',
+                 'old_sale_amount', 'order_ref', 'original_sale_amount', 'paid_to_publisher', 'payment_id',
+                 'publisher_id', 'publisher_url', 'sale_amount', 'site_name', 'tracked_currency_amount',
+                 'transaction_date', 'transaction_device', 'transaction_parts', 'transaction_query_id', 'type',
+                 'url', 'validation_date', 'voucher_code', 'voucher_code_used')
+    _nested = {
+        'advertiser_cost': _one_of(AdvertiserCost),
+        'click_refs': _one_of(ClickRefs),
+        'commission_amount': _one_of(AdvertiserCost),
+        'custom_parameters': _list_of(CustomParameter),
+        'network_fee': _one_of(AdvertiserCost),
+        'old_commission_amount': _one_of(AdvertiserCost),
+        'old_sale_amount': _one_of(AdvertiserCost),
+        'original_sale_amount': _one_of(AdvertiserCost),
+        'sale_amount': _one_of(AdvertiserCost),
+        'tracked_currency_amount': _one_of(AdvertiserCost),
+        'transaction_parts': _list_of(TransactionPart),
+    }
+    _datetimes = frozenset(('click_date', 'transaction_date', 'validation_date'))
     advertiser_cost: AdvertiserCost
     advertiser_country: str
     advertiser_id: int
@@ -98,61 +318,10 @@ class Transaction:
     transaction_query_id: int
     type: str
     url: str
-    validation_date: None
+    validation_date: Optional[datetime]
     voucher_code: str
     voucher_code_used: bool
 
     def __init__(self, **kwargs):
-        # Convert keys from camel case to snake case
-        converted_kwargs = {self._to_snake_case(key): value for key, value in kwargs.items()}
-        # Initialize attributes
-        for key, value in converted_kwargs.items():
-            setattr(self, key, value)
-
-    @staticmethod
-    def _to_snake_case(string):
-        return ''.join(['_' + c.lower() if c.isupper() else c for c in string]).lstrip('_')
-
-    # def __init__(self, advertiser_cost: AdvertiserCost, advertiser_country: str, advertiser_id: int, amend_reason: None, amended: bool, basket_products: None, campaign: None, click_date: datetime, click_device: str, click_refs: ClickRefs, commission_amount: AdvertiserCost, commission_sharing_publisher_id: None, commission_sharing_selected_rate_publisher_id: None, commission_status: str, custom_parameters: List[CustomParameter], customer_acquisition: None, customer_country: str, decline_reason: None, id: int, ip_hash: str, lapse_time: int, network_fee: AdvertiserCost, old_commission_amount: None, old_sale_amount: None, order_ref: str, original_sale_amount: None, paid_to_publisher: bool, payment_id: int, publisher_id: int, publisher_url: None, sale_amount: AdvertiserCost, site_name: str, tracked_currency_amount: None, transaction_date: datetime, transaction_device: str, transaction_parts: List[TransactionPart], transaction_query_id: int, type: str, url: str, validation_date: None, voucher_code: str, voucher_code_used: bool) -> None:
-    #     self.advertiser_cost = advertiser_cost
-    #     self.advertiser_country = advertiser_country
-    #     self.advertiser_id = advertiser_id
-    #     self.amend_reason = amend_reason
-    #     self.amended = amended
-    #     self.basket_products = basket_products
-    #     self.campaign = campaign
-    #     self.click_date = click_date
-    #     self.click_device = click_device
-    #     self.click_refs = click_refs
-    #     self.commission_amount = commission_amount
-    #     self.commission_sharing_publisher_id = commission_sharing_publisher_id
-    #     self.commission_sharing_selected_rate_publisher_id = commission_sharing_selected_rate_publisher_id
-    #     self.commission_status = commission_status
-    #     self.custom_parameters = custom_parameters
-    #     self.customer_acquisition = customer_acquisition
-    #     self.customer_country = customer_country
-    #     self.decline_reason = decline_reason
-    #     self.id = id
-    #     self.ip_hash = ip_hash
-    #     self.lapse_time = lapse_time
-    #     self.network_fee = network_fee
-    #     self.old_commission_amount = old_commission_amount
-    #     self.old_sale_amount = old_sale_amount
-    #     self.order_ref = order_ref
-    #     self.original_sale_amount = original_sale_amount
-    #     self.paid_to_publisher = paid_to_publisher
-    #     self.payment_id = payment_id
-    #     self.publisher_id = publisher_id
-    #     self.publisher_url = publisher_url
-    #     self.sale_amount = sale_amount
-    #     self.site_name = site_name
-    #     self.tracked_currency_amount = tracked_currency_amount
-    #     self.transaction_date = transaction_date
-    #     self.transaction_device = transaction_device
-    #     self.transaction_parts = transaction_parts
-    #     self.transaction_query_id = transaction_query_id
-    #     self.type = type
-    #     self.url = url
-    #     self.validation_date = validation_date
-    #     self.voucher_code = voucher_code
-    #     self.voucher_code_used = voucher_code_used
\ No newline at end of file
+        # keys may be camel case, as returned by the API, or snake case
+        self._load(kwargs, lazy=False)
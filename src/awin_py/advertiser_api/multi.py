@@ -0,0 +1,112 @@
+"""
+running API calls for several advertisers
+"""
+import logging
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Union
+
+from .client import Awin
+from .errors import AwinError
+
+
+class AdvertiserResult:
+    """
+    The outcome of one call for one advertiser.
+
+    :ivar advertiser_id: the advertiser id
+    :ivar result: the return value of the call, None if it failed
+    :ivar error: the exception raised by the call, None if it succeeded
+    :ivar elapsed: seconds the call took
+    """
+    __slots__ = ('advertiser_id', 'result', 'error', 'elapsed')
+
+    def __init__(self, advertiser_id:str, result:Any = None, error:BaseException = None, elapsed:float = 0.0) -> None:
+        self.advertiser_id = advertiser_id
+        self.result = result
+        self.error = error
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self) -> str:
+        outcome = f"error={self.error!r}" if self.error is not None else "ok"
+        return f"AdvertiserResult(advertiser_id={self.advertiser_id!r}, {outcome}, elapsed={self.elapsed:.2f})"
+
+
+class MultiAdvertiserRunner:
+    """
+    Runs a method of ``Awin`` for several advertisers in parallel.
+
+    Every advertiser gets a client from ``Awin.for_advertiser``, so all calls share one connection pool
+    and one rate limiter: the accounts run as fast as the shared budget allows, and the whole run takes
+    about as long as the slowest account. A failing account does not stop the others, its error is
+    returned in its ``AdvertiserResult``.
+
+    Threads are used rather than processes, because processes could not share the session and the rate limiter.
+    Give the client a ``pool_maxsize`` of at least ``max_workers`` so that every worker keeps its connection alive.
+
+    :param client: the client whose session, rate limiter, retry policy and cache are shared
+    :param advertisers: advertiser ids, or the output of ``Awin.get_accounts``
+        (only accounts of type 'advertiser' are used)
+    :param max_workers: number of advertisers processed at the same time
+    """
+
+    def __init__(self, client:Awin, advertisers:Union[Iterable[Any], Dict[str, Any]], max_workers:int = 8) -> None:
+        self.client = client
+        self.advertiser_ids = self._advertiser_ids(advertisers)
+        self.max_workers = max_workers
+
+    @staticmethod
+    def _advertiser_ids(advertisers:Union[Iterable[Any], Dict[str, Any]]) -> List[str]:
+        if isinstance(advertisers, dict):
+            # the accounts endpoint returns {"userId": ..., "accounts": [...]}
+            advertisers = advertisers.get('accounts', [])
+        ids = []
+        for advertiser in advertisers:
+            if isinstance(advertiser, dict):
+                if advertiser.get('accountType', 'advertiser') != 'advertiser':
+                    continue
+                advertiser = advertiser['accountId']
+            ids.append(str(advertiser))
+        # keep the order, but run every advertiser only once
+        return list(dict.fromkeys(ids))
+
+    def run(self, method:str, *args, **kwargs) -> Dict[str, AdvertiserResult]:
+        """
+        Call a method of ``Awin`` for every advertiser.
+
+        Methods that return a generator, like ``iter_transactions`` or ``diff_transactions``, are read to the end
+        inside the worker, so that the requests run in parallel and their errors are caught per advertiser.
+        The result is the list of the generated items.
+
+        :param method: name of the method, e.g. 'get_transactions'
+        :param args: positional arguments of the method
+        :param kwargs: keyword arguments of the method
+        :return: the results by advertiser id, in the order of the advertisers
+        """
+        if not callable(getattr(Awin, method, None)) or method.startswith('_'):
+            raise AwinError(f"'{method}' is not a method of the Awin client")
+
+        def call(advertiser_id:str) -> AdvertiserResult:
+            started = time.monotonic()
+            try:
+                result = getattr(self.client.for_advertiser(advertiser_id), method)(*args, **kwargs)
+                if isinstance(result, types.GeneratorType):
+                    # a generator sends its requests only when it is read
+                    result = list(result)
+                return AdvertiserResult(advertiser_id, result=result, elapsed=time.monotonic() - started)
+            except Exception as e:
+                logging.warning(f'{method} failed for advertiser {advertiser_id}: {e!r}')
+                return AdvertiserResult(advertiser_id, error=e, elapsed=time.monotonic() - started)
+
+        if not self.advertiser_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.advertiser_ids))) as executor:
+            results = list(executor.map(call, self.advertiser_ids))
+        failed = sum(1 for result in results if not result.ok)
+        logging.info(f'{method} finished for {len(results)} advertisers, {failed} failed')
+        return {result.advertiser_id: result for result in results}
@@ -0,0 +1,265 @@
+"""
+rate limiters that keep the clients within the request budget of the Awin API
+
+The Awin API allows 20 requests per minute per user. One rate limiter can be
+shared by any number of ``Awin`` and ``AsyncAwin`` clients, and
+``SQLiteSlidingWindowRateLimiter`` (or ``SQLiteTokenBucketRateLimiter``) shares the budget between processes on one host.
+The sliding window limiters send a full minute of requests at once after an idle period, the token buckets
+spread the requests evenly.
+"""
+import asyncio
+import sqlite3
+import threading
+import time
+from collections import deque
+
+
+class RateLimiter:
+    """
+    Base class of all rate limiters.
+    Subclasses implement ``reserve``, which books a request and returns how long the caller has to wait.
+    """
+
+    def reserve(self, tokens:int = 1) -> float:
+        """
+        Reserve tokens for a request.
+
+        :param tokens: number of requests to reserve
+        :return: seconds the caller has to wait before sending the request
+        """
+        raise NotImplementedError
+
+    def release(self, tokens:int = 1) -> None:
+        """
+        Give back tokens that were reserved for a request that is not sent, e.g. because it was cancelled
+        while waiting. Limiters that can not give tokens back ignore it.
+
+        :param tokens: number of requests that were reserved
+        """
+
+    def acquire(self, tokens:int = 1, priority:str = None, deadline:float = None) -> float:
+        """
+        Block until a request may be sent.
+
+        :param tokens: number of requests to reserve
+        :param priority: priority class of the request, see ``scheduler.PriorityScheduler``. Ignored by limiters without classes
+        :param deadline: seconds after which the request should be sent. Ignored by limiters without classes
+        :return: seconds spent waiting
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens:int = 1, priority:str = None, deadline:float = None) -> float:
+        """
+        Wait without blocking the event loop until a request may be sent.
+
+        :param tokens: number of requests to reserve
+        :param priority: priority class of the request. Ignored by limiters without classes
+        :param deadline: seconds after which the request should be sent. Ignored by limiters without classes
+        :return: seconds spent waiting
+        """
+        wait = self.reserve(tokens)
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.release(tokens)
+                raise
+        return wait
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """
+    An in-process token bucket. Tokens refill continuously at ``requests_per_minute``,
+    up to ``burst`` tokens. Callers that find the bucket empty are queued in order:
+    each one is told exactly how long to wait until its token has refilled.
+
+    :param requests_per_minute: sustained request rate
+    :param burst: maximum number of requests that may be sent at once. Within one minute a full bucket plus
+        one minute of refill can be sent, so anything above 1 exceeds ``requests_per_minute``. Defaults to 1
+    """
+
+    def __init__(self, requests_per_minute:float = 20, burst:int = None) -> None:
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or 1
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens:int = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def release(self, tokens:int = 1) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + tokens)
+
+
+class SQLiteTokenBucketRateLimiter(RateLimiter):
+    """
+    A token bucket stored in a SQLite database, so that all processes on one host
+    that use the same ``path`` and ``name`` share one request budget.
+    The bucket is updated inside an exclusive SQLite transaction.
+
+    :param path: path of the SQLite database file. Created if it does not exist
+    :param requests_per_minute: sustained request rate
+    :param burst: maximum number of requests that may be sent at once. Within one minute a full bucket plus
+        one minute of refill can be sent, so anything above 1 exceeds ``requests_per_minute``. Defaults to 1
+    :param name: name of the bucket. Buckets with different names are independent
+    """
+
+    def __init__(self, path:str, requests_per_minute:float = 20, burst:int = None, name:str = 'awin') -> None:
+        self.path = path
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or 1
+        self.name = name
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def reserve(self, tokens:int = 1) -> float:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # wall clock time, because monotonic clocks are not comparable between processes
+            now = time.time()
+            row = connection.execute("SELECT tokens, updated FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+            available = self.capacity if row is None else min(self.capacity, row[0] + (now - row[1]) * self.rate)
+            available -= tokens
+            connection.execute("INSERT OR REPLACE INTO token_buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                               (self.name, available, now))
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        if available >= 0:
+            return 0.0
+        return -available / self.rate
+
+    def release(self, tokens:int = 1) -> None:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("UPDATE token_buckets SET tokens = MIN(?, tokens + ?) WHERE name = ?",
+                               (self.capacity, tokens, self.name))
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+
+
+class SlidingWindowRateLimiter(RateLimiter):
+    """
+    Allows at most ``requests_per_minute`` requests in any 60 seconds, which is how the Awin API counts.
+    After an idle minute a full minute of requests may be sent at once, and then each further request waits
+    until the request sent a minute before it has left the window. Callers are queued in order.
+
+    :param requests_per_minute: maximum number of requests in any minute
+    :param window: length of the window in seconds. The limit is ``requests_per_minute * window / 60`` requests
+        per window, so a shorter window spreads the requests more evenly
+    """
+
+    def __init__(self, requests_per_minute:float = 20, window:float = 60) -> None:
+        self.window = window
+        self.limit = max(1, int(requests_per_minute * window / 60))
+        # send times of the requests in the window, including booked ones in the future, in ascending order
+        self._sent = deque()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens:int = 1) -> float:
+        with self._lock:
+            now = time.monotonic()
+            return _book(self._sent, now, tokens, self.limit, self.window) - now
+
+    def release(self, tokens:int = 1) -> None:
+        with self._lock:
+            now = time.monotonic()
+            for _ in range(tokens):
+                # give back the latest booking that was not sent yet
+                if self._sent and self._sent[-1] > now:
+                    self._sent.pop()
+
+
+def _book(sent:'deque', now:float, tokens:int, limit:int, window:float) -> float:
+    """
+    Book send times in a sliding window.
+
+    :param sent: send times in the window, in ascending order. Updated in place
+    :return: the send time of the last booked token
+    """
+    while sent and sent[0] <= now - window:
+        sent.popleft()
+    at = now
+    for _ in range(tokens):
+        at = now
+        if len(sent) >= limit:
+            # the request ``limit`` places before this one has to leave the window first
+            at = max(at, sent[-limit] + window)
+        if sent:
+            # keep the order of the callers
+            at = max(at, sent[-1])
+        sent.append(at)
+    return at
+
+
+class SQLiteSlidingWindowRateLimiter(RateLimiter):
+    """
+    A ``SlidingWindowRateLimiter`` stored in a SQLite database, so that all processes on one host
+    that use the same ``path`` and ``name`` share one request budget.
+    The send times are updated inside an exclusive SQLite transaction.
+
+    :param path: path of the SQLite database file. Created if it does not exist
+    :param requests_per_minute: maximum number of requests in any minute
+    :param window: length of the window in seconds, see ``SlidingWindowRateLimiter``
+    :param name: name of the budget. Budgets with different names are independent
+    """
+
+    def __init__(self, path:str, requests_per_minute:float = 20, window:float = 60, name:str = 'awin') -> None:
+        self.path = path
+        self.window = window
+        self.limit = max(1, int(requests_per_minute * window / 60))
+        self.name = name
+        with self._connect() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS sent_requests (name TEXT, at REAL)")
+            connection.execute("CREATE INDEX IF NOT EXISTS sent_requests_name_at ON sent_requests (name, at)")
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    def reserve(self, tokens:int = 1) -> float:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # wall clock time, because monotonic clocks are not comparable between processes
+            now = time.time()
+            connection.execute("DELETE FROM sent_requests WHERE name = ? AND at <= ?", (self.name, now - self.window))
+            sent = deque(at for (at,) in connection.execute(
+                "SELECT at FROM sent_requests WHERE name = ? ORDER BY at", (self.name,)))
+            booked = len(sent)
+            at = _book(sent, now, tokens, self.limit, self.window)
+            connection.executemany("INSERT INTO sent_requests (name, at) VALUES (?, ?)",
+                                   [(self.name, sent_at) for sent_at in list(sent)[booked:]])
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
+        return at - now
+
+    def release(self, tokens:int = 1) -> None:
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("""
+                DELETE FROM sent_requests WHERE rowid IN (
+                    SELECT rowid FROM sent_requests WHERE name = ? AND at > ? ORDER BY at DESC LIMIT ?)""",
+                (self.name, time.time(), tokens))
+            connection.execute("COMMIT")
+        finally:
+            connection.close()
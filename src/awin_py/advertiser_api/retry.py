@@ -0,0 +1,140 @@
+"""
+retry policy of the Awin clients
+"""
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple, Type
+
+import requests
+
+
+class RetryPolicy:
+    """
+    Decides which failed requests are retried and how long to wait before the next attempt.
+
+    Waits grow exponentially (``backoff_factor * 2 ** attempt``) up to ``max_backoff``, with full jitter,
+    so that many clients that failed at the same time do not retry at the same time.
+    A ``Retry-After`` header sent by the API takes precedence over the computed backoff.
+    A 429 response without it waits at least ``throttle_wait``: the quota of the API is per minute,
+    so a retry after a few seconds is throttled again.
+
+    :param max_retries: maximum number of retries per request
+    :param backoff_factor: seconds to wait before the first retry (before jitter)
+    :param max_backoff: maximum seconds to wait between two attempts (before jitter)
+    :param jitter: randomize the backoff between 0 and the computed value
+    :param retry_statuses: HTTP status codes that are retried
+    :param retry_exceptions: exceptions raised by the HTTP library that are retried, e.g. connection errors and timeouts
+    :param respect_retry_after: wait as long as the ``Retry-After`` header of the response asks for
+    :param deadline: maximum seconds spent on one request including all retries (optional)
+    :param throttle_wait: minimum seconds to wait after a 429 response without ``Retry-After``. The backoff is added on top
+    """
+
+    def __init__(self,
+                 max_retries:int = 3,
+                 backoff_factor:float = 1.0,
+                 max_backoff:float = 60,
+                 jitter:bool = True,
+                 retry_statuses:Tuple[int, ...] = (429, 500, 502, 503, 504),
+                 retry_exceptions:Tuple[Type[BaseException], ...] = (requests.ConnectionError, requests.Timeout),
+                 respect_retry_after:bool = True,
+                 deadline:float = None,
+                 throttle_wait:float = 60) -> None:
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.respect_retry_after = respect_retry_after
+        self.deadline = deadline
+        self.throttle_wait = throttle_wait
+
+    def is_retryable_status(self, status_code:int) -> bool:
+        return status_code in self.retry_statuses
+
+    def backoff(self, attempt:int) -> float:
+        """
+        :param attempt: number of retries already made for this request
+        :return: seconds to wait before the next attempt, ignoring any server hint
+        """
+        backoff = min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+        if self.jitter:
+            backoff = random.uniform(0, backoff)
+        return backoff
+
+    def next_wait(self, attempt:int, started:float, retry_after:float = None, status_code:int = None) -> Optional[float]:
+        """
+        :param attempt: number of retries already made for this request
+        :param started: ``time.monotonic()`` of the first attempt
+        :param retry_after: seconds the API asked to wait (optional)
+        :param status_code: HTTP status code of the failed attempt, None if there was no response
+        :return: seconds to wait before the next attempt, or None if the request should not be retried
+        """
+        if attempt >= self.max_retries:
+            return None
+        if retry_after is not None and self.respect_retry_after:
+            wait = retry_after
+        elif status_code == 429:
+            wait = self.throttle_wait + self.backoff(attempt)
+        else:
+            wait = self.backoff(attempt)
+        if self.deadline is not None and time.monotonic() - started + wait > self.deadline:
+            return None
+        return wait
+
+    @staticmethod
+    def parse_retry_after(value:Optional[str]) -> Optional[float]:
+        """
+        Parse a ``Retry-After`` header, which is either a number of seconds or a HTTP date.
+
+        :param value: the header value (optional)
+        :return: seconds to wait, or None if the header is missing or invalid
+        """
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RetryMetrics:
+    """
+    Counts the retries of a client. Safe to update from several threads.
+
+    :ivar retries: number of retries
+    :ivar retry_wait: total seconds spent waiting between attempts
+    :ivar give_ups: number of requests that failed after exhausting their retries or deadline
+    :ivar retries_by_reason: number of retries per HTTP status code or exception name
+    """
+
+    def __init__(self) -> None:
+        self.retries = 0
+        self.retry_wait = 0.0
+        self.give_ups = 0
+        self.retries_by_reason: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record_retry(self, reason:str, wait:float) -> None:
+        with self._lock:
+            self.retries += 1
+            self.retry_wait += wait
+            self.retries_by_reason[reason] = self.retries_by_reason.get(reason, 0) + 1
+
+    def record_give_up(self) -> None:
+        with self._lock:
+            self.give_ups += 1
+
+    def __repr__(self) -> str:
+        return (f"RetryMetrics(retries={self.retries}, retry_wait={self.retry_wait:.1f}, "
+                f"give_ups={self.give_ups}, retries_by_reason={self.retries_by_reason})")
@@ -0,0 +1,302 @@
+"""
+local rollups of aggregated reports
+
+The reports of the Awin API are aggregated over the requested date range, so every new range or
+granularity is a new request. ``ReportRollup`` requests each day once, stores the daily rows in SQLite
+and answers any date range by day, month, year or in total with SQL group-by sums over the stored days.
+The campaign report can be split by day (``interval='day'``), so its missing days are requested
+31 days at a time; the publisher and creative reports are requested one day at a time.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from .client import Awin
+from .errors import AwinError
+
+REPORTS = ('publisher', 'creative', 'campaign')
+"""reports that can be rolled up"""
+
+METRICS: Tuple[str, ...] = (
+    'impressions', 'clicks',
+    'pendingNo', 'pendingValue', 'pendingComm',
+    'confirmedNo', 'confirmedValue', 'confirmedComm',
+    'bonusNo', 'bonusValue', 'bonusComm',
+    'declinedNo', 'declinedValue', 'declinedComm',
+    'totalNo', 'totalValue', 'totalComm',
+)
+"""numeric fields of the report rows that are summed up. All other scalar fields identify a row"""
+
+DAY_FIELDS = ('date', 'day', 'interval')
+"""fields in which the rows of a report with ``interval='day'`` name their day"""
+
+_PERIODS = {
+    'day': 'day',
+    'month': 'substr(day, 1, 7)',
+    'year': 'substr(day, 1, 4)',
+    'total': 'NULL',
+}
+
+
+def _day(value:Any) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _runs(days:List[date], max_days:int) -> List[List[date]]:
+    """
+    :param days: days in ascending order
+    :param max_days: maximum length of a run
+    :return: the runs of consecutive days
+    """
+    runs = []
+    for day in days:
+        if runs and day - runs[-1][-1] == timedelta(days=1) and len(runs[-1]) < max_days:
+            runs[-1].append(day)
+        else:
+            runs.append([day])
+    return runs
+
+
+def _split_by_day(rows:List[Dict[str, Any]]) -> Optional[Dict[date, List[Dict[str, Any]]]]:
+    """
+    Split the rows of a report with ``interval='day'`` by their day. The day field is removed from the rows,
+    so that they look like the rows of a report of one day.
+
+    :return: the rows by day, or None if a row does not name its day
+    """
+    by_day: Dict[date, List[Dict[str, Any]]] = {}
+    for row in rows:
+        for field in DAY_FIELDS:
+            value = row.get(field)
+            if isinstance(value, str):
+                try:
+                    day = date.fromisoformat(value[:10])
+                except ValueError:
+                    continue
+                by_day.setdefault(day, []).append({k: v for k, v in row.items() if k != field})
+                break
+        else:
+            return None
+    return by_day
+
+
+class ReportRollup:
+    """
+    Daily report rows of one or more advertisers in a SQLite database.
+
+    Reports of days that ended less than ``settle`` ago are fetched again once they are older than ``ttl``,
+    because pending transactions are still approved or declined. Older days are fetched once.
+
+    :param client: the client that fetches missing days. Other advertisers are fetched through ``Awin.for_advertiser``
+    :param path: path of the SQLite database file. Created if it does not exist
+    :param settle: time after which the report of a day does not change any more
+    :param ttl: how long the report of a day that has not settled yet is used
+    :param max_workers: number of days fetched in parallel, all of them draw from the rate limiter of the client.
+        Defaults to the ``max_workers`` of the client
+    :ivar fetched_days: number of days requested from the API
+    """
+
+    def __init__(self,
+                 client:Awin,
+                 path:str,
+                 settle:timedelta = timedelta(days=60),
+                 ttl:timedelta = timedelta(hours=6),
+                 max_workers:int = None) -> None:
+        self.client = client
+        self.path = path
+        self.settle = settle
+        self.ttl = ttl
+        self.max_workers = max_workers or client.max_workers
+        self.fetched_days = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        metric_columns = ', '.join(f'"{metric}" NUMERIC' for metric in METRICS)
+        self._connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS report_rows (
+                advertiser_id TEXT,
+                report TEXT,
+                variant TEXT,
+                day TEXT,
+                identity TEXT,
+                {metric_columns}
+            )""")
+        self._connection.execute("""
+            CREATE INDEX IF NOT EXISTS report_rows_day ON report_rows (advertiser_id, report, variant, day)""")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS covered_days (
+                advertiser_id TEXT,
+                report TEXT,
+                variant TEXT,
+                day TEXT,
+                fetched REAL,
+                PRIMARY KEY (advertiser_id, report, variant, day)
+            )""")
+
+    @staticmethod
+    def _variant(params:Dict[str, Any]) -> str:
+        # reports with different parameters (region, timezone, date type) are stored separately
+        return json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True, default=str)
+
+    def _is_current(self, day:date, fetched:float) -> bool:
+        fetched_at = datetime.fromtimestamp(fetched)
+        day_end = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        return fetched_at - day_end >= self.settle or datetime.now() - fetched_at < self.ttl
+
+    def missing_days(self, advertiser_id:str, report:str, start_date:date, end_date:date, **params) -> List[date]:
+        """
+        :return: the days of the range that are not stored or are out of date
+        """
+        variant = self._variant(params)
+        start_day, end_day = _day(start_date), _day(end_date)
+        with self._lock:
+            covered = dict(self._connection.execute(
+                "SELECT day, fetched FROM covered_days WHERE advertiser_id = ? AND report = ? AND variant = ? AND day BETWEEN ? AND ?",
+                (str(advertiser_id), report, variant, start_day.isoformat(), end_day.isoformat())).fetchall())
+        missing = []
+        day = start_day
+        while day <= end_day:
+            fetched = covered.get(day.isoformat())
+            if fetched is None or not self._is_current(day, fetched):
+                missing.append(day)
+            day += timedelta(days=1)
+        return missing
+
+    def store_day(self, advertiser_id:str, report:str, day:date, rows:List[Dict[str, Any]], **params) -> None:
+        """
+        Replace the rows of one day.
+
+        :param rows: the report of the day as returned by the API
+        """
+        variant = self._variant(params)
+        key = (str(advertiser_id), report, variant, day.isoformat())
+        values = []
+        for row in rows:
+            identity = {k: v for k, v in row.items() if k not in METRICS and not isinstance(v, (list, dict))}
+            values.append(key + (json.dumps(identity, sort_keys=True),) + tuple(row.get(metric) for metric in METRICS))
+        placeholders = ', '.join('?' * (5 + len(METRICS)))
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "DELETE FROM report_rows WHERE advertiser_id = ? AND report = ? AND variant = ? AND day = ?", key)
+                self._connection.executemany(f"INSERT INTO report_rows VALUES ({placeholders})", values)
+                self._connection.execute("INSERT OR REPLACE INTO covered_days VALUES (?, ?, ?, ?, ?)", key + (time.time(),))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def ensure(self, report:str, start_date:date, end_date:date, advertiser_id:str = None, **params) -> int:
+        """
+        Fetch the days of the range that are missing or out of date. Runs of up to 31 missing days of the campaign
+        report are fetched with one request split by day, the other reports with one request per day.
+
+        :param report: 'publisher', 'creative' or 'campaign'
+        :param start_date: first day of the range
+        :param end_date: last day of the range
+        :param advertiser_id: the advertiser. Defaults to the advertiser of the client
+        :param params: parameters of the report, e.g. ``region`` or ``timezone``
+        :return: number of days fetched
+        """
+        if report not in REPORTS:
+            raise AwinError(f"unknown report '{report}', use one of {REPORTS}")
+        advertiser_id = str(advertiser_id or self.client.client_id)
+        client = self.client if advertiser_id == str(self.client.client_id) else self.client.for_advertiser(advertiser_id)
+        get_report = getattr(client, f'get_reports_agg_by_{report}')
+        missing = self.missing_days(advertiser_id, report, start_date, end_date, **params)
+        if not missing:
+            return 0
+        logging.info(f'fetching {len(missing)} days of the {report} report of advertiser {advertiser_id}')
+
+        def fetch_day(day:date) -> None:
+            day_start = datetime.combine(day, datetime.min.time())
+            rows = get_report(start_date=day_start, end_date=day_start, **params)
+            self.store_day(advertiser_id, report, day, rows, **params)
+
+        def fetch_run(days:List[date]) -> None:
+            if len(days) == 1:
+                return fetch_day(days[0])
+            rows = get_report(start_date=datetime.combine(days[0], datetime.min.time()),
+                              end_date=datetime.combine(days[-1], datetime.min.time()),
+                              interval='day', **params)
+            by_day = _split_by_day(rows)
+            if by_day is None:
+                logging.warning(f'the {report} report does not name the day of its rows, fetching the days one by one')
+                for day in days:
+                    fetch_day(day)
+                return
+            for day in days:
+                # days without rows are stored as empty, so that they are not fetched again
+                self.store_day(advertiser_id, report, day, by_day.get(day, []), **params)
+
+        # the API accepts at most 31 days per request
+        runs = _runs(missing, 31) if report == 'campaign' else [[day] for day in missing]
+        if self.max_workers > 1 and len(runs) > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # list() raises the first error of a run
+                list(executor.map(fetch_run, runs))
+        else:
+            for days in runs:
+                fetch_run(days)
+        self.fetched_days += len(missing)
+        return len(missing)
+
+    def rollup(self,
+               report:str,
+               start_date:date,
+               end_date:date,
+               interval:str = 'month',
+               advertiser_id:str = None,
+               fetch:bool = True,
+               **params) -> List[Dict[str, Any]]:
+        """
+        Sum up the daily reports of a date range per interval.
+        Days that are not stored yet are fetched first, unless ``fetch`` is False.
+
+        :param report: 'publisher', 'creative' or 'campaign'
+        :param start_date: first day of the range
+        :param end_date: last day of the range
+        :param interval: 'day', 'month', 'year' or 'total'
+        :param advertiser_id: the advertiser. Defaults to the advertiser of the client
+        :param fetch: fetch missing days from the API
+        :param params: parameters of the report, e.g. ``region`` or ``timezone``
+        :return: one row per period and publisher, creative or campaign, with the identifying fields of the report,
+            the ``period`` (e.g. '2024-05' for months) and the summed metrics
+        """
+        if interval not in _PERIODS:
+            raise AwinError(f"unknown interval '{interval}', use one of {tuple(_PERIODS)}")
+        advertiser_id = str(advertiser_id or self.client.client_id)
+        if fetch:
+            self.ensure(report, start_date, end_date, advertiser_id, **params)
+        sums = ', '.join(f'SUM("{metric}")' for metric in METRICS)
+        with self._lock:
+            rows = self._connection.execute(f"""
+                SELECT {_PERIODS[interval]} AS period, identity, {sums}
+                FROM report_rows
+                WHERE advertiser_id = ? AND report = ? AND variant = ? AND day BETWEEN ? AND ?
+                GROUP BY period, identity
+                ORDER BY period, identity""",
+                (advertiser_id, report, self._variant(params),
+                 _day(start_date).isoformat(), _day(end_date).isoformat())).fetchall()
+        results = []
+        for period, identity, *values in rows:
+            result = json.loads(identity)
+            result['period'] = period
+            result.update(zip(METRICS, values))
+            results.append(result)
+        return results
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'ReportRollup':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
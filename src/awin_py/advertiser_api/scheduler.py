@@ -0,0 +1,269 @@
+"""
+priority scheduling of requests that share one rate limit
+
+Bulk jobs (backfills, exports, workers) easily queue more requests than the budget of 20 requests per minute allows,
+and a first come first served rate limiter makes an interactive lookup wait behind all of them.
+``PriorityScheduler`` is a rate limiter that hands out the tokens by priority class and deadline instead:
+interactive requests are sent first, bulk requests get the remaining budget, and the share of each class
+keeps any class from being starved when another one floods the scheduler.
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from .errors import AwinError
+from .ratelimit import RateLimiter
+
+PRIORITIES = ('interactive', 'normal', 'bulk')
+"""the default priority classes, from highest to lowest priority"""
+
+DEFAULT_SHARES = {'interactive': 0.5, 'normal': 0.3, 'bulk': 0.2}
+"""default share of the budget each class is guaranteed while all classes are waiting"""
+
+DEFAULT_DEADLINES = {'interactive': 1.0, 'normal': 30.0, 'bulk': None}
+"""default seconds after which a waiting request of a class should be sent. None: no deadline"""
+
+
+class _Waiter:
+    """
+    A caller waiting for tokens. Threads wait on the condition of the scheduler,
+    coroutines on ``wake``, a future of their event loop that is set when the choice may have changed.
+    """
+    __slots__ = ('priority', 'rank', 'deadline', 'sequence', 'tokens', 'loop', 'wake')
+
+    def __init__(self, priority:str, rank:int, deadline:float, sequence:int, tokens:int,
+                 loop:asyncio.AbstractEventLoop = None) -> None:
+        self.priority = priority
+        self.rank = rank
+        self.deadline = deadline
+        self.sequence = sequence
+        self.tokens = tokens
+        self.loop = loop
+        self.wake: Optional[asyncio.Future] = None
+
+
+def _wake(future:asyncio.Future) -> None:
+    # runs in the loop of the future
+    if not future.done():
+        future.set_result(None)
+
+
+class PriorityScheduler(RateLimiter):
+    """
+    A token bucket that dispatches waiting requests by priority class and deadline.
+
+    Whenever a token is available it goes to, in this order:
+
+    - the waiting request with the earliest deadline, if that deadline is closer than ``urgency`` seconds
+    - otherwise the class that used the least of its share recently, ties going to the higher priority.
+      Within a class requests are sent by earliest deadline, then in order of arrival
+
+    Threads (``acquire``) and coroutines (``acquire_async``) wait in the same queue. Coroutines wait on a future
+    of their event loop, so they need no executor threads and keep their place in the priority order.
+
+    Idle classes don't hold back their share, so a bulk job alone uses the whole budget. An interactive request
+    that arrives while a backfill is running gets the next token, so it waits at most one refill interval
+    (3 seconds at 20 requests per minute). With a ``burst`` above 1, the last ``reserved`` tokens of the bucket
+    are only handed to the highest priority class, so that it usually finds a token right away, at the cost
+    of a full bucket plus one minute of refill exceeding ``requests_per_minute``.
+
+    :param requests_per_minute: sustained request rate of all classes together
+    :param burst: maximum number of requests that may be sent at once. Defaults to 1, see ``TokenBucketRateLimiter``
+    :param shares: the priority classes, from highest to lowest priority, with the share of the budget
+        each one is guaranteed. Defaults to ``DEFAULT_SHARES``
+    :param deadlines: default seconds after which a request of a class should be sent, None for no deadline.
+        Defaults to ``DEFAULT_DEADLINES``
+    :param default_priority: the class of requests that don't name one of the classes. Defaults to 'normal',
+        or the middle class
+    :param reserved: tokens kept for the highest priority class, fewer than ``burst``
+    :param urgency: seconds before its deadline from which a request is sent ahead of its class
+    :param usage_half_life: seconds after which past usage counts half when the shares are compared
+    :ivar granted: number of tokens handed out per class
+    :ivar waited: total seconds spent waiting per class
+    """
+
+    def __init__(self,
+                 requests_per_minute:float = 20,
+                 burst:int = None,
+                 shares:Dict[str, float] = None,
+                 deadlines:Dict[str, Optional[float]] = None,
+                 default_priority:str = None,
+                 reserved:int = 0,
+                 urgency:float = None,
+                 usage_half_life:float = 60) -> None:
+        self.rate = requests_per_minute / 60
+        self.capacity = burst or 1
+        shares = dict(shares or DEFAULT_SHARES)
+        if not shares or any(share <= 0 for share in shares.values()):
+            raise AwinError('every priority class needs a share above 0')
+        if reserved >= self.capacity:
+            raise AwinError(f'reserved tokens ({reserved}) must be fewer than the burst ({self.capacity})')
+        self.priorities: List[str] = list(shares)
+        self.shares = shares
+        self.deadlines = dict(DEFAULT_DEADLINES if deadlines is None else deadlines)
+        self.default_priority = default_priority or ('normal' if 'normal' in shares else self.priorities[len(shares) // 2])
+        if self.default_priority not in shares:
+            raise AwinError(f"unknown default priority '{self.default_priority}', use one of {tuple(shares)}")
+        self.reserved = reserved
+        # by default a request becomes urgent one refill interval before its deadline
+        self.urgency = 1 / self.rate if urgency is None else urgency
+        self.usage_half_life = usage_half_life
+        self.granted = {priority: 0 for priority in shares}
+        self.waited = {priority: 0.0 for priority in shares}
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._usage = {priority: 0.0 for priority in shares}
+        self._usage_updated = self._updated
+        self._waiters: List[_Waiter] = []
+        self._sequence = 0
+        self._condition = threading.Condition()
+
+    def _refill(self, now:float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        decay = 0.5 ** ((now - self._usage_updated) / self.usage_half_life)
+        for priority in self._usage:
+            self._usage[priority] *= decay
+        self._usage_updated = now
+
+    def _next(self, now:float) -> _Waiter:
+        # called with at least one waiter and the condition held
+        urgent = [waiter for waiter in self._waiters if waiter.deadline - now <= self.urgency]
+        if urgent:
+            return min(urgent, key=lambda waiter: (waiter.deadline, waiter.rank, waiter.sequence))
+        waiting = {waiter.priority for waiter in self._waiters}
+        priority = min(waiting, key=lambda p: (self._usage[p] / self.shares[p], self.priorities.index(p)))
+        return min((waiter for waiter in self._waiters if waiter.priority == priority),
+                   key=lambda waiter: (waiter.deadline, waiter.sequence))
+
+    def _needed(self, waiter:_Waiter) -> float:
+        return waiter.tokens + (0 if waiter.rank == 0 else self.reserved)
+
+    def _notify(self) -> None:
+        # called with the condition held: every waiter looks again whether it is chosen
+        self._condition.notify_all()
+        for waiter in self._waiters:
+            if waiter.wake is not None:
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.wake)
+                except RuntimeError:
+                    # the loop of the waiter is closed
+                    pass
+
+    def _add_waiter(self, tokens:int, priority:str, deadline:Optional[float], started:float,
+                    loop:asyncio.AbstractEventLoop = None) -> _Waiter:
+        # called with the condition held
+        if priority not in self.shares:
+            priority = self.default_priority
+        if deadline is None:
+            deadline = self.deadlines.get(priority)
+        self._sequence += 1
+        waiter = _Waiter(priority, self.priorities.index(priority),
+                         started + deadline if deadline is not None else float('inf'), self._sequence, tokens, loop)
+        self._waiters.append(waiter)
+        return waiter
+
+    def _remove_waiter(self, waiter:_Waiter) -> None:
+        # called with the condition held
+        if waiter in self._waiters:
+            self._waiters.remove(waiter)
+            # another request may be chosen now
+            self._notify()
+
+    def _grant(self, waiter:_Waiter, started:float) -> Tuple[Optional[float], float]:
+        """
+        Hand out the tokens to the waiter if it is chosen and the tokens are there. Called with the condition held.
+
+        :return: the seconds the waiter waited if it got the tokens, else None, and the seconds until it should look again
+        """
+        now = time.monotonic()
+        self._refill(now)
+        chosen = self._next(now)
+        missing = self._needed(chosen) - self._tokens
+        if chosen is waiter and missing <= 0:
+            self._tokens -= waiter.tokens
+            self._usage[waiter.priority] += waiter.tokens
+            self.granted[waiter.priority] += waiter.tokens
+            wait = now - started
+            self.waited[waiter.priority] += wait
+            self._waiters.remove(waiter)
+            # the next request may be sent now
+            self._notify()
+            return wait, 0.0
+        if missing <= 0:
+            # the tokens are there, but for another request
+            self._notify()
+        # the choice changes with time (deadlines, decaying usage), so every waiter looks again at least once a second
+        return None, min(missing / self.rate, 1.0) if missing > 0 else 0.05
+
+    def reserve(self, tokens:int = 1) -> float:
+        """
+        Book tokens right away, ahead of all waiting requests, like ``TokenBucketRateLimiter.reserve``.
+        Only for callers that can not wait in the scheduler; ``acquire`` schedules by priority.
+        """
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            self.granted[self.default_priority] += tokens
+            self._usage[self.default_priority] += tokens
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self, tokens:int = 1, priority:str = None, deadline:float = None) -> float:
+        """
+        Block until the scheduler hands out tokens to this request.
+
+        :param tokens: number of requests to reserve
+        :param priority: the priority class. ``default_priority`` if None or not one of the classes of the scheduler,
+            e.g. the 'interactive' and 'bulk' requests of ``Awin`` with custom ``shares``
+        :param deadline: seconds after which the request should be sent. Defaults to the deadline of the class
+        :return: seconds spent waiting
+        """
+        started = time.monotonic()
+        with self._condition:
+            waiter = self._add_waiter(tokens, priority, deadline, started)
+            try:
+                while True:
+                    wait, timeout = self._grant(waiter, started)
+                    if wait is not None:
+                        return wait
+                    self._condition.wait(timeout)
+            finally:
+                self._remove_waiter(waiter)
+
+    async def acquire_async(self, tokens:int = 1, priority:str = None, deadline:float = None) -> float:
+        """
+        Wait without blocking the event loop until the scheduler hands out tokens to this request, see ``acquire``.
+        The request waits in the same queue as the threads that call ``acquire``.
+        A cancelled request leaves the queue without using tokens.
+        """
+        loop = asyncio.get_running_loop()
+        started = time.monotonic()
+        with self._condition:
+            waiter = self._add_waiter(tokens, priority, deadline, started, loop)
+        try:
+            while True:
+                with self._condition:
+                    wait, timeout = self._grant(waiter, started)
+                    if wait is not None:
+                        return wait
+                    # created before the condition is released, so that no wake up is missed
+                    waiter.wake = loop.create_future()
+                await asyncio.wait({waiter.wake}, timeout=timeout)
+        finally:
+            with self._condition:
+                self._remove_waiter(waiter)
+
+    def queued(self) -> Dict[str, int]:
+        """
+        :return: number of waiting requests per class
+        """
+        with self._condition:
+            counts = {priority: 0 for priority in self.priorities}
+            for waiter in self._waiters:
+                counts[waiter.priority] += 1
+            return counts
+
+    def __repr__(self) -> str:
+        return f"PriorityScheduler(requests_per_minute={self.rate * 60:g}, shares={self.shares}, granted={self.granted})"
@@ -0,0 +1,237 @@
+"""
+local store of transactions
+
+Overlapping pulls return the same transaction several times, with its latest status. ``TransactionStore``
+keeps one row per transaction id in SQLite, replaces it unless the stored version is newer and indexes the fields
+that are filtered on, so lookups like "all pending transactions of publisher X" do not need a request.
+"""
+import json
+import sqlite3
+import threading
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from .errors import AwinError
+from .models import Transaction
+
+_DATE_COLUMNS = {'transaction': 'transaction_date', 'validation': 'validation_date'}
+
+
+def _timestamp(value:Union[date, datetime, str]) -> str:
+    # timestamps of the API look like 2024-05-14T20:59:00, so they compare as strings
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%dT%H:%M:%S")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+class TransactionStore:
+    """
+    Transactions in a SQLite database, one row per transaction id.
+
+    :param path: path of the SQLite database file. Created if it does not exist. ':memory:' keeps the store in memory
+    :ivar upserted: number of transactions written since the store was opened
+    :ivar skipped: number of transactions not written since the store was opened, because the stored version was newer
+    """
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self.upserted = 0
+        self.skipped = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS transactions (
+                id INTEGER PRIMARY KEY,
+                advertiser_id INTEGER,
+                publisher_id INTEGER,
+                commission_status TEXT,
+                transaction_date TEXT,
+                validation_date TEXT,
+                order_ref TEXT,
+                updated REAL,
+                data TEXT
+            )""")
+        for columns in ('transaction_date', 'validation_date', 'publisher_id, commission_status',
+                        'commission_status', 'order_ref'):
+            name = 'transactions_' + columns.replace(', ', '_')
+            self._connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON transactions ({columns})")
+
+    def upsert(self, transactions:Iterable[Dict[str, Any]]) -> int:
+        """
+        Insert transactions, or replace the stored version of transactions with the same id unless it is newer.
+        The API has no version or update time, so the ``validationDate`` decides: a transaction that was validated
+        (approved or declined) is not replaced by a version without a validation date or with an earlier one,
+        e.g. from a replayed checkpoint or an old export. Versions with the same validation date replace each other,
+        so amendments of pending transactions are kept.
+        All transactions are written in one database transaction.
+
+        :param transactions: transactions as returned by the API, e.g. one window
+        :return: number of transactions written
+        """
+        now = time.time()
+        rows = [(transaction['id'], transaction.get('advertiserId'), transaction.get('publisherId'),
+                 transaction.get('commissionStatus'), transaction.get('transactionDate'),
+                 transaction.get('validationDate'), transaction.get('orderRef'), now, json.dumps(transaction))
+                for transaction in transactions]
+        if not rows:
+            return 0
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                # timestamps compare as strings, and '' sorts before all of them
+                written = self._connection.executemany("""
+                    INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (id) DO UPDATE SET
+                        advertiser_id = excluded.advertiser_id,
+                        publisher_id = excluded.publisher_id,
+                        commission_status = excluded.commission_status,
+                        transaction_date = excluded.transaction_date,
+                        validation_date = excluded.validation_date,
+                        order_ref = excluded.order_ref,
+                        updated = excluded.updated,
+                        data = excluded.data
+                    WHERE COALESCE(excluded.validation_date, '') >= COALESCE(transactions.validation_date, '')""",
+                    rows).rowcount
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self.upserted += written
+            self.skipped += len(rows) - written
+        return written
+
+    def get(self, transaction_id:Union[int, str], as_model:bool = False) -> Optional[Any]:
+        """
+        :param transaction_id: the transaction id
+        :param as_model: return a ``models.Transaction`` instead of a dictionary
+        :return: the stored transaction, or None if it is not stored
+        """
+        with self._lock:
+            row = self._connection.execute("SELECT data FROM transactions WHERE id = ?", (int(transaction_id),)).fetchone()
+        if row is None:
+            return None
+        transaction = json.loads(row[0])
+        return Transaction.from_dict(transaction) if as_model else transaction
+
+    def get_many(self, transaction_ids:Iterable[Union[int, str]], as_models:bool = False) -> List[Any]:
+        """
+        :param transaction_ids: the transaction ids
+        :param as_models: return ``models.Transaction`` objects instead of dictionaries
+        :return: the stored transactions in the order of the ids. Ids that are not stored are left out
+        """
+        ids = list(dict.fromkeys(int(transaction_id) for transaction_id in transaction_ids))
+        found = {}
+        with self._lock:
+            # stay below the maximum number of SQLite parameters
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                found.update(self._connection.execute(
+                    f"SELECT id, data FROM transactions WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall())
+        return [self._load(found[transaction_id], as_models) for transaction_id in ids if transaction_id in found]
+
+    @staticmethod
+    def _load(data:str, as_model:bool) -> Any:
+        transaction = json.loads(data)
+        return Transaction.from_dict(transaction) if as_model else transaction
+
+    @staticmethod
+    def _where(advertiser_id:Union[int, str] = None,
+               publisher_id:Union[int, str] = None,
+               status:str = None,
+               order_ref:str = None,
+               start_date:Union[date, datetime, str] = None,
+               end_date:Union[date, datetime, str] = None,
+               date_type:str = 'transaction') -> tuple:
+        if date_type not in _DATE_COLUMNS:
+            raise AwinError(f"unknown date type '{date_type}', use 'transaction' or 'validation'")
+        conditions, values = [], []
+        for column, value in (('advertiser_id', advertiser_id), ('publisher_id', publisher_id),
+                              ('commission_status', status), ('order_ref', order_ref)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(int(value) if column.endswith('_id') else value)
+        date_column = _DATE_COLUMNS[date_type]
+        if start_date is not None:
+            conditions.append(f"{date_column} >= ?")
+            values.append(_timestamp(start_date))
+        if end_date is not None:
+            conditions.append(f"{date_column} < ?")
+            values.append(_timestamp(end_date))
+        return (f"WHERE {' AND '.join(conditions)}" if conditions else ''), values
+
+    def query(self,
+              advertiser_id:Union[int, str] = None,
+              publisher_id:Union[int, str] = None,
+              status:str = None,
+              order_ref:str = None,
+              start_date:Union[date, datetime, str] = None,
+              end_date:Union[date, datetime, str] = None,
+              date_type:str = 'transaction',
+              limit:int = None,
+              as_models:bool = False) -> Iterator[Any]:
+        """
+        Stored transactions that match all given filters, ordered by the date of ``date_type``.
+        Every filter is answered from an index.
+
+        :param advertiser_id: the advertiser id (optional)
+        :param publisher_id: the publisher id (optional)
+        :param status: the commission status, e.g. 'pending' (optional)
+        :param order_ref: the order reference (optional)
+        :param start_date: first date of the range, included (optional)
+        :param end_date: end of the range, excluded (optional)
+        :param date_type: the date the range applies to, 'transaction' or 'validation'
+        :param limit: maximum number of transactions (optional)
+        :param as_models: yield ``models.Transaction`` objects instead of dictionaries
+        :return: iterator over the transactions
+        """
+        where, values = self._where(advertiser_id, publisher_id, status, order_ref, start_date, end_date, date_type)
+        sql = f"SELECT data FROM transactions {where} ORDER BY {_DATE_COLUMNS[date_type]}, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            values.append(int(limit))
+        with self._lock:
+            rows = self._connection.execute(sql, values).fetchall()
+        for (data,) in rows:
+            yield self._load(data, as_models)
+
+    def count(self,
+              advertiser_id:Union[int, str] = None,
+              publisher_id:Union[int, str] = None,
+              status:str = None,
+              order_ref:str = None,
+              start_date:Union[date, datetime, str] = None,
+              end_date:Union[date, datetime, str] = None,
+              date_type:str = 'transaction') -> int:
+        """
+        :return: number of stored transactions that match all given filters, see ``query``
+        """
+        where, values = self._where(advertiser_id, publisher_id, status, order_ref, start_date, end_date, date_type)
+        with self._lock:
+            return self._connection.execute(f"SELECT COUNT(*) FROM transactions {where}", values).fetchone()[0]
+
+    def delete(self, transaction_ids:Iterable[Union[int, str]]) -> None:
+        """
+        Remove transactions from the store.
+        """
+        with self._lock:
+            self._connection.executemany("DELETE FROM transactions WHERE id = ?", [(int(i),) for i in transaction_ids])
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def __contains__(self, transaction_id:Union[int, str]) -> bool:
+        with self._lock:
+            return self._connection.execute("SELECT 1 FROM transactions WHERE id = ?", (int(transaction_id),)).fetchone() is not None
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'TransactionStore':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
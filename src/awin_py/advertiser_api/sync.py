@@ -0,0 +1,58 @@
+"""
+state store for the incremental transaction sync of ``Awin.sync_transactions``
+"""
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+
+class SyncStateStore:
+    """
+    Stores one watermark per advertiser and date type in a local JSON file.
+    A watermark is the time up to which all changes have been fetched.
+
+    :param path: path of the JSON file. Created on the first update
+    """
+
+    def __init__(self, path:str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, str]:
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+    @staticmethod
+    def _key(advertiser_id:str, date_type:str) -> str:
+        return f"{advertiser_id}/{date_type}"
+
+    def get_watermark(self, advertiser_id:str, date_type:str) -> Optional[datetime]:
+        """
+        :param advertiser_id: the advertiser id
+        :param date_type: 'transaction' or 'validation'
+        :return: the watermark, or None if this advertiser and date type were never synced
+        """
+        with self._lock:
+            value = self._load().get(self._key(advertiser_id, date_type))
+        return datetime.fromisoformat(value) if value else None
+
+    def set_watermarks(self, advertiser_id:str, watermarks:Dict[str, datetime]) -> None:
+        """
+        Update the watermarks of one advertiser. The file is replaced atomically,
+        so a crash never leaves a partially written state behind.
+
+        :param advertiser_id: the advertiser id
+        :param watermarks: the new watermark per date type
+        """
+        with self._lock:
+            state = self._load()
+            for date_type, watermark in watermarks.items():
+                state[self._key(advertiser_id, date_type)] = watermark.isoformat()
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
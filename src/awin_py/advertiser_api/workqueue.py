@@ -0,0 +1,356 @@
+"""
+a shared work queue for backfills that run on several worker processes
+
+A backfill is planned as work units of (advertiser, endpoint, date window) in a SQLite database.
+Workers lease units, fetch them and write the results, then mark the units as done. A unit whose
+worker died is leased again once its lease expired, a failed unit is retried with a backoff, and
+completing a unit twice has no effect, so any number of worker processes can work on the same queue.
+The queue is for workers on one host: the database runs in SQLite's WAL mode, which needs shared memory
+and does not work on network file systems. To respect one rate budget, give all workers a
+``SQLiteSlidingWindowRateLimiter`` on a shared file.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .client import Awin
+from .errors import AwinError
+
+ENDPOINTS: Dict[str, bool] = {
+    'transactions': False,
+    'reports/publisher': True,
+    'reports/creative': True,
+    'reports/campaign': True,
+}
+"""endpoints that can be planned, and whether they are reports (with date windows of whole days)"""
+
+_DEFAULT_PARAMS = {
+    'transactions': {'timezone': 'UTC', 'dateType': 'transaction'},
+    'reports/publisher': {'timezone': 'UTC', 'dateType': 'transaction'},
+    'reports/creative': {'timezone': 'UTC', 'dateType': 'transaction', 'region': 'DE'},
+    'reports/campaign': {'timezone': 'UTC'},
+}
+
+
+class WorkUnit:
+    """
+    One date window of one endpoint of one advertiser.
+
+    :ivar id: stable id of the unit, derived from its contents, so planning the same unit twice has no effect
+    :ivar advertiser_id: the advertiser id
+    :ivar endpoint: e.g. 'transactions' or 'reports/publisher'
+    :ivar params: URL parameters of the request, including startDate and endDate
+    :ivar attempts: number of times the unit was leased
+    """
+    __slots__ = ('id', 'advertiser_id', 'endpoint', 'params', 'attempts')
+
+    def __init__(self, id:str, advertiser_id:str, endpoint:str, params:Dict[str, Any], attempts:int = 0) -> None:
+        self.id = id
+        self.advertiser_id = advertiser_id
+        self.endpoint = endpoint
+        self.params = params
+        self.attempts = attempts
+
+    @property
+    def path(self) -> str:
+        """the URL path of the request, relative to the Awin API base URL"""
+        return f"advertisers/{self.advertiser_id}/{self.endpoint}" + ('/' if self.endpoint == 'transactions' else '')
+
+    def __repr__(self) -> str:
+        return (f"WorkUnit(id={self.id!r}, advertiser_id={self.advertiser_id!r}, endpoint={self.endpoint!r}, "
+                f"startDate={self.params.get('startDate')!r}, endDate={self.params.get('endDate')!r}, attempts={self.attempts})")
+
+
+class WorkQueue:
+    """
+    Work units in a SQLite database, with leases, retries and idempotent completion.
+
+    :param path: path of the SQLite database file. Created if it does not exist
+    :param lease_seconds: how long a worker owns a leased unit before another worker may take it over.
+        ``run_worker`` renews the lease while it fetches a unit, so this bounds how long a dead worker holds a unit
+    :param max_attempts: how often a unit is leased before it is marked as failed
+    :param retry_backoff: seconds before a failed unit is leased again, doubled with every attempt
+    """
+
+    def __init__(self, path:str, lease_seconds:float = 600, max_attempts:int = 5, retry_backoff:float = 30) -> None:
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS work_units (
+                id TEXT PRIMARY KEY,
+                advertiser_id TEXT,
+                endpoint TEXT,
+                params TEXT,
+                status TEXT,
+                attempts INTEGER,
+                available_at REAL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created REAL,
+                updated REAL
+            )""")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS work_units_status ON work_units (status, available_at)")
+
+    @staticmethod
+    def unit_id(advertiser_id:str, endpoint:str, params:Dict[str, Any]) -> str:
+        relevant_params = {k: v for k, v in params.items() if v is not None}
+        raw = json.dumps([str(advertiser_id), endpoint, relevant_params], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+    def plan(self,
+             advertiser_ids:Iterable[Any],
+             endpoint:str,
+             start_date:datetime,
+             end_date:datetime,
+             params:Dict[str, Any] = None) -> int:
+        """
+        Split a backfill into one unit per advertiser and date window and add the units that are not planned yet.
+
+        :param advertiser_ids: the advertisers
+        :param endpoint: one of ``ENDPOINTS``
+        :param start_date: beginning of the date range
+        :param end_date: end of the date range
+        :param params: URL parameters of the requests. Defaults to UTC and, where the endpoint has it, transaction dates
+        :return: number of units added
+        """
+        if endpoint not in ENDPOINTS:
+            raise AwinError(f"unknown endpoint '{endpoint}', use one of {tuple(ENDPOINTS)}")
+        params = dict(_DEFAULT_PARAMS[endpoint], **(params or {}))
+        now = time.time()
+        rows = []
+        for advertiser_id in advertiser_ids:
+            for dt_start_str, dt_end_str in Awin._date_windows(start_date, end_date, ENDPOINTS[endpoint]):
+                window_params = dict(params, startDate=dt_start_str, endDate=dt_end_str)
+                unit_id = self.unit_id(advertiser_id, endpoint, window_params)
+                rows.append((unit_id, str(advertiser_id), endpoint, json.dumps(window_params), 'pending', 0, now, now, now))
+        with self._lock:
+            before = self._connection.total_changes
+            self._connection.execute("BEGIN IMMEDIATE")
+            self._connection.executemany("""
+                INSERT OR IGNORE INTO work_units (id, advertiser_id, endpoint, params, status, attempts, available_at, created, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""", rows)
+            self._connection.execute("COMMIT")
+            added = self._connection.total_changes - before
+        logging.info(f'planned {added} new work units ({len(rows) - added} already planned)')
+        return added
+
+    def lease(self, worker_id:str) -> Optional[WorkUnit]:
+        """
+        Take the oldest unit that is pending, or whose lease expired.
+
+        :param worker_id: identifies the worker, e.g. ``hostname:pid``
+        :return: the unit, or None if there is no unit to work on right now
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                while True:
+                    row = self._connection.execute("""
+                        SELECT id, advertiser_id, endpoint, params, attempts FROM work_units
+                        WHERE (status = 'pending' AND available_at <= ?) OR (status = 'leased' AND lease_expires < ?)
+                        ORDER BY created, id LIMIT 1""", (now, now)).fetchone()
+                    if row is None:
+                        self._connection.execute("COMMIT")
+                        return None
+                    unit_id, advertiser_id, endpoint, params, attempts = row
+                    if attempts < self.max_attempts:
+                        break
+                    # the last worker of this unit died or timed out
+                    self._connection.execute("""
+                        UPDATE work_units SET status = 'failed', lease_owner = NULL, error = ?, updated = ? WHERE id = ?""",
+                        ('lease expired after the last attempt', now, unit_id))
+                self._connection.execute("""
+                    UPDATE work_units SET status = 'leased', attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated = ?
+                    WHERE id = ?""", (worker_id, now + self.lease_seconds, now, unit_id))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        return WorkUnit(unit_id, advertiser_id, endpoint, json.loads(params), attempts + 1)
+
+    def heartbeat(self, unit:WorkUnit, worker_id:str) -> bool:
+        """
+        Extend the lease of a unit that takes long.
+
+        :return: False if the worker lost the lease in the meantime
+        """
+        with self._lock:
+            cursor = self._connection.execute("""
+                UPDATE work_units SET lease_expires = ?, updated = ?
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (time.time() + self.lease_seconds, time.time(), unit.id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, unit:WorkUnit, worker_id:str, result:Dict[str, Any] = None) -> bool:
+        """
+        Mark a unit as done. Completing a unit that is already done has no effect,
+        so a worker whose lease expired while it was still working does not overwrite the result of another worker.
+
+        :param result: a description of the result, e.g. the file it was written to
+        :return: True if this call completed the unit
+        """
+        with self._lock:
+            cursor = self._connection.execute("""
+                UPDATE work_units SET status = 'done', lease_owner = ?, result = ?, error = NULL, updated = ?
+                WHERE id = ? AND status != 'done'""",
+                (worker_id, json.dumps(result) if result is not None else None, time.time(), unit.id))
+        return cursor.rowcount == 1
+
+    def fail(self, unit:WorkUnit, worker_id:str, error:str) -> None:
+        """
+        Give a unit back after an error. It is leased again after a backoff, or marked as failed
+        after ``max_attempts``. Does nothing if the worker does not own the lease any more.
+        """
+        now = time.time()
+        status = 'failed' if unit.attempts >= self.max_attempts else 'pending'
+        available_at = now + self.retry_backoff * 2 ** (unit.attempts - 1)
+        with self._lock:
+            self._connection.execute("""
+                UPDATE work_units SET status = ?, lease_owner = NULL, available_at = ?, error = ?, updated = ?
+                WHERE id = ? AND status = 'leased' AND lease_owner = ?""",
+                (status, available_at, error, now, unit.id, worker_id))
+
+    def retry_failed(self) -> int:
+        """
+        Put all failed units back into the queue with a fresh number of attempts.
+
+        :return: number of units
+        """
+        with self._lock:
+            cursor = self._connection.execute("""
+                UPDATE work_units SET status = 'pending', attempts = 0, available_at = ?, updated = ? WHERE status = 'failed'""",
+                (time.time(), time.time()))
+        return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        """
+        :return: number of units by status: pending, leased, done and failed
+        """
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) FROM work_units GROUP BY status").fetchall()
+        return dict({'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}, **dict(rows))
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """
+        :return: the failed units with their last error
+        """
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id, advertiser_id, endpoint, params, attempts, error FROM work_units WHERE status = 'failed'").fetchall()
+        return [{'id': row[0], 'advertiser_id': row[1], 'endpoint': row[2], 'params': json.loads(row[3]),
+                 'attempts': row[4], 'error': row[5]} for row in rows]
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> 'WorkQueue':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def _write_result(output_dir:str, unit:WorkUnit, results:Any) -> str:
+    # the file name is derived from the unit, so a unit that is fetched twice overwrites its own file
+    directory = os.path.join(output_dir, unit.endpoint.replace('/', '-'), f"advertiser={unit.advertiser_id}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{unit.id}.json.gz")
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with gzip.open(tmp_path, 'wt') as f:
+        json.dump({'advertiser_id': unit.advertiser_id, 'endpoint': unit.endpoint, 'params': unit.params, 'results': results}, f)
+    os.replace(tmp_path, path)
+    return path
+
+
+@contextmanager
+def _renewed_lease(queue:WorkQueue, unit:WorkUnit, worker_id:str) -> Iterator[None]:
+    """
+    Renew the lease of a unit in a background thread while the block runs.
+    """
+    stop = threading.Event()
+
+    def keep_lease() -> None:
+        # renew long before the lease expires
+        while not stop.wait(queue.lease_seconds / 3):
+            if not queue.heartbeat(unit, worker_id):
+                logging.warning(f'{worker_id} lost the lease of {unit}')
+                return
+
+    keeper = threading.Thread(target=keep_lease, daemon=True)
+    keeper.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        keeper.join()
+
+
+def run_worker(client:Awin,
+               queue:WorkQueue,
+               output_dir:str,
+               worker_id:str = None,
+               idle_timeout:float = 0,
+               poll_interval:float = 5,
+               max_units:int = None) -> int:
+    """
+    Lease units from the queue, fetch them and write each result to ``<output_dir>/<endpoint>/advertiser=<id>/<unit id>.json.gz``
+    until the queue is empty. The lease of a unit is renewed in the background while it is fetched,
+    so requests that wait long for the rate limiter or for retries are not taken over by other workers.
+
+    :param client: the client. Other advertisers are fetched through ``Awin.for_advertiser``, all with its rate limiter
+    :param queue: the work queue
+    :param output_dir: directory of the results
+    :param worker_id: identifies the worker. Defaults to ``hostname:pid``
+    :param idle_timeout: seconds to keep polling for new units once the queue is empty,
+        e.g. while units of other workers wait for their retry
+    :param poll_interval: seconds between polls of an empty queue
+    :param max_units: stop after this many units (optional)
+    :return: number of units this worker completed
+    """
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    completed = 0
+    idle_since = None
+    while max_units is None or completed < max_units:
+        unit = queue.lease(worker_id)
+        if unit is None:
+            counts = queue.counts()
+            if not counts['pending'] and not counts['leased']:
+                break
+            idle_since = idle_since or time.monotonic()
+            if time.monotonic() - idle_since > idle_timeout:
+                break
+            time.sleep(poll_interval)
+            continue
+        idle_since = None
+        logging.info(f'{worker_id} leased {unit}')
+        try:
+            with _renewed_lease(queue, unit, worker_id):
+                advertiser_client = client if str(client.client_id) == unit.advertiser_id else client.for_advertiser(unit.advertiser_id)
+                results = advertiser_client._request(unit.path, unit.params, priority='bulk')
+                path = _write_result(output_dir, unit, results)
+        except Exception as e:
+            logging.warning(f'{worker_id} failed {unit}: {e!r}')
+            queue.fail(unit, worker_id, repr(e))
+            continue
+        if queue.complete(unit, worker_id, {'path': path, 'records': len(results) if isinstance(results, list) else None}):
+            completed += 1
+    logging.info(f'{worker_id} completed {completed} units')
+    return completed
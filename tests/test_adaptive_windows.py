@@ -0,0 +1,65 @@
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from awin_py.advertiser_api import Awin, SlidingWindowRateLimiter
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 7, 1)
+
+
+class FakeApi:
+    """Answers transaction windows with one transaction per hour and times out on windows longer than ``max_days``."""
+
+    def __init__(self, max_days:float) -> None:
+        self.max_days = max_days
+        self.windows = []
+        self.timeouts = []
+
+    def __call__(self, path, params=None, method='GET', retry_timeouts=True, priority=None):
+        start = datetime.fromisoformat(params['startDate'])
+        end = datetime.fromisoformat(params['endDate'])
+        if end - start > timedelta(days=self.max_days):
+            self.timeouts.append((start, end))
+            raise requests.Timeout()
+        self.windows.append((start, end))
+        first = -(-(start - START) // timedelta(hours=1))
+        last = (end - START) // timedelta(hours=1)
+        return [{'id': hour} for hour in range(first, last + 1)]
+
+
+@pytest.fixture
+def client():
+    client = Awin(client_id='1', client_secret='secret', adaptive_windows=True, target_window_records=5000,
+                  rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    yield client
+    client.close()
+
+
+def test_window_that_times_out_is_split(client, monkeypatch):
+    api = FakeApi(max_days=20)
+    monkeypatch.setattr(client, '_request', api)
+    transactions = client.get_transactions(START, END)
+    assert [t['id'] for t in transactions] == list(range((END - START) // timedelta(hours=1) + 1))
+    # the windows cover the range without gaps or overlaps
+    assert api.windows[0][0] == START and api.windows[-1][1] == END
+    for (_, previous_end), (start, _) in zip(api.windows, api.windows[1:]):
+        assert start == previous_end + timedelta(seconds=1)
+
+
+def test_windows_do_not_grow_back_to_a_size_that_timed_out(client, monkeypatch):
+    api = FakeApi(max_days=20)
+    monkeypatch.setattr(client, '_request', api)
+    client.get_transactions(START, END)
+    # only the first 31 day window times out, all later windows stay at half of it
+    assert api.timeouts == [(START, START + timedelta(days=31))]
+    assert all(end - start <= timedelta(days=15.5) for start, end in api.windows)
+
+
+def test_window_at_the_minimum_size_raises(client, monkeypatch):
+    api = FakeApi(max_days=0)
+    monkeypatch.setattr(client, '_request', api)
+    with pytest.raises(requests.Timeout):
+        client.get_transactions(START, END)
+    assert api.timeouts[-1][1] - api.timeouts[-1][0] <= client.min_window
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from awin_py.advertiser_api import AsyncAwin, TokenBucketRateLimiter
+
+
+def test_cancelled_waits_give_their_tokens_back():
+    limiter = TokenBucketRateLimiter(requests_per_minute=600)
+
+    async def main():
+        tasks = [asyncio.ensure_future(limiter.acquire_async()) for _ in range(20)]
+        await asyncio.sleep(0.05)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    # without giving back, the 19 cancelled waits would still be booked: 1.9 seconds
+    assert limiter.reserve() < 0.2
+
+
+def test_gather_cancels_the_others_when_one_fails():
+    finished = []
+
+    async def slow(i):
+        await asyncio.sleep(0.5)
+        finished.append(i)
+
+    async def fail():
+        await asyncio.sleep(0.05)
+        raise ValueError('window failed')
+
+    async def main():
+        with pytest.raises(ValueError):
+            await AsyncAwin._gather([slow(1), fail(), slow(2)])
+        await asyncio.sleep(0.6)
+
+    asyncio.run(main())
+    assert finished == []
+
+
+def test_semaphore_is_created_in_the_running_loop():
+    client = AsyncAwin(client_id='1', client_secret='secret', max_concurrency=3)
+    assert client._semaphore is None
+
+    async def main():
+        return client.semaphore
+
+    semaphore = asyncio.run(main())
+    assert semaphore is client.semaphore
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from awin_py.advertiser_api import Awin, SlidingWindowRateLimiter
+from awin_py.advertiser_api.errors import AwinApiError
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 5, 1)
+
+
+class FakeApi:
+    """Answers transaction windows with one transaction per day and fails with a 500 after ``fail_after`` windows."""
+
+    def __init__(self, fail_after:int = None) -> None:
+        self.fail_after = fail_after
+        self.windows = []
+
+    def __call__(self, path, params=None, method='GET', retry_timeouts=True, priority=None):
+        if self.fail_after is not None and len(self.windows) >= self.fail_after:
+            raise AwinApiError(500, message='internal server error')
+        start = datetime.fromisoformat(params['startDate'])
+        end = datetime.fromisoformat(params['endDate'])
+        self.windows.append((params['startDate'], params['endDate']))
+        first = -(-(start - START) // timedelta(days=1))
+        last = (end - START) // timedelta(days=1)
+        return [{'id': day} for day in range(first, last + 1)]
+
+
+@pytest.fixture(params=[False, True], ids=['fixed', 'adaptive'])
+def client(request):
+    client = Awin(client_id='1', client_secret='secret', adaptive_windows=request.param, target_window_records=20,
+                  rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    yield client
+    client.close()
+
+
+def test_rerun_resumes_from_the_checkpoint(client, monkeypatch, tmp_path):
+    expected = list(range((END - START) // timedelta(days=1) + 1))
+
+    failing = FakeApi(fail_after=2)
+    monkeypatch.setattr(client, '_request', failing)
+    with pytest.raises(AwinApiError):
+        client.get_transactions(START, END, checkpoint_dir=str(tmp_path))
+    assert len(failing.windows) == 2
+
+    resumed = FakeApi()
+    monkeypatch.setattr(client, '_request', resumed)
+    transactions = client.get_transactions(START, END, checkpoint_dir=str(tmp_path))
+    assert [t['id'] for t in transactions] == expected
+    # the two completed windows are not requested again
+    assert not set(resumed.windows) & set(failing.windows)
+    assert resumed.windows[0][0] > failing.windows[-1][1]
+
+    # a complete checkpoint answers a third run without any request
+    replayed = FakeApi(fail_after=0)
+    monkeypatch.setattr(client, '_request', replayed)
+    assert [t['id'] for t in client.get_transactions(START, END, checkpoint_dir=str(tmp_path))] == expected
+
+
+def test_other_arguments_use_another_checkpoint(client, monkeypatch, tmp_path):
+    monkeypatch.setattr(client, '_request', FakeApi())
+    client.get_transactions(START, END, checkpoint_dir=str(tmp_path))
+    api = FakeApi()
+    monkeypatch.setattr(client, '_request', api)
+    client.get_transactions(START, END, status='approved', checkpoint_dir=str(tmp_path))
+    assert api.windows
@@ -0,0 +1,96 @@
+from datetime import datetime
+
+import pytest
+
+from awin_py.advertiser_api import Awin, FingerprintStore, SlidingWindowRateLimiter
+
+START = datetime(2024, 1, 1)
+END = datetime(2024, 3, 1)
+
+
+def transaction(transaction_id, transaction_date, status='pending', amount=10.0):
+    return {'id': transaction_id, 'transactionDate': transaction_date, 'commissionStatus': status,
+            'saleAmount': {'amount': amount, 'currency': 'EUR'}, 'validationDate': None, 'clickRefs': {}}
+
+
+class FakeApi:
+    """Answers transaction windows from ``transactions``, which the tests change between runs."""
+
+    def __init__(self) -> None:
+        self.transactions = {
+            1: transaction(1, '2024-01-05T10:00:00'),
+            2: transaction(2, '2024-01-20T10:00:00'),
+            3: transaction(3, '2024-02-10T10:00:00'),
+            4: transaction(4, '2024-02-25T10:00:00'),
+        }
+
+    def __call__(self, path, params=None, method='GET', retry_timeouts=True, priority=None):
+        return [dict(t) for t in self.transactions.values()
+                if params['startDate'] <= t['transactionDate'] <= params['endDate']]
+
+
+@pytest.fixture
+def api(monkeypatch):
+    api = FakeApi()
+    monkeypatch.setattr(Awin, '_request', api)
+    return api
+
+
+@pytest.fixture
+def client(api):
+    client = Awin(client_id='11111', client_secret='secret', rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def fingerprints():
+    with FingerprintStore(':memory:') as fingerprints:
+        yield fingerprints
+
+
+def run(client, fingerprints, **kwargs):
+    diffs = list(client.diff_transactions(fingerprints, START, END, **kwargs))
+    return ({t['id'] for d in diffs for t in d.inserted}, {t['id'] for d in diffs for t in d.changed},
+            {i for d in diffs for i in d.disappeared}, sum(d.unchanged for d in diffs))
+
+
+def test_first_run_reports_everything_as_inserted(client, fingerprints):
+    assert run(client, fingerprints) == ({1, 2, 3, 4}, set(), set(), 0)
+    assert len(fingerprints) == 4
+
+
+def test_unchanged_windows_report_nothing(client, fingerprints):
+    run(client, fingerprints)
+    assert run(client, fingerprints) == (set(), set(), set(), 4)
+
+
+def test_inserted_changed_and_disappeared(api, client, fingerprints):
+    run(client, fingerprints)
+    api.transactions[2]['commissionStatus'] = 'approved'
+    api.transactions[3]['saleAmount'] = {'amount': 8.0, 'currency': 'EUR'}
+    # fields that are not fingerprinted do not count as changes
+    api.transactions[4]['clickRefs'] = {'clickRef': 'x'}
+    api.transactions[5] = transaction(5, '2024-02-11T10:00:00')
+    del api.transactions[1]
+    assert run(client, fingerprints) == ({5}, {2, 3}, {1}, 1)
+    assert len(fingerprints) == 4
+    # the changes are reported once
+    assert run(client, fingerprints) == (set(), set(), set(), 4)
+
+
+def test_changes_of_a_window_that_was_not_processed_are_reported_again(api, client, fingerprints):
+    run(client, fingerprints)
+    api.transactions[1]['commissionStatus'] = 'declined'
+    diffs = client.diff_transactions(fingerprints, START, END)
+    first = next(diffs)
+    assert [t['id'] for t in first.changed] == [1]
+    # the consumer failed before asking for the next window
+    diffs.close()
+    assert run(client, fingerprints) == (set(), {1}, set(), 3)
+
+
+def test_filters_keep_their_fingerprints_apart(client, fingerprints):
+    run(client, fingerprints)
+    assert run(client, fingerprints, status='pending') == ({1, 2, 3, 4}, set(), set(), 0)
+
@@ -0,0 +1,87 @@
+import io
+import json
+
+import pytest
+
+from awin_py.advertiser_api import jsonstream
+from awin_py.advertiser_api.jsonstream import iter_json_array, iter_json_array_from_file
+
+DOCUMENT = json.dumps([
+    {"id": 123, "saleAmount": {"amount": 10.5, "currency": "EUR"}, "orderRef": "a,b]c"},
+    12345,
+    -0.25e3,
+    "Müller ✓",
+    None,
+    True,
+    [1, [2, []]],
+    {},
+], ensure_ascii=False, indent=1).encode()
+
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64, 10 ** 6])
+def test_chunk_sizes(size):
+    assert list(iter_json_array(chunked(DOCUMENT, size))) == json.loads(DOCUMENT)
+
+
+def test_every_split_position():
+    # numbers, strings and multi-byte characters split between two chunks
+    expected = json.loads(DOCUMENT)
+    for i in range(len(DOCUMENT) + 1):
+        assert list(iter_json_array([DOCUMENT[:i], DOCUMENT[i:]])) == expected, i
+
+
+def test_number_at_chunk_end_is_not_cut():
+    assert list(iter_json_array([b'[12', b'3, 4', b'5]'])) == [123, 45]
+
+
+@pytest.mark.parametrize('document', [b'[]', b' [ ] ', b'\n[\n]\n'])
+def test_empty_array(document):
+    assert list(iter_json_array([document])) == []
+
+
+@pytest.mark.parametrize('document', [
+    b'[1,]',
+    b'[,1]',
+    b'[,,1]',
+    b'[1,,2]',
+    b'[,]',
+    b'[1 2]',
+    b'[1',
+    b'[1,',
+    b'[',
+    b'',
+    b'{"a": 1}',
+    b'[{"a": }]',
+    b'[1]]',
+])
+def test_malformed(document):
+    with pytest.raises(ValueError):
+        list(iter_json_array(chunked(document, 1)))
+    with pytest.raises(ValueError):
+        list(iter_json_array([document]))
+
+
+def test_elements_before_an_error_are_yielded():
+    elements = iter_json_array([b'[1, 2, x]'])
+    assert next(elements) == 1
+    assert next(elements) == 2
+    with pytest.raises(ValueError):
+        next(elements)
+
+
+def test_from_file_standard_library(monkeypatch):
+    monkeypatch.setattr(jsonstream, 'ijson', None)
+    assert list(iter_json_array_from_file(io.BytesIO(DOCUMENT), chunk_size=5)) == json.loads(DOCUMENT)
+    with pytest.raises(ValueError):
+        list(iter_json_array_from_file(io.BytesIO(b'[1,]'), chunk_size=2))
+
+
+def test_from_file_ijson_errors_are_value_errors():
+    if jsonstream.ijson is None:
+        pytest.skip('ijson is not installed')
+    with pytest.raises(ValueError):
+        list(iter_json_array_from_file(io.BytesIO(b'[1, {"a": ]'), chunk_size=4))
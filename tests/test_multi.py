@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from awin_py.advertiser_api import Awin, MultiAdvertiserRunner, SlidingWindowRateLimiter
+from awin_py.advertiser_api.errors import AwinApiError
+
+
+def fake_request(self, path, params=None, method='GET', retry_timeouts=True, priority=None):
+    if self.client_id == '2':
+        raise AwinApiError(401, message='not authorized')
+    return [{'id': int(self.client_id) * 100 + i} for i in range(3)]
+
+
+def test_generators_are_read_inside_the_worker(monkeypatch):
+    monkeypatch.setattr(Awin, '_request', fake_request)
+    client = Awin(client_id='1', client_secret='secret', rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    runner = MultiAdvertiserRunner(client, ['1', '2', '3'])
+    results = runner.run('iter_transactions', datetime(2024, 1, 1), datetime(2024, 1, 10))
+    assert [t['id'] for t in results['1'].result] == [100, 101, 102]
+    assert [t['id'] for t in results['3'].result] == [300, 301, 302]
+    # the error of a generator is caught for its advertiser instead of surfacing in the caller
+    assert not results['2'].ok
+    assert isinstance(results['2'].error, AwinApiError)
+    client.close()
@@ -0,0 +1,74 @@
+import pytest
+
+from awin_py.advertiser_api import ratelimit
+from awin_py.advertiser_api.ratelimit import SlidingWindowRateLimiter, SQLiteSlidingWindowRateLimiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit.time, 'monotonic', clock)
+    monkeypatch.setattr(ratelimit.time, 'time', clock)
+    return clock
+
+
+def sent_in_any_window(send_times, window=60):
+    return max(sum(1 for other in send_times if at <= other < at + window) for at in send_times)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_limiter(request, tmp_path):
+    def make(**kwargs):
+        if request.param == 'memory':
+            return SlidingWindowRateLimiter(**kwargs)
+        return SQLiteSlidingWindowRateLimiter(str(tmp_path / 'rate.sqlite'), **kwargs)
+    return make
+
+
+def test_idle_limiter_sends_a_full_minute_at_once(clock, make_limiter):
+    limiter = make_limiter(requests_per_minute=20)
+    waits = [limiter.reserve() for _ in range(20)]
+    assert waits == [0] * 20
+    # the 21st request waits until the first one has left the window
+    assert limiter.reserve() == pytest.approx(60)
+
+
+def test_never_more_than_the_limit_in_any_window(clock, make_limiter):
+    limiter = make_limiter(requests_per_minute=20)
+    send_times = []
+    for i in range(100):
+        send_times.append(clock.now + limiter.reserve())
+        # callers arrive at irregular intervals
+        clock.now += (i % 7) * 0.9
+    assert sent_in_any_window(send_times) == 20
+    assert send_times == sorted(send_times)
+
+
+def test_backfill_of_twelve_windows_does_not_wait(clock, make_limiter):
+    limiter = make_limiter(requests_per_minute=20)
+    assert sum(limiter.reserve() for _ in range(12)) == 0
+
+
+def test_released_bookings_are_given_back(clock, make_limiter):
+    limiter = make_limiter(requests_per_minute=20)
+    for _ in range(20):
+        limiter.reserve()
+    assert limiter.reserve() == pytest.approx(60)
+    limiter.release()
+    assert limiter.reserve() == pytest.approx(60)
+    assert limiter.reserve() == pytest.approx(60)
+
+
+def test_shorter_window_spreads_the_requests(clock, make_limiter):
+    limiter = make_limiter(requests_per_minute=20, window=15)
+    assert limiter.limit == 5
+    waits = [limiter.reserve() for _ in range(6)]
+    assert waits == pytest.approx([0, 0, 0, 0, 0, 15])
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+import pytest
+
+from awin_py.advertiser_api import Awin, SlidingWindowRateLimiter
+from awin_py.advertiser_api.rollup import ReportRollup
+from stub_server import start_stub_server
+
+
+@pytest.fixture
+def server():
+    server = start_stub_server(report_rows=3)
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def rollup(server):
+    client = Awin(base_url=server.url, client_id='11111', client_secret='secret',
+                  rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    rollup = ReportRollup(client, ':memory:')
+    yield rollup
+    rollup.close()
+    client.close()
+
+
+def test_campaign_days_are_fetched_31_at_a_time(server, rollup):
+    rows = rollup.rollup('campaign', datetime(2024, 1, 1), datetime(2024, 3, 31), interval='month')
+    # 91 days in 3 runs of at most 31 days
+    assert server.requests == 3
+    assert rollup.fetched_days == 91
+    assert [row['period'] for row in rows] == ['2024-01'] * 3 + ['2024-02'] * 3 + ['2024-03'] * 3
+    january = [row for row in rows if row['period'] == '2024-01']
+    assert [row['clicks'] for row in january] == [31 * 100, 31 * 101, 31 * 102]
+    assert all('date' not in row for row in rows)
+
+
+def test_runs_are_split_at_stored_days(server, rollup):
+    rollup.ensure('campaign', datetime(2024, 1, 10), datetime(2024, 1, 10))
+    assert server.requests == 1
+    rollup.ensure('campaign', datetime(2024, 1, 1), datetime(2024, 1, 20))
+    # 1st-9th and 11th-20th
+    assert server.requests == 3
+    assert rollup.missing_days('11111', 'campaign', datetime(2024, 1, 1), datetime(2024, 1, 20)) == []
+    # the day fetched alone and the days fetched in a run have the same rows
+    daily = rollup.rollup('campaign', datetime(2024, 1, 9), datetime(2024, 1, 11), interval='day', fetch=False)
+    assert len(daily) == 9
+    assert len({row['campaign'] for row in daily}) == 3
+
+
+def test_other_reports_are_fetched_by_day(server, rollup):
+    rollup.ensure('publisher', datetime(2024, 1, 1), datetime(2024, 1, 5))
+    assert server.requests == 5
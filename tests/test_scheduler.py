@@ -0,0 +1,214 @@
+import asyncio
+import threading
+
+import pytest
+
+from awin_py.advertiser_api import scheduler
+from awin_py.advertiser_api.errors import AwinError
+from awin_py.advertiser_api.scheduler import PriorityScheduler, _Waiter
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeCondition:
+    """Stands in for the condition of the scheduler in single threaded tests: waiting moves the clock forward."""
+
+    def __init__(self, clock:FakeClock) -> None:
+        self.clock = clock
+        self.waits = []
+
+    def __enter__(self) -> 'FakeCondition':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+    def wait(self, timeout:float) -> None:
+        self.waits.append(timeout)
+        self.clock.now += timeout
+
+    def notify_all(self) -> None:
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(scheduler.time, 'monotonic', clock)
+    return clock
+
+
+def make_scheduler(clock, **kwargs):
+    limiter = PriorityScheduler(**kwargs)
+    limiter._condition = FakeCondition(clock)
+    return limiter
+
+
+def add_waiter(limiter, priority, deadline=float('inf')):
+    limiter._sequence += 1
+    waiter = _Waiter(priority, limiter.priorities.index(priority), deadline, limiter._sequence, 1)
+    limiter._waiters.append(waiter)
+    return waiter
+
+
+def test_default_burst_paces_requests(clock):
+    limiter = make_scheduler(clock, requests_per_minute=60)
+    waits = [limiter.acquire(priority='bulk') for _ in range(4)]
+    assert waits[0] == 0
+    assert waits[1:] == pytest.approx([1, 1, 1])
+    assert limiter.granted['bulk'] == 4
+    assert limiter.waited['bulk'] == pytest.approx(3)
+
+
+def test_unknown_priority_falls_back_to_default(clock):
+    limiter = make_scheduler(clock, shares={'high': 0.7, 'low': 0.3}, default_priority='low')
+    limiter.acquire(priority='interactive')
+    limiter.acquire()
+    assert limiter.granted == {'high': 0, 'low': 2}
+
+
+def test_unknown_default_priority_is_rejected():
+    with pytest.raises(AwinError):
+        PriorityScheduler(shares={'high': 0.7, 'low': 0.3}, default_priority='interactive')
+
+
+def test_reserved_must_be_below_burst():
+    with pytest.raises(AwinError):
+        PriorityScheduler(burst=1, reserved=1)
+
+
+def test_higher_priority_wins_at_equal_usage(clock):
+    limiter = make_scheduler(clock)
+    bulk = add_waiter(limiter, 'bulk')
+    interactive = add_waiter(limiter, 'interactive')
+    assert limiter._next(clock.now) is interactive
+    limiter._waiters.remove(interactive)
+    assert limiter._next(clock.now) is bulk
+
+
+def test_class_below_its_share_is_served_first(clock):
+    limiter = make_scheduler(clock)
+    interactive = add_waiter(limiter, 'interactive')
+    bulk = add_waiter(limiter, 'bulk')
+    # interactive used 0.6 / 0.5 = 1.2 of its share, bulk 0.2 / 0.2 = 1.0
+    limiter._usage.update(interactive=0.6, bulk=0.2)
+    assert limiter._next(clock.now) is bulk
+    limiter._usage.update(interactive=0.4)
+    assert limiter._next(clock.now) is interactive
+
+
+def test_earliest_deadline_within_a_class(clock):
+    limiter = make_scheduler(clock)
+    add_waiter(limiter, 'normal', deadline=clock.now + 50)
+    early = add_waiter(limiter, 'normal', deadline=clock.now + 40)
+    add_waiter(limiter, 'normal')
+    assert limiter._next(clock.now) is early
+
+
+def test_urgent_deadline_goes_ahead_of_the_shares(clock):
+    limiter = make_scheduler(clock, requests_per_minute=60, urgency=2)
+    add_waiter(limiter, 'interactive', deadline=clock.now + 10)
+    bulk = add_waiter(limiter, 'bulk', deadline=clock.now + 1.5)
+    assert limiter._next(clock.now) is bulk
+
+
+def test_usage_decays_with_half_life(clock):
+    limiter = make_scheduler(clock, usage_half_life=60)
+    limiter._usage['bulk'] = 8.0
+    clock.now += 120
+    limiter._refill(clock.now)
+    assert limiter._usage['bulk'] == pytest.approx(2.0)
+
+
+def test_reserved_tokens_are_kept_for_the_highest_class(clock):
+    limiter = make_scheduler(clock, requests_per_minute=60, burst=3, reserved=1)
+    # bulk leaves one token in the bucket
+    assert limiter.acquire(priority='bulk') == 0
+    assert limiter.acquire(priority='bulk') == 0
+    assert limiter._tokens == pytest.approx(1)
+    # which an interactive request gets right away
+    assert limiter.acquire(priority='interactive') == 0
+    # the next bulk request waits until two tokens refilled
+    assert limiter.acquire(priority='bulk') == pytest.approx(2)
+
+
+def test_queued_counts_waiters(clock):
+    limiter = make_scheduler(clock)
+    add_waiter(limiter, 'bulk')
+    add_waiter(limiter, 'bulk')
+    add_waiter(limiter, 'interactive')
+    assert limiter.queued() == {'interactive': 1, 'normal': 0, 'bulk': 2}
+
+
+def test_interactive_request_during_a_bulk_run_async():
+    # real time: one token every 50 ms
+    limiter = PriorityScheduler(requests_per_minute=1200)
+    order = []
+
+    async def request(name, priority):
+        await limiter.acquire_async(priority=priority)
+        order.append(name)
+
+    async def main():
+        bulk = [asyncio.ensure_future(request(f'bulk-{i}', 'bulk')) for i in range(20)]
+        await asyncio.sleep(0.22)
+        sent_before = len(order)
+        await request('interactive', 'interactive')
+        await asyncio.gather(*bulk)
+        return sent_before
+
+    sent_before = asyncio.run(main())
+    # the interactive request gets the next token instead of waiting behind the queued bulk requests
+    assert order.index('interactive') <= sent_before + 1
+    assert len(order) == 21
+    assert limiter.granted == {'interactive': 1, 'normal': 0, 'bulk': 20}
+    assert limiter.waited['interactive'] < 0.2
+
+
+def test_cancelled_async_waiters_leave_the_queue():
+    limiter = PriorityScheduler(requests_per_minute=60)
+
+    async def main():
+        await limiter.acquire_async(priority='bulk')
+        tasks = [asyncio.ensure_future(limiter.acquire_async(priority='bulk')) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        assert limiter.queued()['bulk'] == 5
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(main())
+    assert limiter.queued() == {'interactive': 0, 'normal': 0, 'bulk': 0}
+    assert limiter.granted['bulk'] == 1
+
+
+def test_threads_and_coroutines_share_the_queue():
+    limiter = PriorityScheduler(requests_per_minute=1200)
+    order = []
+
+    def thread_request():
+        limiter.acquire(priority='interactive')
+        order.append('thread')
+
+    async def main():
+        bulk = [asyncio.ensure_future(limiter.acquire_async(priority='bulk')) for _ in range(10)]
+        await asyncio.sleep(0.12)
+        thread = threading.Thread(target=thread_request)
+        thread.start()
+        while thread.is_alive():
+            await asyncio.sleep(0.01)
+        done = sum(task.done() for task in bulk)
+        await asyncio.gather(*bulk)
+        thread.join()
+        return done
+
+    done = asyncio.run(main())
+    assert order == ['thread']
+    # the interactive thread did not wait for the queued coroutines
+    assert done < 10
@@ -0,0 +1,34 @@
+from awin_py.advertiser_api.store import TransactionStore
+
+
+def transaction(transaction_id, status='pending', validation_date=None, amount=10.0):
+    return {'id': transaction_id, 'advertiserId': 1, 'publisherId': 2, 'commissionStatus': status,
+            'transactionDate': '2024-05-14T20:59:00', 'validationDate': validation_date,
+            'orderRef': f'order-{transaction_id}', 'saleAmount': {'amount': amount, 'currency': 'EUR'}}
+
+
+def test_replayed_older_version_does_not_replace_a_validated_one():
+    with TransactionStore(':memory:') as store:
+        assert store.upsert([transaction(1), transaction(2)]) == 2
+        assert store.upsert([transaction(1, 'approved', '2024-06-01T10:00:00')]) == 1
+        # a replay of the window from before the approval
+        assert store.upsert([transaction(1), transaction(2)]) == 1
+        assert store.get(1)['commissionStatus'] == 'approved'
+        assert store.skipped == 1
+        assert store.count(status='pending') == 1
+
+
+def test_later_validation_replaces_an_earlier_one():
+    with TransactionStore(':memory:') as store:
+        store.upsert([transaction(1, 'approved', '2024-06-01T10:00:00')])
+        store.upsert([transaction(1, 'declined', '2024-06-03T10:00:00')])
+        store.upsert([transaction(1, 'approved', '2024-06-01T10:00:00')])
+        assert store.get(1)['commissionStatus'] == 'declined'
+
+
+def test_amendments_of_pending_transactions_are_kept():
+    with TransactionStore(':memory:') as store:
+        store.upsert([transaction(1, amount=10.0)])
+        assert store.upsert([transaction(1, amount=8.0)]) == 1
+        assert store.get(1)['saleAmount']['amount'] == 8.0
+        assert store.upserted == 2
@@ -0,0 +1,121 @@
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from awin_py.advertiser_api import Awin, SlidingWindowRateLimiter
+from awin_py.advertiser_api import workqueue
+from awin_py.advertiser_api.workqueue import WorkQueue, run_worker
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1_700_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(workqueue.time, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / 'queue.sqlite'), lease_seconds=600, max_attempts=3, retry_backoff=30)
+    queue.plan(['11111'], 'transactions', datetime(2024, 1, 1), datetime(2024, 1, 20))
+    yield queue
+    queue.close()
+
+
+def test_expired_lease_is_taken_over(clock, queue):
+    unit = queue.lease('a')
+    assert queue.lease('b') is None
+    clock.now += 601
+    taken_over = queue.lease('b')
+    assert taken_over.id == unit.id
+    assert taken_over.attempts == 2
+    # the first worker lost the lease: its heartbeat and failure have no effect, its late result is kept once
+    assert not queue.heartbeat(unit, 'a')
+    queue.fail(unit, 'a', 'too late')
+    assert queue.counts()['leased'] == 1
+    assert queue.complete(unit, 'a', {'path': 'a'})
+    assert not queue.complete(taken_over, 'b', {'path': 'b'})
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': 1, 'failed': 0}
+
+
+def test_heartbeat_extends_the_lease(clock, queue):
+    unit = queue.lease('a')
+    clock.now += 500
+    assert queue.heartbeat(unit, 'a')
+    clock.now += 500
+    assert queue.lease('b') is None
+
+
+def test_failed_unit_is_retried_after_a_backoff(clock, queue):
+    unit = queue.lease('a')
+    queue.fail(unit, 'a', 'HTTP 503')
+    assert queue.lease('a') is None
+    clock.now += 31
+    retried = queue.lease('a')
+    assert retried.id == unit.id and retried.attempts == 2
+    queue.fail(retried, 'a', 'HTTP 503')
+    # the backoff doubles with every attempt
+    clock.now += 31
+    assert queue.lease('a') is None
+    clock.now += 30
+    assert queue.lease('a').attempts == 3
+
+
+def test_unit_fails_after_max_attempts(clock, queue):
+    for _ in range(3):
+        unit = queue.lease('a')
+        queue.fail(unit, 'a', 'HTTP 500')
+        clock.now += 3600
+    assert queue.lease('a') is None
+    assert queue.counts()['failed'] == 1
+    assert queue.failures()[0]['error'] == 'HTTP 500'
+    assert queue.retry_failed() == 1
+    assert queue.lease('a').attempts == 1
+
+
+def test_expired_lease_after_the_last_attempt_fails(clock, queue):
+    for _ in range(3):
+        queue.lease('a')
+        clock.now += 601
+    assert queue.lease('a') is None
+    assert queue.failures()[0]['error'] == 'lease expired after the last attempt'
+
+
+def test_worker_renews_the_lease_of_a_slow_request(tmp_path, monkeypatch):
+    path = str(tmp_path / 'queue.sqlite')
+    queue = WorkQueue(path, lease_seconds=0.3)
+    queue.plan(['11111'], 'transactions', datetime(2024, 1, 1), datetime(2024, 1, 20))
+    started = threading.Event()
+
+    def slow_request(self, path, params=None, method='GET', retry_timeouts=True, priority=None):
+        started.set()
+        time.sleep(1.0)
+        return [{'id': 1}]
+
+    monkeypatch.setattr(Awin, '_request', slow_request)
+    client = Awin(client_id='11111', client_secret='secret', rate_limiter=SlidingWindowRateLimiter(requests_per_minute=10 ** 6))
+    worker = threading.Thread(target=run_worker, args=(client, queue, str(tmp_path / 'out'), 'a'))
+    worker.start()
+    other = WorkQueue(path, lease_seconds=0.3)
+    try:
+        started.wait(5)
+        for _ in range(8):
+            time.sleep(0.1)
+            # long past the 0.3 seconds of the first lease
+            assert other.lease('b') is None
+    finally:
+        worker.join()
+        other.close()
+        client.close()
+    assert queue.counts()['done'] == 1
+    queue.close()